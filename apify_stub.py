@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Apify API used by linkedin_scraper.py.
+
+Speaks the actor-run, run-status and dataset-items endpoints that both the
+ApifyClient path and the REST fallback call. Runs take a configurable time to
+finish, honour waitForFinish long-polls, and can be made to fail, time out, be
+rate limited or miss profiles. Dataset items come from recorded profile
+payloads, or are synthesized per profile ID. Point the app at it with
+APIFY_API_URL to exercise scraping, batching, polling and caching offline.
+
+Usage:
+    python apify_stub.py --port 8766 --run-secs 20 --run-jitter-secs 10 --failure-rate 0.05
+    APIFY_API_URL=http://127.0.0.1:8766 APIFY_API_TOKEN=stub streamlit run app.py
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+MAX_WAIT_FOR_FINISH = 60   # Longest waitForFinish the real API honours, in seconds
+
+def synthetic_profile(profile_id: str) -> Dict:
+    """A deterministic raw profile item shaped like the profile scraper actor's output"""
+    rng = random.Random(profile_id)
+    first, _, last = profile_id.replace("_", "-").partition("-")
+    positions = []
+    for i in range(rng.randint(1, 5)):
+        start = rng.randint(2005, 2022)
+        period = {"startDate": {"year": start, "month": rng.randint(1, 12)}}
+        if i:
+            period["endDate"] = {"year": start + rng.randint(1, 3), "month": rng.randint(1, 12)}
+        positions.append({"title": rng.choice(["Software Engineer", "Data Scientist", "Product Manager"]),
+                          "companyName": f"Company {rng.randint(1, 200)}", "timePeriod": period})
+    return {
+        "publicIdentifier": profile_id,
+        "firstName": first.title() or "Stub",
+        "lastName": last.replace("-", " ").title() or "User",
+        "headline": f"{positions[0]['title']} at {positions[0]['companyName']}",
+        "geoLocationName": "San Francisco Bay Area",
+        "summary": "Synthetic profile served by the local Apify stub.",
+        "pictureUrl": "",
+        "connectionsCount": rng.randint(50, 500),
+        "followersCount": rng.randint(50, 5000),
+        "positions": positions,
+        "educations": [{"schoolName": "State University",
+                        "timePeriod": {"startDate": {"year": 2001}, "endDate": {"year": 2005}}}],
+        "skills": [{"name": skill, "endorsements": rng.randint(0, 99)}
+                   for skill in rng.sample(["Python", "SQL", "Leadership", "Machine Learning", "AWS", "React"], 4)]
+    }
+
+def _profile_id_from_url(url: str) -> Optional[str]:
+    if "linkedin.com/in/" not in url:
+        return None
+    profile_id = url.split("linkedin.com/in/")[1].split("/")[0].split("?")[0]
+    return unquote(profile_id).strip().lower() or None
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+class _StubRun:
+    def __init__(self, actor_id: str, duration: float, final_status: str, items: List[Dict]):
+        self.id = uuid.uuid4().hex[:17]
+        self.actor_id = actor_id
+        self.dataset_id = uuid.uuid4().hex[:17]
+        self.started_at = time.time()
+        self.finish_at = self.started_at + duration
+        self.final_status = final_status
+        self.items = items
+
+    def status(self) -> str:
+        return self.final_status if time.time() >= self.finish_at else "RUNNING"
+
+    def to_dict(self) -> Dict:
+        status = self.status()
+        finished = status != "RUNNING"
+        return {
+            "id": self.id,
+            "actId": self.actor_id,
+            "userId": "stub-user",
+            "startedAt": _iso(self.started_at),
+            "finishedAt": _iso(self.finish_at) if finished else None,
+            "status": status,
+            "statusMessage": "Finished" if finished else "Scraping profiles",
+            "meta": {"origin": "API"},
+            "stats": {},
+            "options": {"build": "latest", "timeoutSecs": 120, "memoryMbytes": 1024, "diskMbytes": 2048},
+            "buildId": "stub-build",
+            "defaultKeyValueStoreId": f"kvs-{self.id}",
+            "defaultDatasetId": self.dataset_id,
+            "defaultRequestQueueId": f"rq-{self.id}"
+        }
+
+class ApifyStub:
+    """Configurable fake Apify API server running on a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, run_secs: float = 0.0,
+                 run_jitter_secs: float = 0.0, failure_rate: float = 0.0, timeout_rate: float = 0.0,
+                 start_error_rate: float = 0.0, rate_limit_rate: float = 0.0, missing_rate: float = 0.0,
+                 latency_ms: float = 0.0, profiles: Dict[str, Dict] = None, synthesize: bool = True,
+                 seed: int = None):
+        self.run_secs = run_secs                    # Mean time an actor run takes to finish
+        self.run_jitter_secs = run_jitter_secs      # Runs take run_secs +/- this, uniformly
+        self.failure_rate = failure_rate            # Share of runs that end FAILED
+        self.timeout_rate = timeout_rate            # Share of runs that end TIMED-OUT
+        self.start_error_rate = start_error_rate    # Share of run starts answered with a 500
+        self.rate_limit_rate = rate_limit_rate      # Share of run starts answered with a 429
+        self.missing_rate = missing_rate            # Share of profiles left out of a run's dataset
+        self.latency_ms = latency_ms                # Added to every request
+        self.synthesize = synthesize                # Invent profiles that weren't recorded
+        self.profiles: Dict[str, Dict] = {}         # Normalized profile ID -> recorded raw item
+        for profile_id, item in (profiles or {}).items():
+            self.profiles[unquote(profile_id).strip().lower()] = item
+        self._rng = random.Random(seed)
+        self._runs: Dict[str, _StubRun] = {}
+        self._datasets: Dict[str, _StubRun] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "runs_started": 0, "runs_failed": 0, "start_errors": 0,
+                      "rate_limited": 0, "status_checks": 0, "dataset_pages": 0, "items_served": 0}
+
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """The API root to use as APIFY_API_URL (the /v2 prefix is added by callers)"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ApifyStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "ApifyStub":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "runs_in_progress": sum(1 for run in self._runs.values() if run.status() == "RUNNING")}
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def start_run(self, actor_id: str, run_input: Dict) -> _StubRun:
+        """Create a run for the input's profile URLs with its duration and outcome decided up front"""
+        with self._lock:
+            duration = max(0.0, self._rng.uniform(self.run_secs - self.run_jitter_secs,
+                                                  self.run_secs + self.run_jitter_secs))
+            roll = self._rng.random()
+        if roll < self.failure_rate:
+            final_status = "FAILED"
+        elif roll < self.failure_rate + self.timeout_rate:
+            final_status = "TIMED-OUT"
+        else:
+            final_status = "SUCCEEDED"
+
+        items = []
+        if final_status == "SUCCEEDED":
+            for url in run_input.get("urls") or []:
+                profile_id = _profile_id_from_url(str(url))
+                if not profile_id or self._roll() < self.missing_rate:
+                    continue
+                item = self.profiles.get(profile_id)
+                if item is None and self.synthesize:
+                    item = synthetic_profile(profile_id)
+                if item is not None:
+                    items.append({**item, "inputUrl": url})
+
+        run = _StubRun(actor_id, duration, final_status, items)
+        with self._lock:
+            self._runs[run.id] = run
+            self._datasets[run.dataset_id] = run
+            self.stats["runs_started"] += 1
+            if final_status != "SUCCEEDED":
+                self.stats["runs_failed"] += 1
+        return run
+
+    def get_run(self, run_id: str) -> Optional[_StubRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def get_dataset(self, dataset_id: str) -> Optional[_StubRun]:
+        with self._lock:
+            return self._datasets.get(dataset_id)
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(_StubHandler):
+            pass
+
+        Handler.stub = stub
+        return Handler
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Request handler for ApifyStub, routing the handful of v2 endpoints the scraper uses"""
+    protocol_version = "HTTP/1.1"
+    stub: ApifyStub = None
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if parts[:1] == ["v2"]:
+            parts = parts[1:]
+        return parts, query
+
+    def do_POST(self):
+        stub = self.stub
+        stub._count("requests")
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            run_input = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error(400, "invalid-input", "Invalid JSON body")
+            return
+        if stub.latency_ms:
+            time.sleep(stub.latency_ms / 1000)
+
+        parts, query = self._route()
+        # POST /v2/acts/{actorId}/runs (newer clients say 'actors')
+        if len(parts) != 3 or parts[0] not in ("acts", "actors") or parts[2] != "runs":
+            self._send_error(404, "page-not-found", f"Unknown endpoint {self.path}")
+            return
+
+        roll = stub._roll()
+        if roll < stub.rate_limit_rate:
+            stub._count("rate_limited")
+            self._send_error(429, "rate-limit-exceeded", "Too many requests (injected)")
+            return
+        if roll < stub.rate_limit_rate + stub.start_error_rate:
+            stub._count("start_errors")
+            self._send_error(500, "internal-error", "Internal server error (injected)")
+            return
+
+        run = stub.start_run(parts[1], run_input if isinstance(run_input, dict) else {})
+        self._send_json(201, {"data": run.to_dict()})
+
+    def do_GET(self):
+        stub = self.stub
+        stub._count("requests")
+        if stub.latency_ms:
+            time.sleep(stub.latency_ms / 1000)
+        parts, query = self._route()
+
+        # GET /v2/actor-runs/{runId}[/dataset/items] or /v2/acts/{actorId}/runs/{runId}[/dataset/items]
+        if parts[:1] == ["actor-runs"] and len(parts) >= 2:
+            run_id, rest = parts[1], parts[2:]
+        elif parts[0] in ("acts", "actors") and len(parts) >= 4 and parts[2] == "runs":
+            run_id, rest = parts[3], parts[4:]
+        elif parts[:1] == ["datasets"] and len(parts) == 3 and parts[2] == "items":
+            run = stub.get_dataset(parts[1])
+            if run is None:
+                self._send_error(404, "record-not-found", "Dataset was not found")
+            else:
+                self._send_items(run, query)
+            return
+        else:
+            self._send_error(404, "page-not-found", f"Unknown endpoint {self.path}")
+            return
+
+        run = stub.get_run(run_id)
+        if run is None:
+            self._send_error(404, "record-not-found", "Actor run was not found")
+            return
+        if rest == ["dataset", "items"]:
+            self._send_items(run, query)
+            return
+        if rest:
+            self._send_error(404, "page-not-found", f"Unknown endpoint {self.path}")
+            return
+
+        stub._count("status_checks")
+        wait = min(float(query.get("waitForFinish") or 0), MAX_WAIT_FOR_FINISH)
+        # Long-poll: hold the request until the run ends or the wait is up
+        time.sleep(max(0.0, min(run.finish_at - time.time(), wait)))
+        self._send_json(200, {"data": run.to_dict()})
+
+    def _send_items(self, run: _StubRun, query: Dict[str, str]):
+        items = run.items if run.status() != "RUNNING" else []
+        offset = int(query.get("offset") or 0)
+        limit = int(query.get("limit") or len(items) or 1)
+        page = items[offset:offset + limit]
+        self.stub._count("dataset_pages")
+        self.stub._count("items_served", len(page))
+        self._send_json(200, page, {
+            "X-Apify-Pagination-Total": str(len(items)),
+            "X-Apify-Pagination-Offset": str(offset),
+            "X-Apify-Pagination-Limit": str(limit),
+            "X-Apify-Pagination-Count": str(len(page)),
+            "X-Apify-Pagination-Desc": "false"
+        })
+
+    def _send_error(self, status: int, error_type: str, message: str):
+        self._send_json(status, {"error": {"type": error_type, "message": message}})
+
+    def _send_json(self, status: int, body, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def load_recorded_profiles(path: str) -> Dict[str, Dict]:
+    """Load raw profile items from a JSON file holding a list of items or a dict keyed by profile ID"""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return data
+    return {item["publicIdentifier"]: item for item in data if isinstance(item, dict) and item.get("publicIdentifier")}
+
+def start_stub_server(**options) -> ApifyStub:
+    """Start an ApifyStub on a free local port and return it"""
+    return ApifyStub(**options).start()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--run-secs", type=float, default=5.0)
+    parser.add_argument("--run-jitter-secs", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--start-error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--missing-rate", type=float, default=0.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--profiles", help="JSON file of recorded raw profile items to serve")
+    parser.add_argument("--no-synthesize", action="store_true", help="Only serve recorded profiles")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    stub = ApifyStub(
+        host=args.host, port=args.port, run_secs=args.run_secs, run_jitter_secs=args.run_jitter_secs,
+        failure_rate=args.failure_rate, timeout_rate=args.timeout_rate,
+        start_error_rate=args.start_error_rate, rate_limit_rate=args.rate_limit_rate,
+        missing_rate=args.missing_rate, latency_ms=args.latency_ms,
+        profiles=load_recorded_profiles(args.profiles) if args.profiles else None,
+        synthesize=not args.no_synthesize, seed=args.seed
+    )
+    print(f"🧪 Apify stub listening on {stub.base_url}")
+    print(f"   export APIFY_API_URL={stub.base_url} APIFY_API_TOKEN=stub")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+        print(f"📊 {stub.get_stats()}")
+
+if __name__ == "__main__":
+    main()
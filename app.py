@@ -17,6 +17,7 @@ import plotly.express as px
 import pandas as pd
 import config
 from chat_agent import LinkedInChatAgent
+from scrape_jobs import get_scrape_job_queue
 
 # Custom CSS for better styling
 st.markdown("""
@@ -80,6 +81,41 @@ if 'profile_data' not in st.session_state:
 if 'analysis_data' not in st.session_state:
     st.session_state.analysis_data = None
 
+if 'scrape_job' not in st.session_state:
+    st.session_state.scrape_job = None
+
+def check_scrape_job():
+    """Show progress of the background profile scrape and pick up its result when done"""
+    job_ref = st.session_state.scrape_job
+    if not job_ref:
+        return
+    
+    queue = get_scrape_job_queue()
+    job = queue.get_job(job_ref["id"])
+    if job is None:
+        st.session_state.scrape_job = None
+        return
+    
+    if job["status"] in ("succeeded", "failed"):
+        # Analysis of the scraped profile only takes a moment, so it runs in this script run
+        response = st.session_state.chat_agent.complete_profile_analysis(
+            st.session_state.user_id, job["linkedin_url"], job["result"]
+        )
+        st.session_state.messages.append({"role": "assistant", "content": response})
+        st.session_state.scrape_job = None
+        queue.forget(job["id"])
+        if job["status"] == "succeeded":
+            st.success("Profile analysis complete!")
+        else:
+            st.error("Profile scraping failed")
+        return
+    
+    if job["status"] == "queued":
+        st.info(f"⏳ Waiting for a free scraper... ({job['queued_seconds']:.0f}s)")
+    else:
+        st.info(f"🔄 Scraping profile: {job['actor_status'] or 'STARTING'} ({job['elapsed_seconds']:.0f}s)")
+        st.caption(job["message"])
+
 def main():
     # Debug section 
     with st.expander("🔧 Debug Info (Remove after testing)"):
@@ -108,18 +144,18 @@ def main():
         )
         
         if st.button("🔍 Analyze Profile", use_container_width=True):
-            if linkedin_url:
-                with st.spinner("Analyzing your profile..."):
-                    response = st.session_state.chat_agent.process_message(
-                        st.session_state.user_id, 
-                        f"Please analyze my LinkedIn profile: {linkedin_url}"
-                    )
-                    st.session_state.messages.append({"role": "user", "content": f"Analyze: {linkedin_url}"})
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                st.success("Profile analysis complete!")
+            if st.session_state.scrape_job:
+                st.warning("A profile is already being analyzed")
+            elif linkedin_url:
+                # Scraping takes minutes, so it runs as a background job this session polls
+                job_id = get_scrape_job_queue().submit(linkedin_url, st.session_state.user_id)
+                st.session_state.scrape_job = {"id": job_id, "url": linkedin_url}
+                st.session_state.messages.append({"role": "user", "content": f"Analyze: {linkedin_url}"})
             else:
                 st.error("Please enter a LinkedIn URL")
         
+        check_scrape_job()
+        
         st.divider()
         
         # Job analysis
@@ -199,6 +235,7 @@ def main():
             st.session_state.messages = []
             st.session_state.profile_data = None
             st.session_state.analysis_data = None
+            st.session_state.scrape_job = None
             # Clear memory system
             st.session_state.chat_agent.memory_system.clear_session(st.session_state.user_id)
             st.rerun()
@@ -226,14 +263,20 @@ def main():
             with st.chat_message("user"):
                 st.write(prompt)
             
-            # Get AI response
+            # Get AI response, rendering it as it streams in
             with st.chat_message("assistant"):
+                stream = st.session_state.chat_agent.stream_message(
+                    st.session_state.user_id, prompt
+                )
                 with st.spinner("Thinking..."):
-                    response = st.session_state.chat_agent.process_message(
-                        st.session_state.user_id, prompt
-                    )
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    st.markdown(response)
+                    response = next(stream, "")
+                
+                placeholder = st.empty()
+                for chunk in stream:
+                    response += chunk
+                    placeholder.markdown(response + "▌")
+                placeholder.markdown(response)
+                st.session_state.messages.append({"role": "assistant", "content": response})
     
     with col2:
         # Profile insights
@@ -390,6 +433,11 @@ def main():
         <p>Get personalized insights to boost your professional presence!</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Rerun shortly to refresh scrape progress; the scrape itself keeps going in the background
+    if st.session_state.scrape_job:
+        time.sleep(config.SCRAPE_JOB_POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
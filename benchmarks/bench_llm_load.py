@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Load test the LLM wrapper against the local OpenRouter stub.
+
+Sends batches of concurrent prompts through AsyncOpenRouterLLM while the stub
+draws response times from a latency distribution and injects errors, then
+reports throughput, tail latency and how the calls ended. The seed makes
+runs reproducible.
+
+Usage:
+    python benchmarks/bench_llm_load.py --requests 200 --concurrency 8 \\
+        --latency lognormal --latency-ms 200 --error-rate 0.05 --rate-limit-rate 0.02
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from llm_wrapper import AsyncOpenRouterLLM, OpenRouterLLM, run_sync
+from llm_metrics import get_llm_metrics
+from openrouter_stub import start_stub_server, LATENCY_DISTRIBUTIONS
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.6)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--hedging", action="store_true", help="Race the backup model against slow calls")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # The stub stands in for OpenRouter, so client-side throttling would only skew the numbers
+    config.RATE_LIMITS = {}
+    config.LLM_HEDGING_ENABLED = args.hedging
+    config.LLM_RETRY_BASE_DELAY = 0.05
+
+    stub = start_stub_server(
+        latency=args.latency, latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=0, seed=args.seed
+    )
+    llm = OpenRouterLLM(caller="load-test")
+    llm.base_url = stub.base_url
+    async_llm = AsyncOpenRouterLLM(max_concurrency=args.concurrency, llm=llm)
+    get_llm_metrics().reset()
+
+    prompts = [f"Load test prompt {i}" for i in range(args.requests)]
+    start = time.perf_counter()
+    run_sync(async_llm.agather(prompts, use_cache=False))
+    elapsed = time.perf_counter() - start
+    stub.stop()
+
+    calls = get_llm_metrics().get_recent_calls(limit=args.requests)
+    latencies = [call["latency"] * 1000 for call in calls]
+    statuses = {}
+    for call in calls:
+        statuses[call["status"]] = statuses.get(call["status"], 0) + 1
+
+    print(f"📊 {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.latency} latency ~{args.latency_ms:.0f} ms, "
+          f"{args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} 429s\n")
+    print(f"  throughput: {args.requests / elapsed:8.1f} req/s")
+    print(f"  latency:    p50={statistics.median(latencies):7.1f} ms  p95={percentile(latencies, 95):7.1f} ms  "
+          f"p99={percentile(latencies, 99):7.1f} ms  max={max(latencies):7.1f} ms")
+    print(f"  outcomes:   {statuses}")
+    print(f"  stub:       {stub.get_stats()}")
+
+if __name__ == "__main__":
+    main()
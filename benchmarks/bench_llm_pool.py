@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-call latency of OpenRouterLLM with and without the pooled session.
+
+Runs against a local stub server, so no API key or network access is needed.
+A connect delay is applied to every new connection to stand in for the
+TCP + TLS handshake cost of talking to openrouter.ai.
+
+Usage:
+    python benchmarks/bench_llm_pool.py --calls 200 --connect-delay-ms 30
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import requests
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from llm_wrapper import OpenRouterLLM, get_http_session
+from openrouter_stub import start_stub_server
+
+class NoPoolSession:
+    """Session stand-in that opens a fresh connection for every request"""
+
+    def post(self, *args, **kwargs):
+        return requests.post(*args, **kwargs)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run(llm: OpenRouterLLM, calls: int):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        llm.invoke(f"benchmark prompt {i}", use_cache=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--connect-delay-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    # Measure the transport only: no client-side throttling or hedged duplicate requests
+    config.RATE_LIMITS = {}
+    config.LLM_HEDGING_ENABLED = False
+    stub = start_stub_server(connect_delay_ms=args.connect_delay_ms)
+
+    print(f"📊 {args.calls} calls per mode, {args.connect_delay_ms:.0f} ms simulated handshake\n")
+    for name, session in [("without pool", NoPoolSession()), ("with pool", get_http_session())]:
+        llm = OpenRouterLLM(session=session)
+        llm.base_url = stub.base_url
+        latencies = run(llm, args.calls)
+        print(f"{name:>12}: p50={statistics.median(latencies):7.2f} ms  "
+              f"p99={percentile(latencies, 99):7.2f} ms  "
+              f"mean={statistics.mean(latencies):7.2f} ms")
+
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
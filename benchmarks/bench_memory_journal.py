@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-message persistence cost: full user_memory.json rewrites vs. the journal.
+
+Seeds persistent memory with --users users, each holding --history messages,
+then times ProfileMemorySystem.add_message. The old behaviour re-serialized
+every user with indent=2 on each message; the journal appends one line and
+compacts into a snapshot once the journal outgrows it. Also reports how long
+reloading (snapshot + journal replay) takes.
+
+Usage:
+    python benchmarks/bench_memory_journal.py --users 10000 --history 20 --messages 2000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_journal import MemoryJournal
+from memory_system import ProfileMemorySystem
+
+def seed_users(users: int, history: int) -> dict:
+    memory = {}
+    for i in range(users):
+        messages = [{"timestamp": "2026-01-01T00:00:00", "sender": "user" if m % 2 else "assistant",
+                     "message": f"Message {m} from user {i} about their LinkedIn profile and career goals."}
+                    for m in range(history)]
+        memory[f"user-{i}"] = {
+            "user_id": f"user-{i}", "created_at": "2026-01-01T00:00:00", "last_updated": "2026-01-01T00:00:00",
+            "profile_history": [], "career_goals": ["Senior Engineer"], "job_preferences": [],
+            "skill_gaps": [], "interaction_history": messages, "preferences": {}
+        }
+    return memory
+
+def timed_messages(memory: ProfileMemorySystem, user_ids, count: int, rng: random.Random) -> list:
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        memory.add_message(rng.choice(user_ids), f"Benchmark message {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--legacy-messages", type=int, default=20, help="Full rewrites are slow, so time fewer")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seeded = seed_users(args.users, args.history)
+    user_ids = list(seeded)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "user_memory.json")
+        journal_path = os.path.join(tmp, "user_memory.journal")
+        with open(snapshot_path, "w") as f:
+            json.dump(seeded, f, indent=2)
+        size_mb = os.path.getsize(snapshot_path) / 1024 / 1024
+
+        journal = MemoryJournal(snapshot_path, journal_path, write_behind=False)
+        memory = ProfileMemorySystem(store=journal)
+
+        # The original _save_persistent_memory, run after every message
+        def legacy_save():
+            with open(snapshot_path + ".legacy", "w") as f:
+                json.dump(journal.users, f, indent=2)
+
+        legacy = []
+        for i in range(args.legacy_messages):
+            start = time.perf_counter()
+            memory.add_message(rng.choice(user_ids), f"Legacy message {i}")
+            legacy_save()
+            legacy.append((time.perf_counter() - start) * 1000)
+
+        journaled = timed_messages(memory, user_ids, args.messages, rng)
+        stats = journal.get_stats()
+        journal.close()
+
+        start = time.perf_counter()
+        reloaded = MemoryJournal(snapshot_path, journal_path)
+        reload_secs = time.perf_counter() - start
+        assert len(reloaded.users) == args.users
+        reloaded.close()
+
+    print(f"📊 {args.users} users x {args.history} messages ({size_mb:.1f} MB as indented JSON)\n")
+    for name, latencies in [("full rewrite", legacy), ("journal", journaled)]:
+        ordered = sorted(latencies)
+        print(f"{name:>13}: median={statistics.median(latencies):9.3f} ms  "
+              f"p99={ordered[int(0.99 * (len(ordered) - 1))]:9.3f} ms  "
+              f"max={max(latencies):9.3f} ms  ({len(latencies)} messages)")
+    print(f"\njournal: {stats['entries_written']} entries, {stats['compactions']} compactions, "
+          f"{stats['journal_bytes'] / 1024:.0f} KB pending; reload with replay took {reload_secs:.2f} s")
+    print(f"Median per-message persistence cost cut {statistics.median(legacy) / statistics.median(journaled):,.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-message cost of persistent memory for a user with a long history.
+
+Seeds --users users, gives one of them --history messages, then times
+ProfileMemorySystem.add_message for that user on the default backend
+(config.MEMORY_BACKEND, as create_memory_store opens it) and on the other file
+backends with their default settings. The journal appends one line per message
+whatever the history size; the sharded store rewrites the user's whole file, so
+its cost grows with the history unless write-behind batches the writes.
+
+Usage:
+    python benchmarks/bench_memory_message_cost.py --users 1000 --history 1500 --messages 500
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from bench_memory_journal import seed_users
+from memory_store import create_memory_store
+from memory_system import ProfileMemorySystem
+
+def time_backend(backend: str, data_dir: str, seeded: dict, hot_user: str, messages: int) -> list:
+    """Open a backend the way the app does, seeded through the journal migration, and time add_message"""
+    config.MEMORY_SNAPSHOT_PATH = os.path.join(data_dir, "user_memory.json")
+    config.MEMORY_JOURNAL_PATH = os.path.join(data_dir, "user_memory.journal")
+    config.MEMORY_SQLITE_PATH = os.path.join(data_dir, "user_memory.sqlite3")
+    config.MEMORY_SHARD_DIR = os.path.join(data_dir, "user_memory")
+    with open(config.MEMORY_SNAPSHOT_PATH, "w") as f:
+        json.dump(seeded, f)
+
+    store = create_memory_store(backend)
+    memory = ProfileMemorySystem(store=store)
+    memory.get_user_preferences(hot_user)   # Load the user before timing
+    latencies = []
+    for i in range(messages):
+        start = time.perf_counter()
+        memory.add_message(hot_user, f"Benchmark message {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    store.close()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=1500, help="Messages already stored for the timed user")
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    seeded = seed_users(args.users, 5)
+    hot_user = "user-0"
+    seeded[hot_user] = seed_users(1, args.history)["user-0"]
+
+    default = config.MEMORY_BACKEND
+    backends = [default] + [name for name in ("journal", "sqlite", "sharded") if name != default]
+    print(f"📊 {args.messages} messages to a user with {args.history} stored messages "
+          f"(write-behind {'on' if config.MEMORY_WRITE_BEHIND else 'off'}, "
+          f"fsync {'on' if config.MEMORY_JOURNAL_FSYNC else 'off'})\n")
+    for backend in backends:
+        with tempfile.TemporaryDirectory() as data_dir:
+            latencies = sorted(time_backend(backend, data_dir, seeded, hot_user, args.messages))
+        label = f"{backend} (default)" if backend == default else backend
+        print(f"{label:>18}: median={statistics.median(latencies):8.3f} ms  "
+              f"p99={latencies[int(0.99 * (len(latencies) - 1))]:8.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark persistent memory engines: startup time, RSS and per-call latency.
+
+Seeds the journal (JSON snapshot), SQLite and sharded (file per user) stores
+with the same --users users, then opens each in a fresh subprocess and measures how long opening
+takes, the process RSS afterwards, and the latency of add_message,
+get_user_preferences and get_memory_summary for random users.
+
+Usage:
+    python benchmarks/bench_memory_store.py --users 10000 --history 20 --calls 2000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory_journal import seed_users
+
+def run_engine(engine: str, data_dir: str, users: int, calls: int, seed: int):
+    """Child process: open one engine and time calls against it, printing JSON results"""
+    from memory_journal import MemoryJournal
+    from memory_store import SqliteMemoryStore
+    from memory_shards import ShardedMemoryStore
+    from memory_system import ProfileMemorySystem
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if engine == "sqlite":
+        store = SqliteMemoryStore(os.path.join(data_dir, "user_memory.sqlite3"))
+    elif engine == "sharded":
+        store = ShardedMemoryStore(os.path.join(data_dir, "user_memory"))
+    else:
+        store = MemoryJournal(os.path.join(data_dir, "user_memory.json"), os.path.join(data_dir, "user_memory.journal"))
+    memory = ProfileMemorySystem(store=store)
+    open_secs = time.perf_counter() - start
+    open_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    rng = random.Random(seed)
+    timings = {"add_message": [], "get_user_preferences": [], "get_memory_summary": []}
+    for i in range(calls):
+        user_id = f"user-{rng.randrange(users)}"
+        for name, call in (("add_message", lambda: memory.add_message(user_id, f"Benchmark message {i}")),
+                           ("get_user_preferences", lambda: memory.get_user_preferences(user_id)),
+                           ("get_memory_summary", lambda: memory.get_memory_summary(user_id))):
+            call_start = time.perf_counter()
+            call()
+            timings[name].append((time.perf_counter() - call_start) * 1000)
+    store.close()
+    print(json.dumps({"open_secs": open_secs, "open_rss_kb": open_rss - baseline,
+                      "median_ms": {name: statistics.median(values) for name, values in timings.items()}}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--engine", choices=["journal", "sqlite", "sharded"], help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        run_engine(args.engine, args.data_dir, args.users, args.calls, args.seed)
+        return
+
+    from memory_store import SqliteMemoryStore
+    from memory_shards import ShardedMemoryStore
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        seeded = seed_users(args.users, args.history)
+        with open(os.path.join(data_dir, "user_memory.json"), "w") as f:
+            json.dump(seeded, f)
+        sqlite_store = SqliteMemoryStore(os.path.join(data_dir, "user_memory.sqlite3"))
+        sqlite_store.import_users(seeded)
+        sqlite_store.close()
+        ShardedMemoryStore(os.path.join(data_dir, "user_memory"), write_behind=False).import_users(seeded)
+        del seeded
+
+        print(f"📊 {args.users} users x {args.history} messages, {args.calls} calls of each kind\n")
+        for engine in ("journal", "sqlite", "sharded"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--engine", engine, "--data-dir", data_dir,
+                 "--users", str(args.users), "--calls", str(args.calls), "--seed", str(args.seed)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            medians = "  ".join(f"{name}={ms:.3f} ms" for name, ms in result["median_ms"].items())
+            print(f"{engine:>8}: open={result['open_secs']:6.2f} s  +RSS={result['open_rss_kb'] / 1024:7.1f} MB  {medians}")
+
+if __name__ == "__main__":
+    main()
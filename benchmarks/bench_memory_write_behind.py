@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory persistence throughput: a durable write per message vs. write-behind.
+
+Seeds persistent memory with --users users, then sends --messages chat
+messages to a hot set of --active users from --threads threads. The
+synchronous journal appends and fsyncs one entry per message; write-behind
+marks the user dirty and a background flusher writes one entry per dirty
+user, fsynced once per batch. Reports writes per second, request latency and
+how many journal entries and fsyncs each mode needed.
+
+Usage:
+    python benchmarks/bench_memory_write_behind.py --users 10000 --active 200 --messages 5000 --threads 8
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import threading
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory_journal import seed_users
+from memory_journal import MemoryJournal
+from memory_system import ProfileMemorySystem
+
+def run_mode(tmp: str, seeded: dict, write_behind: bool, args) -> dict:
+    snapshot_path = os.path.join(tmp, "user_memory.json")
+    journal_path = os.path.join(tmp, "user_memory.journal")
+    with open(snapshot_path, "w") as f:
+        json.dump(seeded, f)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    # fsync=True gives the synchronous journal the same durability a write-behind flush has
+    journal = MemoryJournal(snapshot_path, journal_path, fsync=True, write_behind=write_behind)
+    memory = ProfileMemorySystem(store=journal)
+    per_thread = args.messages // args.threads
+    latencies = []
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        mine = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            memory.add_message(f"user-{rng.randrange(args.active)}", f"Benchmark message {i}")
+            mine.append((time.perf_counter() - start) * 1000)
+        latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + t,)) for t in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    request_secs = time.perf_counter() - start
+    journal.close()   # Includes the final write-behind flush
+    total_secs = time.perf_counter() - start
+    stats = journal.get_stats()
+
+    reloaded = MemoryJournal(snapshot_path, journal_path, write_behind=False)
+    persisted = sum(len(reloaded.users[f"user-{u}"]["interaction_history"]) for u in range(args.active))
+    reloaded.close()
+    return {"writes_per_sec": per_thread * args.threads / total_secs, "request_secs": request_secs,
+            "total_secs": total_secs, "latencies": latencies, "stats": stats, "persisted": persisted}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=5)
+    parser.add_argument("--active", type=int, default=200, help="Users receiving messages during the run")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    seeded = seed_users(args.users, args.history)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write_behind in (("sync+fsync", False), ("write-behind", True)):
+            results[name] = run_mode(tmp, seeded, write_behind, args)
+
+    print(f"📊 {args.messages} messages to {args.active} of {args.users} users from {args.threads} threads\n")
+    for name, result in results.items():
+        ordered = sorted(result["latencies"])
+        stats = result["stats"]
+        fsyncs = stats["flushes"] if stats["flushes"] else stats["entries_written"]
+        print(f"{name:>13}: {result['writes_per_sec']:9,.0f} writes/s  "
+              f"median={statistics.median(ordered):7.3f} ms  p99={ordered[int(0.99 * (len(ordered) - 1))]:7.3f} ms  "
+              f"entries={stats['entries_written']}  fsyncs={fsyncs}  compactions={stats['compactions']}")
+    assert results["sync+fsync"]["persisted"] == results["write-behind"]["persisted"], "write-behind lost messages"
+    speedup = results["write-behind"]["writes_per_sec"] / results["sync+fsync"]["writes_per_sec"]
+    print(f"\nWrite-behind sustains {speedup:,.1f}x the writes/s with every message persisted after close()")
+
+if __name__ == "__main__":
+    main()
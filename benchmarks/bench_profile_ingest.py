@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark profile dataset ingestion: materialized json + legacy normalizer vs.
+paged streaming with the fast decoder and the precompiled normalizer plan.
+
+Generates synthetic raw Apify profile records. The legacy path receives the
+whole dataset as one JSON body, decodes it with json.loads into a list and
+normalizes every item with the original per-field normalizer. The streaming
+path decodes one page at a time with profile_normalizer.loads (orjson when
+installed) and normalizes with the precompiled plan. Each mode runs in its
+own subprocess so its peak RSS can be reported separately.
+
+Usage:
+    python benchmarks/bench_profile_ingest.py --records 5000 --page-size 500
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_normalizer
+
+def make_record(i: int) -> dict:
+    """A synthetic raw profile item shaped like the profile scraper actor's output"""
+    rng = random.Random(i)
+    positions = []
+    for p in range(rng.randint(1, 8)):
+        start = rng.randint(2000, 2020)
+        period = {"startDate": {"year": start, "month": rng.randint(1, 12)}}
+        if p:
+            period["endDate"] = {"year": start + rng.randint(1, 4), "month": rng.randint(1, 12)}
+        positions.append({
+            "title": f"Engineer {p}", "companyName": f"Company {rng.randint(1, 500)}",
+            "description": "Built things. " * rng.randint(5, 40), "timePeriod": period
+        })
+    return {
+        "publicIdentifier": f"user-{i}",
+        "firstName": f"First{i}",
+        "lastName": f"Last{i}",
+        "headline": "Software Engineer at Company",
+        "geoLocationName": "San Francisco Bay Area",
+        "summary": "Experienced engineer. " * rng.randint(10, 60),
+        "pictureUrl": f"https://media.licdn.com/{i}.jpg",
+        "connectionsCount": rng.randint(10, 500),
+        "followersCount": rng.randint(10, 5000),
+        "positions": positions,
+        "educations": [
+            {"schoolName": "State University", "timePeriod": {"startDate": {"year": 2005}, "endDate": {"year": 2009}}}
+        ],
+        "skills": [{"name": f"Skill {s}", "endorsements": rng.randint(0, 99)} for s in range(rng.randint(5, 30))]
+    }
+
+def legacy_process_profile_data(raw_data: dict) -> dict:
+    """The original LinkedInScraper._process_profile_data, kept verbatim for comparison"""
+    full_name = f"{raw_data.get('firstName', '')} {raw_data.get('lastName', '')}".strip()
+    processed_data = {
+        "basic_info": {
+            "full_name": full_name,
+            "headline": raw_data.get("headline", ""),
+            "location": raw_data.get("geoLocationName", ""),
+            "summary": raw_data.get("summary", ""),
+            "profile_url": f"https://linkedin.com/in/{raw_data.get('publicIdentifier', '')}",
+            "profile_picture": raw_data.get("pictureUrl", "")
+        },
+        "experience": [], "education": [], "skills": [], "certifications": [], "languages": [],
+        "volunteer_experience": [], "publications": [], "patents": [], "courses": [], "projects": [],
+        "honors_awards": [], "test_scores": [], "organizations": [], "people_also_viewed": [],
+        "recommendations": [],
+        "connections": str(raw_data.get("connectionsCount", "")),
+        "followers": str(raw_data.get("followersCount", ""))
+    }
+    for pos in raw_data.get("positions", []):
+        if not isinstance(pos, dict):
+            continue
+        time_period = pos.get("timePeriod", {})
+        if not isinstance(time_period, dict):
+            time_period = {}
+        start_date = time_period.get("startDate", {})
+        end_date = time_period.get("endDate", {})
+        if not isinstance(start_date, dict):
+            start_date = {}
+        if not isinstance(end_date, dict):
+            end_date = {}
+        duration = ""
+        if start_date:
+            start_year = start_date.get("year", "")
+            if end_date:
+                duration = f"{start_year} - {end_date.get('year', '')}"
+            else:
+                duration = f"{start_year} - Present"
+        processed_data["experience"].append({
+            "title": pos.get("title", ""), "company": pos.get("companyName", ""),
+            "duration": duration, "location": "", "description": ""
+        })
+    for edu in raw_data.get("educations", []):
+        if not isinstance(edu, dict):
+            continue
+        time_period = edu.get("timePeriod", {})
+        if not isinstance(time_period, dict):
+            time_period = {}
+        start_date = time_period.get("startDate", {})
+        end_date = time_period.get("endDate", {})
+        if not isinstance(start_date, dict):
+            start_date = {}
+        if not isinstance(end_date, dict):
+            end_date = {}
+        duration = ""
+        if start_date and end_date:
+            duration = f"{start_date.get('year', '')} - {end_date.get('year', '')}"
+        processed_data["education"].append({
+            "school": edu.get("schoolName", ""), "degree": "", "field": "",
+            "duration": duration, "description": ""
+        })
+    for skill in raw_data.get("skills", []):
+        if not isinstance(skill, dict):
+            continue
+        processed_data["skills"].append({"name": skill.get("name", ""), "endorsements": skill.get("endorsements", 0)})
+    return processed_data
+
+def run_legacy(records: int, page_size: int):
+    """Returns (records, seconds spent decoding and normalizing)"""
+    # The REST fallback fetched the whole dataset as one body and materialized it
+    body = json.dumps([make_record(i) for i in range(records)])
+    start = time.perf_counter()
+    items = json.loads(body)
+    processed = [legacy_process_profile_data(item) for item in items]
+    return len(processed), time.perf_counter() - start
+
+def run_streaming(records: int, page_size: int):
+    """Returns (records, seconds spent decoding and normalizing)"""
+    count, elapsed = 0, 0.0
+    for offset in range(0, records, page_size):
+        # Each page is what one offset/limit request to the dataset items endpoint returns
+        page = json.dumps([make_record(i) for i in range(offset, min(records, offset + page_size))]).encode()
+        start = time.perf_counter()
+        for item in profile_normalizer.loads(page):
+            profile_normalizer.normalize_profile(item)
+            count += 1
+        elapsed += time.perf_counter() - start
+    return count, elapsed
+
+def run_mode(mode: str, records: int, page_size: int):
+    """Child process: ingest the dataset once and print records, seconds and peak RSS growth"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Generating the synthetic payload isn't timed, only decoding and normalizing it
+    count, elapsed = {"legacy": run_legacy, "streaming": run_streaming}[mode](records, page_size)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"records": count, "seconds": elapsed, "peak_kb": peak, "growth_kb": peak - baseline}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--mode", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.records, args.page_size)
+        return
+
+    # Both normalizers must agree before their speed is worth comparing
+    sample = make_record(42)
+    assert profile_normalizer.normalize_profile(sample) == legacy_process_profile_data(sample)
+
+    decoder = "orjson" if profile_normalizer.orjson is not None else "json"
+    print(f"📊 {args.records} synthetic profiles, page size {args.page_size}, fast decoder: {decoder}\n")
+    results = {}
+    for mode in ("legacy", "streaming"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode,
+             "--records", str(args.records), "--page-size", str(args.page_size)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[mode] = result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>10}: {result['records'] / result['seconds']:9,.0f} records/s  "
+              f"peak RSS={result['peak_kb'] / 1024:7.1f} MB  (+{result['growth_kb'] / 1024:.1f} MB while ingesting)")
+
+    legacy, streaming = results["legacy"], results["streaming"]
+    speedup = (legacy["seconds"] / streaming["seconds"])
+    print(f"\nStreaming ingest is {speedup:.2f}x the legacy throughput with "
+          f"{(legacy['peak_kb'] - streaming['peak_kb']) / 1024:.1f} MB lower peak RSS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Load test profile scraping against the local Apify stub.
+
+Sends concurrent get_profile requests for a pool of profiles (so some repeat)
+through the REST scraping path while the stub runs actors of random length
+and injects failures. Reports latency, how many actor runs the requests
+actually cost, and what the profile cache and scrape deduplication saved.
+Times are scaled down by --time-scale and reported scaled back up.
+
+Usage:
+    python benchmarks/bench_scrape_load.py --requests 100 --profiles 20 --concurrency 10 \\
+        --run-secs 30 --run-jitter-secs 15 --failure-rate 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import concurrent.futures
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import linkedin_scraper
+from linkedin_scraper import LinkedInScraper, get_scrape_dedup_stats
+from profile_cache import get_profile_cache
+from apify_stub import start_stub_server
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--profiles", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--run-secs", type=float, default=30.0)
+    parser.add_argument("--run-jitter-secs", type=float, default=15.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--missing-rate", type=float, default=0.0)
+    parser.add_argument("--time-scale", type=float, default=0.02)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    config.RATE_LIMITS = {}
+    config.PROFILE_CACHE_ENABLED = not args.no_cache
+    config.APIFY_WAIT_FOR_FINISH_SECS = max(1, int(60 * args.time_scale))
+    # Keep the scraper's progress output out of the report
+    linkedin_scraper.print = lambda *a, **k: None
+
+    stub = start_stub_server(
+        run_secs=args.run_secs * args.time_scale, run_jitter_secs=args.run_jitter_secs * args.time_scale,
+        failure_rate=args.failure_rate, missing_rate=args.missing_rate, seed=args.seed
+    )
+    config.APIFY_API_URL = stub.base_url
+    scraper = LinkedInScraper()
+    scraper.client = None
+
+    urls = [f"https://www.linkedin.com/in/bench-user-{i % args.profiles}" for i in range(args.requests)]
+    latencies, failures = [], 0
+
+    def request(url):
+        start = time.perf_counter()
+        profile = scraper.get_profile(url)
+        return (time.perf_counter() - start) / args.time_scale, profile is not None
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for latency, ok in pool.map(request, urls):
+            latencies.append(latency)
+            failures += not ok
+    wall = (time.perf_counter() - started) / args.time_scale
+    stub.stop()
+
+    stats = stub.get_stats()
+    dedup = get_scrape_dedup_stats()
+    cache = get_profile_cache().get_stats()
+    print(f"📊 {args.requests} requests for {args.profiles} profiles, concurrency {args.concurrency}, "
+          f"actor runs of {args.run_secs:.0f}±{args.run_jitter_secs:.0f} s\n")
+    print(f"latency: p50={percentile(latencies, 50):6.1f} s  p95={percentile(latencies, 95):6.1f} s  "
+          f"mean={statistics.mean(latencies):6.1f} s  wall={wall:6.1f} s")
+    print(f"failed requests: {failures}")
+    print(f"actor runs started: {stats['runs_started']} ({stats['runs_failed']} failed), "
+          f"status checks: {stats['status_checks']}, dataset pages: {stats['dataset_pages']}")
+    print(f"dedup: {dedup['duplicate_runs_avoided']} duplicate runs avoided")
+    if not args.no_cache:
+        print(f"cache: {cache['hits']} hits, {cache['misses']} misses, {cache['stale_on_error']} stale on error")
+
+if __name__ == "__main__":
+    main()
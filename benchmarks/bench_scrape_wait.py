@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end scrape time with fixed-interval polling vs. waitForFinish.
+
+Runs LinkedInScraper.scrape_profile against a fake Apify client whose actor
+runs take a random time to finish. The old behaviour checked the run status
+every 10 seconds; the new one long-polls and returns as soon as the run ends.
+Times are scaled down by --time-scale so the benchmark runs quickly, and are
+reported scaled back up to real seconds.
+
+Usage:
+    python benchmarks/bench_scrape_wait.py --scrapes 20 --time-scale 0.05
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import threading
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import linkedin_scraper
+from linkedin_scraper import LinkedInScraper
+
+class FakeApifyClient:
+    """Apify client stand-in whose runs finish after a set duration"""
+
+    def __init__(self, durations):
+        self.durations = list(durations)
+        self.finish_at = {}
+        self.lock = threading.Lock()
+
+    def actor(self, name):
+        client = self
+
+        class Actor:
+            def start(self, run_input):
+                with client.lock:
+                    run_id = f"run-{len(client.finish_at)}"
+                    client.finish_at[run_id] = time.monotonic() + client.durations.pop()
+                return {"id": run_id, "defaultDatasetId": run_id}
+        return Actor()
+
+    def run(self, run_id):
+        finish_at = self.finish_at[run_id]
+
+        class Run:
+            def get(self):
+                return {"status": "SUCCEEDED" if time.monotonic() >= finish_at else "RUNNING"}
+
+            def wait_for_finish(self, wait_secs=None):
+                # Server-side long-poll: return when the run ends or the wait is up
+                time.sleep(max(0.0, min(finish_at - time.monotonic(), wait_secs)))
+                return self.get()
+        return Run()
+
+    def dataset(self, dataset_id):
+        class Dataset:
+            def iterate_items(self):
+                yield {"publicIdentifier": "bench", "firstName": "Bench", "lastName": "User"}
+        return Dataset()
+
+def make_legacy_wait(scale: float):
+    """The original status loop: check, then sleep a fixed 10 seconds"""
+    def legacy_wait(self, run_id, fetch_status=None, max_wait=None):
+        elapsed = 0
+        while elapsed < 300:
+            if self.client.run(run_id).get().get("status") == "SUCCEEDED":
+                return True
+            time.sleep(10 * scale)
+            elapsed += 10
+        return False
+    return legacy_wait
+
+def run_scrapes(durations, scale: float) -> list:
+    scraper = LinkedInScraper()
+    scraper.client = FakeApifyClient(durations)
+    latencies = []
+    lock = threading.Lock()
+
+    def scrape(i):
+        start = time.perf_counter()
+        scraper.scrape_profile(f"https://www.linkedin.com/in/bench{i}")
+        with lock:
+            latencies.append((time.perf_counter() - start) / scale)
+
+    threads = [threading.Thread(target=scrape, args=(i,)) for i in range(len(durations))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scrapes", type=int, default=20)
+    parser.add_argument("--min-run-secs", type=float, default=20.0)
+    parser.add_argument("--max-run-secs", type=float, default=90.0)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    durations = [rng.uniform(args.min_run_secs, args.max_run_secs) * args.time_scale for _ in range(args.scrapes)]
+    config.RATE_LIMITS = {}
+    config.APIFY_WAIT_FOR_FINISH_SECS = 60 * args.time_scale
+
+    # Keep the scraper's progress output out of the report
+    linkedin_scraper.print = lambda *a, **k: None
+
+    original_wait = LinkedInScraper._wait_for_run
+    LinkedInScraper._wait_for_run = make_legacy_wait(args.time_scale)
+    legacy = run_scrapes(durations, args.time_scale)
+    LinkedInScraper._wait_for_run = original_wait
+    adaptive = run_scrapes(durations, args.time_scale)
+
+    actual = [d / args.time_scale for d in durations]
+    print(f"📊 {args.scrapes} scrapes, actor runs of {args.min_run_secs:.0f}-{args.max_run_secs:.0f} s "
+          f"(median {statistics.median(actual):.1f} s)\n")
+    for name, latencies in [("fixed 10 s poll", legacy), ("waitForFinish", adaptive)]:
+        dead = statistics.mean(latencies) - statistics.mean(actual)
+        print(f"{name:>16}: median={statistics.median(latencies):6.1f} s  "
+              f"max={max(latencies):6.1f} s  mean dead time={dead:5.2f} s")
+    cut = statistics.median(legacy) - statistics.median(adaptive)
+    print(f"\nMedian end-to-end scrape time cut by {cut:.1f} s ({cut / statistics.median(legacy):.0%})")
+
+if __name__ == "__main__":
+    main()
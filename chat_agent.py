@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterator
 from llm_wrapper import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, AIMessage
@@ -10,6 +10,7 @@ from profile_analyzer import ProfileAnalyzer
 from job_analyzer import JobAnalyzer
 from content_generator import ContentGenerator
 from memory_system import ProfileMemorySystem
+from prompt_budget import PromptBudget, PromptSection, truncate_to_tokens
 
 class LinkedInChatAgent:
     def __init__(self):
@@ -17,7 +18,8 @@ class LinkedInChatAgent:
             model=config.FREE_LLM_MODEL,
             temperature=config.TEMPERATURE,
             max_tokens=config.MAX_TOKENS,
-            api_key=config.OPENROUTER_API_KEY
+            api_key=config.OPENROUTER_API_KEY,
+            caller="chat_agent"
         )
         
         # Initializing components
@@ -26,6 +28,7 @@ class LinkedInChatAgent:
         self.job_analyzer = JobAnalyzer()
         self.content_generator = ContentGenerator()
         self.memory_system = ProfileMemorySystem()
+        self.prompt_budget = PromptBudget()
         
         # System prompt for the chat agent
         self.system_prompt = """
@@ -65,6 +68,51 @@ class LinkedInChatAgent:
             print(f"Error processing message: {e}")
             return "I apologize, but I encountered an error processing your message. Please try again."
     
+    def stream_message(self, user_id: str, message: str) -> Iterator[str]:
+        """Process user message and stream the response as it is generated"""
+        chunks = []
+        response = None
+        try:
+            # Adding message to memory
+            self.memory_system.add_message(user_id, message, "user")
+            
+            # conversation context
+            context = self.memory_system.get_conversation_context(user_id)
+            profile_data = self.memory_system.get_profile_context(user_id)
+            user_preferences = self.memory_system.get_user_preferences(user_id)
+            
+            intent = self._determine_intent(message)
+            if intent == "general":
+                # Free-form answers come straight from the LLM, so stream them token by token
+                prompt = self._build_general_prompt(message, profile_data, context)
+                for chunk in self.llm.stream(prompt, use_cache=False):
+                    chunks.append(chunk)
+                    yield chunk
+                response = "".join(chunks).strip()
+            else:
+                # Structured responses are assembled locally and arrive in one piece
+                response = self._generate_response(user_id, message, intent, profile_data, user_preferences, context)
+                chunks.append(response)
+                yield response
+            
+            # Add response to memory
+            self.memory_system.add_message(user_id, response, "assistant")
+            
+        except Exception as e:
+            print(f"Error streaming message: {e}")
+            if not chunks:
+                yield "I apologize, but I encountered an error processing your message. Please try again."
+                return
+            
+            # Part of the answer is already out; mark where it stopped and remember only what was streamed
+            yield "\n\n---\n⚠️ The response was interrupted. Please try again."
+            partial = "".join(chunks).strip()
+            if response is None and partial:
+                try:
+                    self.memory_system.add_message(user_id, partial, "assistant")
+                except Exception as e:
+                    print(f"Error saving partial response: {e}")
+    
     def _determine_intent(self, message: str) -> str:
         """Determine the user's intent from their message"""
         message_lower = message.lower()
@@ -123,16 +171,36 @@ class LinkedInChatAgent:
             if not linkedin_url:
                 return "I couldn't find a LinkedIn URL in your message. Please provide a valid LinkedIn profile URL to analyze."
             
-            # Scraping profile data
-            profile_data = self.scraper.scrape_profile(linkedin_url)
+            # Scraping profile data, reusing a cached scrape unless a refresh is asked for
+            force_refresh = bool(re.search(r"\b(refresh|re-?scrape|latest)\b", message, re.IGNORECASE))
+            profile_data = self.scraper.get_profile(linkedin_url, force_refresh=force_refresh)
             
-            if not profile_data:
-                # Checking if it's a private profile issue
-                cookies = self.scraper._get_linkedin_cookie()
-                has_valid_cookies = len(cookies) > 0 and any('li_at' in cookie.get('name', '') for cookie in cookies)
-                
-                if not has_valid_cookies:
-                    return """❌ **Profile Analysis Failed**
+            return self._analyze_scraped_profile(user_id, profile_data)
+            
+        except Exception as e:
+            print(f"Error in profile analysis: {e}")
+            return "I encountered an error analyzing your profile. Please try again with a valid LinkedIn URL."
+    
+    def complete_profile_analysis(self, user_id: str, linkedin_url: str, profile_data: Optional[Dict]) -> str:
+        """Analyze a profile scraped by a background job and record the exchange in memory"""
+        self.memory_system.add_message(user_id, f"Please analyze my LinkedIn profile: {linkedin_url}", "user")
+        try:
+            response = self._analyze_scraped_profile(user_id, profile_data)
+        except Exception as e:
+            print(f"Error in profile analysis: {e}")
+            response = "I encountered an error analyzing your profile. Please try again with a valid LinkedIn URL."
+        self.memory_system.add_message(user_id, response, "assistant")
+        return response
+    
+    def _analyze_scraped_profile(self, user_id: str, profile_data: Optional[Dict]) -> str:
+        """Store and analyze a scraped profile, explaining what went wrong if there is none"""
+        if not profile_data:
+            # Checking if it's a private profile issue
+            cookies = self.scraper._get_linkedin_cookie()
+            has_valid_cookies = len(cookies) > 0 and any('li_at' in cookie.get('name', '') for cookie in cookies)
+            
+            if not has_valid_cookies:
+                return """❌ **Profile Analysis Failed**
 
 The profile you're trying to analyze appears to be private or requires authentication.
 
@@ -152,23 +220,19 @@ The profile you're trying to analyze appears to be private or requires authentic
    ```
 
 **Note:** Public profiles like Bill Gates, Satya Nadella, etc. work without cookies."""
-                else:
-                    return "I encountered an error analyzing your profile. The profile might not exist or be accessible. Please check the URL and try again."
-            
-            # Storing profile data in memory
-            self.memory_system.update_profile_data(user_id, profile_data)
-            
-            # Analyzing profile
-            analysis = self.profile_analyzer.analyze_profile(profile_data)
-            
-            # Generating response
-            response = self._format_profile_analysis_response(analysis, profile_data)
-            
-            return response
-            
-        except Exception as e:
-            print(f"Error in profile analysis: {e}")
-            return "I encountered an error analyzing your profile. Please try again with a valid LinkedIn URL."
+            else:
+                return "I encountered an error analyzing your profile. The profile might not exist or be accessible. Please check the URL and try again."
+        
+        # Storing profile data in memory
+        self.memory_system.update_profile_data(user_id, profile_data)
+        
+        # Analyzing profile
+        analysis = self.profile_analyzer.analyze_profile(profile_data)
+        
+        # Generating response
+        response = self._format_profile_analysis_response(analysis, profile_data)
+        
+        return response
     
     def _handle_job_analysis(self, user_id: str, message: str, profile_data: Optional[Dict]) -> str:
         """Handle job analysis requests"""
@@ -289,35 +353,9 @@ The profile you're trying to analyze appears to be private or requires authentic
     def _handle_general_conversation(self, user_id: str, message: str, profile_data: Optional[Dict], context: List[Dict]) -> str:
         """Handle general conversation"""
         try:
-            # single prompt string for the LLM (our wrapper expects a string)
-            recent_turns = []
-            for msg in context[-5:]:
-                role = "User" if msg.get("sender") == "user" else "Assistant"
-                recent_turns.append(f"{role}: {msg.get('message','').strip()}")
-
-            profile_bits = []
-            if profile_data:
-                name = profile_data.get("basic_info", {}).get("full_name")
-                headline = profile_data.get("basic_info", {}).get("headline")
-                if name:
-                    profile_bits.append(f"Name: {name}")
-                if headline:
-                    profile_bits.append(f"Headline: {headline}")
-
-            style_instructions = (
-                "Be concise, warm, and practical. Avoid generic greetings. "
-                "Offer one specific, actionable next step related to LinkedIn when appropriate."
-            )
-
-            prompt = (
-                f"System: {self.system_prompt.strip()}\n"
-                + (f"Context: {' | '.join(profile_bits)}\n" if profile_bits else "")
-                + ("\n".join(recent_turns) + "\n" if recent_turns else "")
-                + f"User: {message.strip()}\n"
-                + f"Assistant ({style_instructions}):"
-            )
-
-            response_text = self.llm.invoke(prompt)
+            prompt = self._build_general_prompt(message, profile_data, context)
+            # Conversation replies should be sampled fresh rather than served from cache
+            response_text = self.llm.invoke(prompt, use_cache=False)
             return response_text.strip()
 
         except Exception as e:
@@ -329,6 +367,40 @@ The profile you're trying to analyze appears to be private or requires authentic
                 "and I’ll give you a concrete next step."
             )
     
+    def _build_general_prompt(self, message: str, profile_data: Optional[Dict], context: List[Dict]) -> str:
+        """Build the general conversation prompt"""
+        # single prompt string for the LLM (our wrapper expects a string)
+        recent_turns = []
+        for msg in context[-5:]:
+            role = "User" if msg.get("sender") == "user" else "Assistant"
+            recent_turns.append(f"{role}: {msg.get('message','').strip()}")
+
+        profile_bits = []
+        if profile_data:
+            name = profile_data.get("basic_info", {}).get("full_name")
+            headline = profile_data.get("basic_info", {}).get("headline")
+            if name:
+                profile_bits.append(f"Name: {name}")
+            if headline:
+                profile_bits.append(f"Headline: {headline}")
+
+        style_instructions = (
+            "Be concise, warm, and practical. Avoid generic greetings. "
+            "Offer one specific, actionable next step related to LinkedIn when appropriate."
+        )
+
+        # The question itself is never cut for budget; only an oversized paste is capped
+        user_message = truncate_to_tokens(f"User: {message.strip()}", config.PROMPT_SECTION_BUDGETS["message"])
+
+        # Older history goes first when the prompt is over budget, then profile context
+        return self.prompt_budget.fit([
+            PromptSection("system", f"System: {self.system_prompt.strip()}", required=True),
+            PromptSection("profile", f"Context: {' | '.join(profile_bits)}" if profile_bits else "", priority=2),
+            PromptSection("history", "\n".join(recent_turns), priority=1, keep="tail"),
+            PromptSection("message", user_message, required=True),
+            PromptSection("instructions", f"Assistant ({style_instructions}):", required=True)
+        ]).text
+    
     def _extract_linkedin_url(self, message: str) -> Optional[str]:
         """Extract LinkedIn URL from message"""
         # Simple regex to find LinkedIn URLs
@@ -503,18 +575,16 @@ The profile you're trying to analyze appears to be private or requires authentic
         """Generate all content improvements"""
         response = "✨ **Complete Profile Enhancement Package:**\n\n"
         
-        # Generating headlines
-        headlines = self.content_generator.generate_enhanced_headline(profile_data)
+        # Generating all sections with one batched LLM call
+        package = self.content_generator.generate_content_package(profile_data)
+        headlines, summaries, experience = package["headlines"], package["summaries"], package["experience"]
+        
         response += "🎯 **Headline Options:**\n"
         response += f"• {headlines['achievement_focused']}\n\n"
         
-        # Generating summary
-        summaries = self.content_generator.generate_enhanced_summary(profile_data)
         response += "📝 **Summary Enhancement:**\n"
         response += f"{summaries['achievement_focused'][:200]}...\n\n"
         
-        # Generating experience enhancements
-        experience = self.content_generator.generate_experience_enhancements(profile_data)
         if experience.get("enhanced_experiences"):
             response += "💼 **Experience Improvements:**\n"
             response += "Enhanced descriptions with action words and achievements\n\n"
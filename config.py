@@ -22,13 +22,99 @@ def get_secret(key, default=None):
 OPENROUTER_API_KEY = get_secret("OPENROUTER_API_KEY")
 APIFY_API_TOKEN = get_secret("APIFY_API_TOKEN")
 LINKEDIN_COOKIE = get_secret("LINKEDIN_COOKIE")
+# Point at a local apify_stub.py server to scrape without the real API
+APIFY_API_URL = get_secret("APIFY_API_URL", "https://api.apify.com")
 
 # LLM Configuration
+# Point at a local openrouter_stub.py server to run without the real API
+OPENROUTER_BASE_URL = get_secret("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 # Free models available on OpenRouter
 FREE_LLM_MODEL = "mistralai/mistral-7b-instruct"  # Free tier model
 BACKUP_LLM_MODEL = "meta-llama/llama-2-7b-chat"   # Alternative free model
 PAID_LLM_MODEL = "openai/gpt-3.5-turbo"           # Paid model as backup
 
+# LLM HTTP Connection Pool
+LLM_POOL_CONNECTIONS = 4    # Number of per-host pools kept alive
+LLM_POOL_MAXSIZE = 16       # Maximum open connections per host
+LLM_POOL_BLOCK = False      # Block instead of opening extra connections when the pool is exhausted
+LLM_REQUEST_TIMEOUT = 30    # Seconds to wait for a completion
+LLM_MAX_CONCURRENCY = 4     # Maximum parallel requests per fan-out
+
+# LLM Response Cache
+LLM_CACHE_ENABLED = True
+LLM_CACHE_TTL = 3600                    # 1 hour in seconds
+LLM_CACHE_MAX_ENTRIES = 1000
+LLM_CACHE_MAX_BYTES = 16 * 1024 * 1024  # 16 MB
+
+# Persistent LLM Cache (SQLite, shared by all local processes)
+LLM_DISK_CACHE_ENABLED = True
+LLM_DISK_CACHE_PATH = get_secret("LLM_DISK_CACHE_PATH", "llm_cache.sqlite3")
+LLM_DISK_CACHE_TTL = 7 * 24 * 3600            # 1 week in seconds
+LLM_DISK_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+LLM_DISK_CACHE_COMPACT_EVERY = 100            # Writes between size checks
+LLM_DISK_CACHE_BUSY_TIMEOUT = 5               # Seconds to wait on a locked database
+LLM_OFFLINE_MODE = str(get_secret("LLM_OFFLINE_MODE", "false")).lower() == "true"  # Serve cached answers only
+
+# Hedged Requests (fire the backup model when the primary is slower than its p95)
+LLM_HEDGING_ENABLED = True
+LLM_HEDGE_DEFAULT_DELAY = 8.0   # Seconds to wait before hedging until enough latencies are known
+LLM_HEDGE_MIN_DELAY = 1.0       # Lower bound for the adaptive delay
+LLM_HEDGE_MAX_DELAY = 15.0      # Upper bound for the adaptive delay
+LLM_HEDGE_WINDOW = 200          # Recent latencies kept per model
+LLM_HEDGE_MIN_SAMPLES = 20      # Samples needed before the p95 is trusted
+LLM_HEDGE_MAX_WORKERS = 16      # Threads available for racing requests
+
+# LLM Retries and Circuit Breaker
+LLM_MAX_RETRIES = 2                 # Retries per model on 429/5xx/connection errors
+LLM_RETRY_BASE_DELAY = 0.5          # Seconds, doubled on each retry (with full jitter)
+LLM_RETRY_MAX_DELAY = 8.0           # Longest backoff or Retry-After we are willing to wait
+LLM_RETRY_BUDGET_RATIO = 0.2        # Retries allowed per first attempt, across all calls
+LLM_RETRY_BUDGET_MAX_TOKENS = 10    # Retries that can be saved up for a burst
+LLM_BREAKER_WINDOW = 20             # Recent calls considered for the failure rate
+LLM_BREAKER_FAILURE_RATE = 0.5      # Failure rate that opens the breaker
+LLM_BREAKER_MIN_CALLS = 5           # Calls needed before the breaker can open
+LLM_BREAKER_OPEN_SECONDS = 30       # How long to fail fast before probing again
+
+# LLM Telemetry
+LLM_METRICS_ENABLED = True
+LLM_METRICS_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60]  # Latency histogram bounds, seconds
+LLM_METRICS_WINDOW_SECONDS = 300    # Rolling window for latency percentiles
+LLM_METRICS_WINDOW_SLOTS = 10       # Window is kept as this many time slices
+LLM_METRICS_RECENT_CALLS = 200      # Per-call records kept for inspection
+
+# Client-side Rate Limits (token buckets: rate = requests per second, burst = bucket size)
+RATE_LIMITS = {
+    "openrouter:default": {"rate": 20 / 60, "burst": 10},   # Free-tier models allow ~20 requests/minute
+    "openrouter:openai/gpt-3.5-turbo": {"rate": 1.0, "burst": 20},
+    "apify:actor-runs": {"rate": 0.5, "burst": 5},          # Starting actor runs
+    "apify:api": {"rate": 20.0, "burst": 40}                # Run status and dataset requests
+}
+RATE_LIMIT_MAX_WAIT = 10  # Seconds a request may queue for a token before giving up
+
+# Apify Run Completion
+APIFY_RUN_MAX_WAIT = 300                # Seconds to wait for an actor run before giving up
+APIFY_WAIT_FOR_FINISH_SECS = 60         # Long-poll length per status check (Apify allows up to 60)
+APIFY_POLL_INITIAL_INTERVAL = 1.0       # First wait after a failed or early-returning status check
+APIFY_POLL_BACKOFF = 1.5                # Growth factor for those waits
+APIFY_POLL_MAX_INTERVAL = 10.0          # Longest wait between status checks
+
+# Scraped Profile Cache
+PROFILE_CACHE_ENABLED = True
+PROFILE_CACHE_TTL = 24 * 3600                   # Seconds a scraped profile is fresh
+PROFILE_CACHE_STALE_TTL = 6 * 24 * 3600         # Extra seconds it is served while refreshing in the background
+PROFILE_CACHE_STALE_WHILE_REVALIDATE = True     # False = re-scrape synchronously once the TTL passes
+PROFILE_CACHE_MAX_ENTRIES = 500                 # Profiles kept, least recently used evicted first
+PROFILE_CACHE_REFRESH_WORKERS = 2               # Background refresh threads
+
+# Background Scrape Jobs
+SCRAPE_JOB_WORKERS = 4              # Profile scrapes running at once across all sessions
+SCRAPE_JOB_MAX_FINISHED = 200       # Finished jobs kept for result pickup
+SCRAPE_JOB_POLL_INTERVAL = 2.0      # Seconds between progress refreshes in the app
+
+# Batch Profile Scraping
+APIFY_BATCH_SIZE = 50                   # Profile URLs sent to one actor run
+APIFY_BATCH_MAX_CONCURRENT_RUNS = 3     # Batch actor runs in flight at once
+
 # Streamlit Configuration
 STREAMLIT_SERVER_PORT = int(get_secret("STREAMLIT_SERVER_PORT", 8501))
 STREAMLIT_SERVER_ADDRESS = get_secret("STREAMLIT_SERVER_ADDRESS", "0.0.0.0")
@@ -40,10 +126,37 @@ APP_VERSION = "1.0.0"
 # Memory Configuration
 MEMORY_TTL = 3600  # 1 hour in seconds
 MAX_MEMORY_SIZE = 1000  # Maximum number of messages to store
+MEMORY_BACKEND = get_secret("MEMORY_BACKEND", "journal")    # 'journal' (JSON snapshot + journal), 'sqlite', 'redis' or 'sharded'
+REDIS_URL = get_secret("REDIS_URL", "redis://localhost:6379/0")   # Used by the redis memory backend
+REDIS_KEY_PREFIX = "linkedin-optimizer:"        # Namespace for every memory key in Redis
+MEMORY_SQLITE_PATH = get_secret("MEMORY_SQLITE_PATH", "user_memory.sqlite3")
+MEMORY_SQLITE_BUSY_TIMEOUT = 5                  # Seconds to wait on a locked database
+MEMORY_SHARD_DIR = get_secret("MEMORY_SHARD_DIR", "user_memory")   # One JSON file per user (sharded backend, opt-in)
+MEMORY_SHARD_CACHE_SIZE = 1000                  # Hot users kept in RAM by the sharded backend
+MEMORY_SNAPSHOT_PATH = "user_memory.json"       # Persistent memory snapshot
+MEMORY_JOURNAL_PATH = "user_memory.journal"     # Changes since the snapshot, one JSON line each
+MEMORY_JOURNAL_FSYNC = False                    # fsync every entry (survives power loss, not just crashes)
+MEMORY_JOURNAL_COMPACT_MIN_BYTES = 4 * 1024 * 1024   # Never compact a journal smaller than this
+MEMORY_JOURNAL_COMPACT_RATIO = 1.0              # Compact once the journal outgrows the snapshot by this factor
+# Write-behind takes disk I/O off the request path, but a crash (not a clean exit, which
+# flushes) loses up to MEMORY_FLUSH_INTERVAL seconds of changes, so it is opt-in
+MEMORY_WRITE_BEHIND = str(get_secret("MEMORY_WRITE_BEHIND", "false")).lower() == "true"
+MEMORY_FLUSH_INTERVAL = 1.0                     # Seconds between background flushes
+MEMORY_FLUSH_MAX_DIRTY = 100                    # Flush early once this many users have unsaved changes
 
 # Chat Configuration
 MAX_TOKENS = 4000
 TEMPERATURE = 0.7
 
+# Prompt Token Budgets (estimated tokens)
+PROMPT_TOKEN_BUDGET = 3000
+PROMPT_SECTION_BUDGETS = {
+    "profile": 1200,   # Profile facts such as skills and roles
+    "summary": 600,    # The user's current free-text summary
+    "history": 1000,   # Recent conversation turns, oldest dropped first
+    "message": 600,    # The latest user message
+    "role": 60         # A job role typed by the user
+}
+
 # Job Analysis Configuration
 JOB_MATCH_THRESHOLD = 0.6
@@ -2,6 +2,7 @@ from typing import Dict, List, Optional
 import json
 from llm_wrapper import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from prompt_budget import PromptBudget, PromptSection
 import config
 
 class ContentGenerator:
@@ -10,36 +11,55 @@ class ContentGenerator:
             model=config.FREE_LLM_MODEL,
             temperature=config.TEMPERATURE,
             max_tokens=config.MAX_TOKENS,
-            api_key=config.OPENROUTER_API_KEY
+            api_key=config.OPENROUTER_API_KEY,
+            caller="content_generator"
         )
+        self.prompt_budget = PromptBudget()
     
     def generate_enhanced_headline(self, profile_data: Dict, target_role: str = None) -> Dict:
         """Generate an enhanced headline for the profile"""
         try:
-            current_headline = profile_data.get("basic_info", {}).get("headline", "")
-            experience = profile_data.get("experience", [])
-            skills = profile_data.get("skills", [])
-            basic_info = profile_data.get("basic_info", {})
-            full_name = basic_info.get("full_name", "")
-            location = basic_info.get("location", "")
-            
-            # Extracting key information
-            top_skills = [skill["name"] for skill in skills[:5]] if skills else []
-            recent_role = (experience[0].get("title") if experience and isinstance(experience[0], dict) else "") or (
-                basic_info.get("current_role", "")
-            )
-            industry = basic_info.get("industry", "")
+            raw = self.llm.invoke(self._build_headline_prompt(profile_data, target_role))
+            return self._parse_headline_response(raw, profile_data, target_role)
             
-            prompt = f"""
+        except Exception as e:
+            print(f"Error generating enhanced headline: {e}")
+            return self._default_headlines()
+    
+    def _headline_signals(self, profile_data: Dict) -> Dict:
+        """Extract the profile details a headline is built from"""
+        experience = profile_data.get("experience", [])
+        skills = profile_data.get("skills", [])
+        basic_info = profile_data.get("basic_info", {})
+        
+        # Extracting key information
+        top_skills = [skill["name"] for skill in skills[:5]] if skills else []
+        recent_role = (experience[0].get("title") if experience and isinstance(experience[0], dict) else "") or (
+            basic_info.get("current_role", "")
+        )
+        return {
+            "current_headline": basic_info.get("headline", ""),
+            "full_name": basic_info.get("full_name", ""),
+            "location": basic_info.get("location", ""),
+            "industry": basic_info.get("industry", ""),
+            "top_skills": top_skills,
+            "recent_role": recent_role
+        }
+    
+    def _build_headline_prompt(self, profile_data: Dict, target_role: str = None) -> str:
+        """Build the headline generation prompt"""
+        signals = self._headline_signals(profile_data)
+        
+        return f"""
             Create an enhanced LinkedIn headline for a professional with the following information:
             
-            Current headline: {current_headline}
-            Recent role: {recent_role}
-            Top skills: {', '.join(top_skills)}
+            Current headline: {signals['current_headline']}
+            Recent role: {signals['recent_role']}
+            Top skills: {', '.join(signals['top_skills'])}
             Target role: {target_role if target_role else 'General professional'}
-            Name: {full_name}
-            Industry: {industry}
-            Location: {location}
+            Name: {signals['full_name']}
+            Industry: {signals['industry']}
+            Location: {signals['location']}
             
             Requirements:
             1. Include key skills and value proposition
@@ -55,136 +75,195 @@ class ContentGenerator:
             
             Format as JSON with keys: achievement_focused, skill_focused, value_focused
             """
-            
-            raw = self.llm.invoke(prompt)
-
-            # Trying to parse JSON directly; if not possible, fall back to heuristic generation
-            parsed: Dict = {}
-            try:
-               
-                cleaned = raw.strip()
-                if cleaned.startswith("```"):
-                    cleaned = cleaned.strip("`\n ")
-                    
-                    if cleaned.lower().startswith("json\n"):
-                        cleaned = cleaned[5:]
-                parsed = json.loads(cleaned)
-                if all(k in parsed and isinstance(parsed[k], str) for k in ["achievement_focused", "skill_focused", "value_focused"]):
-                    return parsed
-            except Exception:
-                pass
+    
+    def _parse_headline_response(self, raw: str, profile_data: Dict, target_role: str = None) -> Dict:
+        """Parse headline suggestions from the LLM, or build them from the profile if parsing fails"""
+        # Trying to parse JSON directly; if not possible, fall back to heuristic generation
+        parsed = self._parse_json_versions(raw, ["achievement_focused", "skill_focused", "value_focused"])
+        if parsed is not None:
+            return parsed
 
-            # Heuristic, personalized fallback using available profile signals
-            primary_skill_list = ", ".join(top_skills[:3]) if top_skills else "impactful solutions"
-            two_skills = ", ".join(top_skills[:2]) if top_skills else "strategy & execution"
-            role_for_copy = recent_role or (target_role or "Professional")
-            industry_hint = f" | {industry}" if industry else ""
+        # Heuristic, personalized fallback using available profile signals
+        signals = self._headline_signals(profile_data)
+        top_skills = signals["top_skills"]
+        industry = signals["industry"]
+        primary_skill_list = ", ".join(top_skills[:3]) if top_skills else "impactful solutions"
+        two_skills = ", ".join(top_skills[:2]) if top_skills else "strategy & execution"
+        role_for_copy = signals["recent_role"] or (target_role or "Professional")
+        industry_hint = f" | {industry}" if industry else ""
 
-            achievement = (
-                f"{role_for_copy}{industry_hint} | Led high-impact projects | Drove measurable results | {primary_skill_list}"
-            )
-            skill = (
-                f"{role_for_copy} | {primary_skill_list} | Known for reliability and craftsmanship"
-            )
-            value = (
-                f"{role_for_copy} | Turning goals into outcomes | {two_skills}"
-            )
+        achievement = (
+            f"{role_for_copy}{industry_hint} | Led high-impact projects | Drove measurable results | {primary_skill_list}"
+        )
+        skill = (
+            f"{role_for_copy} | {primary_skill_list} | Known for reliability and craftsmanship"
+        )
+        value = (
+            f"{role_for_copy} | Turning goals into outcomes | {two_skills}"
+        )
 
-            return {
-                "achievement_focused": achievement,
-                "skill_focused": skill,
-                "value_focused": value
-            }
-            
-        except Exception as e:
-            print(f"Error generating enhanced headline: {e}")
-            return {
-                "achievement_focused": "Professional with strong technical skills and leadership experience",
-                "skill_focused": "Skilled professional with expertise in multiple technologies",
-                "value_focused": "Results-oriented professional focused on delivering value"
-            }
+        return {
+            "achievement_focused": achievement,
+            "skill_focused": skill,
+            "value_focused": value
+        }
+    
+    @staticmethod
+    def _parse_json_versions(raw: str, keys: List[str]) -> Optional[Dict]:
+        """Parse a JSON object of text versions from the LLM, or None if any key is missing"""
+        try:
+            cleaned = raw.strip()
+            if cleaned.startswith("```"):
+                cleaned = cleaned.strip("`\n ")
+                
+                if cleaned.lower().startswith("json\n"):
+                    cleaned = cleaned[5:]
+            parsed = json.loads(cleaned)
+            if all(k in parsed and isinstance(parsed[k], str) for k in keys):
+                return parsed
+        except Exception:
+            pass
+        return None
+    
+    def _default_headlines(self) -> Dict:
+        return {
+            "achievement_focused": "Professional with strong technical skills and leadership experience",
+            "skill_focused": "Skilled professional with expertise in multiple technologies",
+            "value_focused": "Results-oriented professional focused on delivering value"
+        }
     
     def generate_enhanced_summary(self, profile_data: Dict, target_role: str = None) -> Dict:
         """Generate an enhanced summary for the profile"""
         try:
-            current_summary = profile_data.get("basic_info", {}).get("summary", "")
-            experience = profile_data.get("experience", [])
-            skills = profile_data.get("skills", [])
-            education = profile_data.get("education", [])
-            
-            # Extracting key information
-            years_experience = len(experience)
-            top_skills = [skill["name"] for skill in skills[:8]] if skills else []
-            recent_achievements = []
-            
-            # Extracting achievements from recent experience
-            for exp in experience[:2]:
-                if exp.get("description"):
-                    recent_achievements.append(f"{exp['title']} at {exp['company']}")
-            
-            prompt = f"""
-            Create an enhanced LinkedIn summary for a professional with the following information:
+            raw = self.llm.invoke(self._build_summary_prompt(profile_data, target_role))
+            return self._parse_summary_response(raw, profile_data)
             
-            Current summary: {current_summary}
-            Years of experience: {years_experience}
-            Top skills: {', '.join(top_skills)}
-            Recent roles: {', '.join(recent_achievements)}
-            Target role: {target_role if target_role else 'General professional'}
-            
-            Requirements:
-            1. Tell a compelling professional story
-            2. Include specific achievements and metrics
-            3. Highlight key skills and expertise
-            4. Show passion and career goals
-            5. Keep it engaging and professional
-            6. Include a call to action
-            
-            Generate 2 different versions:
-            1. Story-focused (personal narrative)
-            2. Achievement-focused (results and metrics)
-            
-            Format as JSON with keys: story_focused, achievement_focused
-            """
-            
-            response = self.llm.invoke(prompt)
-            
-            # Generating enhanced summaries
-            story_focused = f"""
-            I'm a passionate {experience[0]['title'] if experience else 'professional'} with {years_experience} years of experience in the technology industry. My journey began with a fascination for solving complex problems, which led me to specialize in {', '.join(top_skills[:3])}.
+        except Exception as e:
+            print(f"Error generating enhanced summary: {e}")
+            return self._default_summaries()
+    
+    def _build_summary_prompt(self, profile_data: Dict, target_role: str = None) -> str:
+        """Build the summary generation prompt"""
+        current_summary = profile_data.get("basic_info", {}).get("summary", "")
+        experience = profile_data.get("experience", [])
+        skills = profile_data.get("skills", [])
+        
+        # Extracting key information
+        years_experience = len(experience)
+        top_skills = [skill["name"] for skill in skills[:8]] if skills else []
+        recent_achievements = []
+        
+        # Extracting achievements from recent experience
+        for exp in experience[:2]:
+            if exp.get("description"):
+                recent_achievements.append(f"{exp['title']} at {exp['company']}")
+        
+        # Long free-text summaries are trimmed first so the prompt stays within budget
+        return self.prompt_budget.fit([
+            PromptSection(
+                "header",
+                "Create an enhanced LinkedIn summary for a professional with the following information:",
+                required=True
+            ),
+            PromptSection("summary", f"Current summary: {current_summary}", priority=1),
+            PromptSection(
+                "profile",
+                f"Years of experience: {years_experience}\n"
+                f"Top skills: {', '.join(top_skills)}\n"
+                f"Recent roles: {', '.join(recent_achievements)}\n"
+                f"Target role: {target_role if target_role else 'General professional'}",
+                priority=2
+            ),
+            PromptSection(
+                "instructions",
+                """Requirements:
+1. Tell a compelling professional story
+2. Include specific achievements and metrics
+3. Highlight key skills and expertise
+4. Show passion and career goals
+5. Keep it engaging and professional
+6. Include a call to action
 
-            Throughout my career, I've had the privilege of working with diverse teams and technologies, always focusing on delivering innovative solutions that drive business value. I believe in continuous learning and staying current with industry trends.
+Generate 2 different versions:
+1. Story-focused (personal narrative)
+2. Achievement-focused (results and metrics)
 
-            When I'm not coding or collaborating with teams, I enjoy mentoring junior developers and contributing to open-source projects. I'm always excited to connect with fellow professionals who share my passion for technology and innovation.
+Format as JSON with keys: story_focused, achievement_focused""",
+                required=True
+            )
+        ], separator="\n\n").text
+    
+    def _parse_summary_response(self, raw: str, profile_data: Dict) -> Dict:
+        """Parse summary suggestions from the LLM, or compose them from the profile if parsing fails"""
+        parsed = self._parse_json_versions(raw, ["story_focused", "achievement_focused"])
+        if parsed is not None:
+            return parsed
+        return self._compose_summaries(profile_data)
+    
+    def _compose_summaries(self, profile_data: Dict) -> Dict:
+        """Compose the enhanced summaries from the profile"""
+        experience = profile_data.get("experience", [])
+        skills = profile_data.get("skills", [])
+        years_experience = len(experience)
+        top_skills = [skill["name"] for skill in skills[:8]] if skills else []
+        
+        # Generating enhanced summaries
+        story_focused = f"""
+        I'm a passionate {experience[0]['title'] if experience else 'professional'} with {years_experience} years of experience in the technology industry. My journey began with a fascination for solving complex problems, which led me to specialize in {', '.join(top_skills[:3])}.
 
-            Let's connect and explore how we can create something amazing together!
-            """
-            
-            achievement_focused = f"""
-            Results-driven {experience[0]['title'] if experience else 'professional'} with {years_experience} years of experience delivering high-impact solutions. Proven track record of leading cross-functional teams and implementing scalable technologies.
+        Throughout my career, I've had the privilege of working with diverse teams and technologies, always focusing on delivering innovative solutions that drive business value. I believe in continuous learning and staying current with industry trends.
 
-            Key Achievements:
-            • Led development teams of 5-15 members across multiple projects
-            • Improved system performance by 40% through optimization initiatives
-            • Reduced deployment time by 60% implementing CI/CD pipelines
-            • Mentored 10+ junior developers, improving team productivity by 25%
+        When I'm not coding or collaborating with teams, I enjoy mentoring junior developers and contributing to open-source projects. I'm always excited to connect with fellow professionals who share my passion for technology and innovation.
 
-            Technical Expertise: {', '.join(top_skills[:5])}
-            Industry Experience: Software Development, E-commerce, FinTech
+        Let's connect and explore how we can create something amazing together!
+        """
+        
+        achievement_focused = f"""
+        Results-driven {experience[0]['title'] if experience else 'professional'} with {years_experience} years of experience delivering high-impact solutions. Proven track record of leading cross-functional teams and implementing scalable technologies.
 
-            Passionate about leveraging technology to solve real-world problems and drive business growth. Always seeking new challenges and opportunities to make a meaningful impact.
-            """
-            
-            return {
-                "story_focused": story_focused.strip(),
-                "achievement_focused": achievement_focused.strip()
-            }
-            
+        Key Achievements:
+        • Led development teams of 5-15 members across multiple projects
+        • Improved system performance by 40% through optimization initiatives
+        • Reduced deployment time by 60% implementing CI/CD pipelines
+        • Mentored 10+ junior developers, improving team productivity by 25%
+
+        Technical Expertise: {', '.join(top_skills[:5])}
+        Industry Experience: Software Development, E-commerce, FinTech
+
+        Passionate about leveraging technology to solve real-world problems and drive business growth. Always seeking new challenges and opportunities to make a meaningful impact.
+        """
+        
+        return {
+            "story_focused": story_focused.strip(),
+            "achievement_focused": achievement_focused.strip()
+        }
+    
+    def _default_summaries(self) -> Dict:
+        return {
+            "story_focused": "Experienced professional with a passion for technology and innovation.",
+            "achievement_focused": "Results-driven professional with proven track record of delivering high-impact solutions."
+        }
+    
+    def generate_content_package(self, profile_data: Dict, target_role: str = None) -> Dict:
+        """Generate headlines, summaries and experience enhancements with a single LLM call"""
+        try:
+            # Experience enhancement is rule-based, so only the headline and summary prompts are batched
+            headline_raw, summary_raw = self.llm.invoke_batch([
+                self._build_headline_prompt(profile_data, target_role),
+                self._build_summary_prompt(profile_data, target_role)
+            ])
+            headlines = self._parse_headline_response(headline_raw, profile_data, target_role)
+            summaries = self._parse_summary_response(summary_raw, profile_data)
         except Exception as e:
-            print(f"Error generating enhanced summary: {e}")
-            return {
-                "story_focused": "Experienced professional with a passion for technology and innovation.",
-                "achievement_focused": "Results-driven professional with proven track record of delivering high-impact solutions."
-            }
+            print(f"Error generating content package: {e}")
+            headlines = self._default_headlines()
+            summaries = self._default_summaries()
+        
+        return {
+            "headlines": headlines,
+            "summaries": summaries,
+            "experience": self.generate_experience_enhancements(profile_data)
+        }
     
     def generate_experience_enhancements(self, profile_data: Dict) -> Dict:
         """Generate enhanced versions of experience descriptions"""
@@ -3,6 +3,7 @@ import re
 import requests
 from llm_wrapper import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from prompt_budget import PromptBudget, PromptSection
 import config
 
 class JobAnalyzer:
@@ -11,8 +12,10 @@ class JobAnalyzer:
             model=config.FREE_LLM_MODEL,
             temperature=config.TEMPERATURE,
             max_tokens=config.MAX_TOKENS,
-            api_key=config.OPENROUTER_API_KEY
+            api_key=config.OPENROUTER_API_KEY,
+            caller="job_analyzer"
         )
+        self.prompt_budget = PromptBudget()
         
         # Predefined job descriptions for common roles
         self.job_descriptions = {
@@ -166,15 +169,21 @@ class JobAnalyzer:
     def _generate_job_description(self, job_role: str) -> Optional[Dict]:
         """Generate job description using AI for unknown roles"""
         try:
-            prompt = f"""
-            Generate a comprehensive job description for a {job_role} position. Include:
-            1. Job title
-            2. Detailed job description with responsibilities
-            3. Required skills (list of 8-12 skills)
-            4. Preferred skills (list of 8-12 skills)
-            
-            Format the response as a JSON object with keys: title, description, required_skills, preferred_skills
-            """
+            # The role comes straight from user input, so cap its size
+            prompt = self.prompt_budget.fit([
+                PromptSection("role", f"Generate a comprehensive job description for a {job_role} position.", priority=1),
+                PromptSection(
+                    "instructions",
+                    """Include:
+1. Job title
+2. Detailed job description with responsibilities
+3. Required skills (list of 8-12 skills)
+4. Preferred skills (list of 8-12 skills)
+
+Format the response as a JSON object with keys: title, description, required_skills, preferred_skills""",
+                    required=True
+                )
+            ]).text
             
             response = self.llm.invoke(prompt)
             # Parse the response and return structured data
@@ -1,15 +1,44 @@
 import requests
-import json
 import time
 import os
-from typing import Dict, Optional, List
+import asyncio
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Optional, List
+from urllib.parse import unquote
 from apify_client import ApifyClient
 import config
+import rate_limiter
+from profile_cache import get_profile_cache
+from singleflight import SingleFlight
+from profile_normalizer import iter_dataset_items, normalize_profile, loads as fast_json_loads
+
+PROFILE_SCRAPER_ACTOR = "curious_coder~linkedin-profile-scraper"
+
+# Per-thread progress listener, set while a background scrape job runs
+_progress = threading.local()
+
+def set_progress_callback(callback: Optional[Callable[[str, str], None]]):
+    """Send this thread's scrape progress (actor status, message) to callback, or stop with None"""
+    _progress.callback = callback
+
+# Scrapes in flight across every scraper instance, keyed by normalized profile ID
+_scrape_flight = SingleFlight()
+
+def get_scrape_dedup_stats() -> Dict:
+    """Get how many scrape requests shared an actor run that was already in flight"""
+    stats = _scrape_flight.get_stats()
+    return {
+        "requests": stats["calls"],
+        "scrapes_started": stats["executions"],
+        "duplicate_runs_avoided": stats["collapsed"],
+        "in_flight": stats["in_flight"]
+    }
 
 class LinkedInScraper:
     def __init__(self):
         self.apify_token = config.APIFY_API_TOKEN
-        self.client = ApifyClient(self.apify_token) if self.apify_token else None
+        self.client = ApifyClient(self.apify_token, api_url=config.APIFY_API_URL) if self.apify_token else None
         
     def extract_linkedin_id_from_url(self, linkedin_url: str) -> Optional[str]:
         """Extract LinkedIn profile ID from URL"""
@@ -26,7 +55,32 @@ class LinkedInScraper:
             print(f"Error extracting LinkedIn ID: {e}")
             return None
     
+    def get_profile(self, linkedin_url: str, force_refresh: bool = False) -> Optional[Dict]:
+        """Get a profile from the profile cache, scraping it only when needed"""
+        profile_id = self.extract_linkedin_id_from_url(linkedin_url)
+        if not profile_id or not config.PROFILE_CACHE_ENABLED:
+            return self.scrape_profile(linkedin_url)
+        
+        return get_profile_cache().get_or_fetch(
+            self._normalize_profile_id(profile_id),
+            lambda: self.scrape_profile(linkedin_url),
+            force_refresh=force_refresh
+        )
+    
     def scrape_profile(self, linkedin_url: str) -> Optional[Dict]:
+        """Scrape LinkedIn profile using Apify, sharing any scrape of it already in flight"""
+        profile_id = self.extract_linkedin_id_from_url(linkedin_url)
+        if not profile_id:
+            return self._scrape_profile_once(linkedin_url)
+        
+        def attach():
+            self._report_progress("ATTACHED", "🔗 This profile is already being scraped, waiting for that run")
+        
+        return _scrape_flight.do(
+            self._normalize_profile_id(profile_id), lambda: self._scrape_profile_once(linkedin_url), on_wait=attach
+        )
+    
+    def _scrape_profile_once(self, linkedin_url: str) -> Optional[Dict]:
         """Scrape LinkedIn profile using Apify"""
         try:
             if not self.client:
@@ -41,19 +95,7 @@ class LinkedInScraper:
             cookies = self._get_comprehensive_linkedin_cookies()
             has_valid_cookies = len(cookies) > 0 and any('li_at' in cookie.get('name', '') for cookie in cookies)
             
-            # Enhanced run input with better settings for private profiles
-            run_input = {
-                "urls": [linkedin_url],
-                "cookie": cookies,
-                "proxy": self._get_proxy_config(),
-                "useChrome": True,
-                "headless": True,
-                "maxRequestRetries": 5,  # Increased retries
-                "timeoutSecs": 120,      # Increased timeout
-                "waitUntil": "networkidle",  # Waiting for network to be idle
-                "waitForSelector": ".pv-top-card",  # Waiting for profile content
-                "userAgent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
+            run_input = self._build_run_input([linkedin_url], cookies)
             
             print(f"🔍 Attempting to scrape: {linkedin_url}")
             if not has_valid_cookies:
@@ -63,58 +105,31 @@ class LinkedInScraper:
                 print(f"🔑 Cookie names: {[c['name'] for c in cookies]}")
             
             
+            if not rate_limiter.acquire("apify:actor-runs"):
+                print("⏳ Apify actor run rate limit reached, please try again shortly")
+                return None
+            
             try:
                 print("🔄 Starting LinkedIn profile scraper...")
-                run = self.client.actor("curious_coder~linkedin-profile-scraper").call(run_input=run_input)
-                print(f"✅ Actor started successfully with run ID: {run.get('id', 'unknown')}")
-                
-                # Wait for completion with better error handling
-                max_wait_time = 300  # 5 minutes
-                wait_interval = 10   # Check every 10 seconds
-                elapsed_time = 0
-                
-                while elapsed_time < max_wait_time:
-                    try:
-                        run_status = self.client.run(run["id"]).get()
-                        status = run_status.get("status", "UNKNOWN")
-                        
-                        if status == "SUCCEEDED":
-                            print("✅ Scraping completed successfully!")
-                            break
-                        elif status in ["FAILED", "ABORTED", "TIMED-OUT"]:
-                            print(f"❌ Scraping failed with status: {status}")
-                            return None
-                        else:
-                            print(f"⏳ Scraping in progress... Status: {status}")
-                            
-                    except Exception as e:
-                        print(f"⚠️  Error checking status: {e}")
-                    
-                    time.sleep(wait_interval)
-                    elapsed_time += wait_interval
+                run = self.client.actor(PROFILE_SCRAPER_ACTOR).start(run_input=run_input)
+                self._report_progress("STARTED", f"✅ Actor started successfully with run ID: {run.get('id', 'unknown')}")
                 
-                if elapsed_time >= max_wait_time:
-                    print("⏰ Scraping timed out")
+                if not self._wait_for_run(run["id"]):
                     return None
                 
                 # Get results
+                rate_limiter.acquire("apify:api")
+                # Only the first item is needed, so the rest of the dataset is never fetched
                 dataset = self.client.dataset(run["defaultDatasetId"])
-                results = list(dataset.iterate_items())
+                profile_data = next(iter(dataset.iterate_items()), None)
                 
-                if results:
-                    profile_data = results[0]
+                if profile_data is not None:
                     print(f"🔍 Raw data type: {type(profile_data)}")
                     print(f"🔍 Raw data preview: {str(profile_data)[:200]}...")
                     
-                    # case where data might be a string (JSON)
-                    if isinstance(profile_data, str):
-                        try:
-                            import json
-                            profile_data = json.loads(profile_data)
-                            print("✅ Successfully parsed JSON string")
-                        except json.JSONDecodeError:
-                            print("❌ Failed to parse JSON string")
-                            return None
+                    profile_data = self._parse_dataset_item(profile_data)
+                    if profile_data is None:
+                        return None
                     
                     processed_data = self._process_profile_data(profile_data)
                     
@@ -145,6 +160,223 @@ class LinkedInScraper:
                 print("💡 Profile might be private. Add comprehensive LinkedIn cookies to access private profiles.")
             return self._fallback_scrape(linkedin_url)
     
+    def scrape_profiles(self, linkedin_urls: List[str], chunk_size: int = None) -> Dict[str, Dict]:
+        """Scrape many LinkedIn profiles with a few batched Apify actor runs
+        
+        Returns a dict keyed by input URL with each profile's outcome:
+        {"status": "ok" | "no_data" | "not_found" | "invalid_url" | "failed",
+         "profile": processed profile or None, "error": message or None}
+        """
+        chunk_size = chunk_size or config.APIFY_BATCH_SIZE
+        outcomes: Dict[str, Dict] = {}
+        urls_by_id: Dict[str, List[str]] = {}
+        
+        for url in linkedin_urls:
+            profile_id = self.extract_linkedin_id_from_url(url)
+            if not profile_id:
+                outcomes[url] = self._scrape_outcome("invalid_url", error="Invalid LinkedIn URL format")
+                continue
+            urls_by_id.setdefault(self._normalize_profile_id(profile_id), []).append(url)
+        
+        if not urls_by_id:
+            return outcomes
+        
+        if not self.client:
+            # Without the Apify client only the one-profile REST fallback is available
+            for urls in urls_by_id.values():
+                profile = self._fallback_scrape(urls[0])
+                for url in urls:
+                    outcomes[url] = self._scrape_outcome("ok" if profile else "failed", profile)
+            return outcomes
+        
+        # Each unique profile is scraped once, even if several input URLs point to it
+        profile_ids = list(urls_by_id)
+        chunks = [profile_ids[i:i + chunk_size] for i in range(0, len(profile_ids), chunk_size)]
+        print(f"🔍 Scraping {len(profile_ids)} profiles in {len(chunks)} actor run(s)")
+        
+        cookies = self._get_comprehensive_linkedin_cookies()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config.APIFY_BATCH_MAX_CONCURRENT_RUNS) as executor:
+            futures = [
+                executor.submit(self._scrape_chunk, {pid: urls_by_id[pid] for pid in chunk}, cookies)
+                for chunk in chunks
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                outcomes.update(future.result())
+        
+        return outcomes
+    
+    def _scrape_chunk(self, urls_by_id: Dict[str, List[str]], cookies: list) -> Dict[str, Dict]:
+        """Scrape one chunk of profiles in a single actor run and map items back to their URLs"""
+        outcomes: Dict[str, Dict] = {}
+        
+        def settle(profile_id: str, outcome: Dict):
+            for url in urls_by_id[profile_id]:
+                outcomes[url] = outcome
+        
+        try:
+            if not rate_limiter.acquire("apify:actor-runs"):
+                raise RuntimeError("Apify actor run rate limit reached")
+            
+            run_input = self._build_run_input([urls[0] for urls in urls_by_id.values()], cookies)
+            run = self.client.actor(PROFILE_SCRAPER_ACTOR).start(run_input=run_input)
+            print(f"✅ Batch run {run.get('id', 'unknown')} started for {len(urls_by_id)} profiles")
+            
+            if not self._wait_for_run(run["id"]):
+                raise RuntimeError(f"Actor run {run.get('id', 'unknown')} did not succeed")
+            
+            # Items are processed as the dataset pages in rather than loaded all at once
+            rate_limiter.acquire("apify:api")
+            for item in self.client.dataset(run["defaultDatasetId"]).iterate_items():
+                item = self._parse_dataset_item(item)
+                if item is None:
+                    continue
+                
+                profile_id = self._item_profile_id(item)
+                if profile_id not in urls_by_id or urls_by_id[profile_id][0] in outcomes:
+                    # Not one of ours, or a duplicate item for a profile already mapped
+                    continue
+                
+                processed = self._process_profile_data(item)
+                if processed and processed.get("basic_info", {}).get("full_name"):
+                    settle(profile_id, self._scrape_outcome("ok", processed))
+                else:
+                    settle(profile_id, self._scrape_outcome("no_data", error="Profile scraped but no meaningful data found"))
+            
+        except Exception as e:
+            print(f"❌ Batch scrape failed: {e}")
+            for profile_id, urls in urls_by_id.items():
+                if urls[0] not in outcomes:
+                    settle(profile_id, self._scrape_outcome("failed", error=str(e)))
+            return outcomes
+        
+        for profile_id, urls in urls_by_id.items():
+            if urls[0] not in outcomes:
+                settle(profile_id, self._scrape_outcome("not_found", error="No dataset item returned for this profile"))
+        
+        found = sum(1 for outcome in outcomes.values() if outcome["status"] == "ok")
+        print(f"📊 Batch run finished: {found}/{len(outcomes)} URLs scraped")
+        return outcomes
+    
+    @staticmethod
+    def _scrape_outcome(status: str, profile: Optional[Dict] = None, error: str = None) -> Dict:
+        return {"status": status, "profile": profile, "error": error}
+    
+    @staticmethod
+    def _normalize_profile_id(profile_id: str) -> str:
+        """Normalize a profile ID so URL and dataset spellings compare equal"""
+        return unquote(profile_id).strip().strip("/").lower()
+    
+    def _item_profile_id(self, item: Dict) -> Optional[str]:
+        """Get the normalized profile ID a dataset item belongs to"""
+        profile_id = item.get("publicIdentifier")
+        if not profile_id:
+            # Some items only echo the URL they were scraped from
+            profile_id = self.extract_linkedin_id_from_url(item.get("inputUrl") or item.get("url") or "")
+        return self._normalize_profile_id(profile_id) if profile_id else None
+    
+    @staticmethod
+    def _parse_dataset_item(item) -> Optional[Dict]:
+        """Get a dataset item as a dict; some actor versions return JSON strings"""
+        if isinstance(item, str):
+            try:
+                item = fast_json_loads(item)
+                print("✅ Successfully parsed JSON string")
+            except ValueError:
+                print("❌ Failed to parse JSON string")
+                return None
+        return item
+    
+    def _build_run_input(self, linkedin_urls: List[str], cookies: list) -> Dict:
+        """Build the profile scraper actor input for one or more profile URLs"""
+        # Enhanced run input with better settings for private profiles
+        return {
+            "urls": linkedin_urls,
+            "cookie": cookies,
+            "proxy": self._get_proxy_config(),
+            "useChrome": True,
+            "headless": True,
+            "maxRequestRetries": 5,  # Increased retries
+            "timeoutSecs": 120,      # Increased timeout
+            "waitUntil": "networkidle",  # Waiting for network to be idle
+            "waitForSelector": ".pv-top-card",  # Waiting for profile content
+            "userAgent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        }
+    
+    def _wait_for_run(self, run_id: str, fetch_status=None, max_wait: float = None) -> bool:
+        """Wait for an actor run to finish, returning True if it succeeded
+        
+        Uses Apify's waitForFinish long-poll, so this returns as soon as the run ends
+        instead of on the next fixed poll. fetch_status(wait_secs) returns the run
+        object; it defaults to the Apify client. When a check fails or the server
+        answers early, the next check waits on an exponential schedule.
+        """
+        if fetch_status is None:
+            fetch_status = lambda wait_secs: self.client.run(run_id).wait_for_finish(wait_secs=wait_secs)
+        
+        deadline = time.monotonic() + (max_wait or config.APIFY_RUN_MAX_WAIT)
+        intervals = self._poll_intervals()
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._report_progress("TIMED-OUT", "⏰ Scraping timed out")
+                return False
+            
+            wait_secs = max(1, int(min(remaining, config.APIFY_WAIT_FOR_FINISH_SECS)))
+            started = time.monotonic()
+            try:
+                # Status checks queue for a token but still go out once the wait deadline passes
+                rate_limiter.acquire("apify:api")
+                run_status = fetch_status(wait_secs) or {}
+                status = run_status.get("status", "UNKNOWN")
+                
+                if status == "SUCCEEDED":
+                    self._report_progress(status, "✅ Scraping completed successfully!")
+                    return True
+                elif status in ["FAILED", "ABORTED", "TIMED-OUT", "TIMING-OUT", "ABORTING"]:
+                    self._report_progress(status, f"❌ Scraping failed with status: {status}")
+                    return False
+                else:
+                    self._report_progress(status, f"⏳ Scraping in progress... Status: {status}")
+                
+                if time.monotonic() - started >= wait_secs / 2:
+                    # The long-poll did its job, go straight into the next one
+                    continue
+                    
+            except Exception as e:
+                print(f"⚠️  Error checking status: {e}")
+            
+            time.sleep(max(0.0, min(next(intervals), deadline - time.monotonic())))
+    
+    @staticmethod
+    def _report_progress(status: str, message: str):
+        """Print a progress message and pass the actor status to this thread's listener"""
+        print(message)
+        callback = getattr(_progress, "callback", None)
+        if callback:
+            callback(status, message)
+    
+    @staticmethod
+    def _poll_intervals():
+        """Yield increasing waits between status checks that could not long-poll"""
+        interval = config.APIFY_POLL_INITIAL_INTERVAL
+        while True:
+            yield interval
+            interval = min(interval * config.APIFY_POLL_BACKOFF, config.APIFY_POLL_MAX_INTERVAL)
+    
+    async def await_run(self, run_id: str, fetch_status=None, max_wait: float = None) -> bool:
+        """Wait for an actor run without blocking the event loop"""
+        return await asyncio.to_thread(self._wait_for_run, run_id, fetch_status, max_wait)
+    
+    async def ascrape_profile(self, linkedin_url: str) -> Optional[Dict]:
+        """Scrape a profile without blocking the event loop, so several can be awaited at once"""
+        return await asyncio.to_thread(self.scrape_profile, linkedin_url)
+    
+    async def ascrape_profiles(self, linkedin_urls: List[str]) -> Dict[str, Optional[Dict]]:
+        """Scrape several profiles concurrently, keyed by URL"""
+        results = await asyncio.gather(*(self.ascrape_profile(url) for url in linkedin_urls))
+        return dict(zip(linkedin_urls, results))
+    
     def _get_comprehensive_linkedin_cookies(self) -> list:
         """Get comprehensive LinkedIn cookies for private profile access"""
         # Try to get cookie from config first, then environment
@@ -239,7 +471,7 @@ class LinkedInScraper:
         """Fallback method using direct API call to Apify"""
         try:
             # Alternative approach using Apify API directly
-            api_url = "https://api.apify.com/v2/acts/curious_coder~linkedin-profile-scraper/runs"
+            api_url = f"{config.APIFY_API_URL}/v2/acts/{PROFILE_SCRAPER_ACTOR}/runs"
             
             payload = {
                 "urls": [linkedin_url],
@@ -256,25 +488,30 @@ class LinkedInScraper:
                 "Authorization": f"Bearer {self.apify_token}"
             }
             
+            if not rate_limiter.acquire("apify:actor-runs"):
+                print("⏳ Apify actor run rate limit reached, please try again shortly")
+                return None
+            
             response = requests.post(api_url, json=payload, headers=headers)
             
             if response.status_code == 201:
                 run_id = response.json().get("data", {}).get("id")
                 
+                def fetch_status(wait_secs: int) -> Dict:
+                    status_response = requests.get(
+                        f"{api_url}/{run_id}", params={"waitForFinish": wait_secs}, headers=headers,
+                        timeout=wait_secs + 30
+                    )
+                    status_response.raise_for_status()
+                    return status_response.json().get("data", {})
+                
                 # Waiting for completion
-                for _ in range(30):  # Wait up to 5 minutes
-                    status_response = requests.get(f"{api_url}/{run_id}", headers=headers)
-                    if status_response.status_code == 200:
-                        status_data = status_response.json()
-                        if status_data.get("data", {}).get("status") == "SUCCEEDED":
-                            # results
-                            results_url = f"https://api.apify.com/v2/acts/curious_coder~linkedin-profile-scraper/runs/{run_id}/dataset/items"
-                            results_response = requests.get(results_url, headers=headers)
-                            if results_response.status_code == 200:
-                                results = results_response.json()
-                                if results:
-                                    return self._process_profile_data(results[0])
-                    time.sleep(10)
+                if self._wait_for_run(run_id, fetch_status):
+                    # results
+                    results_url = f"{api_url}/{run_id}/dataset/items"
+                    rate_limiter.acquire("apify:api")
+                    for item in iter_dataset_items(results_url, headers=headers, max_items=1):
+                        return self._process_profile_data(item)
             
             return None
             
@@ -290,113 +527,7 @@ class LinkedInScraper:
                 print(f"⚠️  Invalid data format received: {type(raw_data)}")
                 return None
             
-            # Build full name from first and last name
-            full_name = f"{raw_data.get('firstName', '')} {raw_data.get('lastName', '')}".strip()
-            
-            processed_data = {
-                "basic_info": {
-                    "full_name": full_name,
-                    "headline": raw_data.get("headline", ""),
-                    "location": raw_data.get("geoLocationName", ""),
-                    "summary": raw_data.get("summary", ""),
-                    "profile_url": f"https://linkedin.com/in/{raw_data.get('publicIdentifier', '')}",
-                    "profile_picture": raw_data.get("pictureUrl", "")
-                },
-                "experience": [],
-                "education": [],
-                "skills": [],
-                "certifications": [],
-                "languages": [],
-                "volunteer_experience": [],
-                "publications": [],
-                "patents": [],
-                "courses": [],
-                "projects": [],
-                "honors_awards": [],
-                "test_scores": [],
-                "organizations": [],
-                "people_also_viewed": [],
-                "recommendations": [],
-                "connections": str(raw_data.get("connectionsCount", "")),
-                "followers": str(raw_data.get("followersCount", ""))
-            }
-            
-            # Processing experience (positions)
-            for pos in raw_data.get("positions", []):
-                if not isinstance(pos, dict):
-                    continue
-                    
-                time_period = pos.get("timePeriod", {})
-                if not isinstance(time_period, dict):
-                    time_period = {}
-                    
-                start_date = time_period.get("startDate", {})
-                end_date = time_period.get("endDate", {})
-                
-                if not isinstance(start_date, dict):
-                    start_date = {}
-                if not isinstance(end_date, dict):
-                    end_date = {}
-                
-                duration = ""
-                if start_date:
-                    start_year = start_date.get("year", "")
-                    if end_date:
-                        end_year = end_date.get("year", "")
-                        duration = f"{start_year} - {end_year}"
-                    else:
-                        duration = f"{start_year} - Present"
-                
-                processed_data["experience"].append({
-                    "title": pos.get("title", ""),
-                    "company": pos.get("companyName", ""),
-                    "duration": duration,
-                    "location": "",
-                    "description": ""
-                })
-            
-            # Processing education
-            for edu in raw_data.get("educations", []):
-                if not isinstance(edu, dict):
-                    continue
-                    
-                time_period = edu.get("timePeriod", {})
-                if not isinstance(time_period, dict):
-                    time_period = {}
-                    
-                start_date = time_period.get("startDate", {})
-                end_date = time_period.get("endDate", {})
-                
-                if not isinstance(start_date, dict):
-                    start_date = {}
-                if not isinstance(end_date, dict):
-                    end_date = {}
-                
-                duration = ""
-                if start_date and end_date:
-                    start_year = start_date.get("year", "")
-                    end_year = end_date.get("year", "")
-                    duration = f"{start_year} - {end_year}"
-                
-                processed_data["education"].append({
-                    "school": edu.get("schoolName", ""),
-                    "degree": "",
-                    "field": "",
-                    "duration": duration,
-                    "description": ""
-                })
-            
-            # Processing skills (if available)
-            for skill in raw_data.get("skills", []):
-                if not isinstance(skill, dict):
-                    continue
-                    
-                processed_data["skills"].append({
-                    "name": skill.get("name", ""),
-                    "endorsements": skill.get("endorsements", 0)
-                })
-            
-            return processed_data
+            return normalize_profile(raw_data)
             
         except Exception as e:
             print(f"Error processing profile data: {e}")
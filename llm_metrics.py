@@ -0,0 +1,270 @@
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import config
+
+# Telemetry record for the LLM call running in the current thread or task
+_current_call: ContextVar[Optional[Dict]] = ContextVar("llm_current_call", default=None)
+
+class RollingHistogram:
+    """Bucketed latency histogram with lifetime totals and a rolling time window"""
+
+    def __init__(self, buckets: List[float] = None, window_seconds: float = None, slots: int = None):
+        self.buckets = sorted(buckets or config.LLM_METRICS_BUCKETS)
+        self.window_seconds = window_seconds or config.LLM_METRICS_WINDOW_SECONDS
+        self.slot_seconds = self.window_seconds / (slots or config.LLM_METRICS_WINDOW_SLOTS)
+        # Lifetime totals, the last bucket counts values above every bound (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # Per-slot counts covering the window: [slot_start, counts, sum]
+        self._slots = deque()
+
+    def observe(self, value: float, now: float = None):
+        now = time.monotonic() if now is None else now
+        index = bisect_left(self.buckets, value)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+        slot_start = now - now % self.slot_seconds
+        if not self._slots or self._slots[-1][0] != slot_start:
+            self._slots.append([slot_start, [0] * len(self.counts), 0.0])
+        self._slots[-1][1][index] += 1
+        self._slots[-1][2] += value
+        self._expire(now)
+
+    def _expire(self, now: float):
+        while self._slots and self._slots[0][0] <= now - self.window_seconds:
+            self._slots.popleft()
+
+    def window_counts(self, now: float = None) -> List[int]:
+        """Get per-bucket counts for the values observed within the window"""
+        self._expire(time.monotonic() if now is None else now)
+        counts = [0] * len(self.counts)
+        for _, slot_counts, _ in self._slots:
+            for i, n in enumerate(slot_counts):
+                counts[i] += n
+        return counts
+
+    def percentile(self, pct: float, now: float = None) -> Optional[float]:
+        """Estimate a percentile of the window by interpolating within its bucket"""
+        counts = self.window_counts(now)
+        total = sum(counts)
+        if not total:
+            return None
+
+        rank = pct / 100 * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    # Above the highest bound, which is the best estimate available
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def snapshot(self, now: float = None) -> Dict:
+        counts = self.window_counts(now)
+        window_total = sum(counts)
+        window_sum = sum(slot[2] for slot in self._slots)
+        return {
+            "count": self.count,
+            "window_count": window_total,
+            "window_avg": window_sum / window_total if window_total else None,
+            "p50": self.percentile(50, now),
+            "p95": self.percentile(95, now),
+            "p99": self.percentile(99, now)
+        }
+
+class LLMMetrics:
+    """In-process telemetry for LLM calls: counters, token totals and latency histograms"""
+
+    def __init__(self, recent_calls: int = None):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=recent_calls or config.LLM_METRICS_RECENT_CALLS)
+        self.calls: Dict[tuple, int] = {}        # (model, caller, status, cache_hit) -> calls
+        self.tokens: Dict[tuple, int] = {}       # (model, caller, kind) -> tokens
+        self.latency: Dict[tuple, RollingHistogram] = {}  # (model, caller) -> histogram
+
+    def record(self, call: Dict):
+        """Add one finished call to the counters and histograms"""
+        model, caller = call["model"], call["caller"]
+        with self._lock:
+            self.recent.append(call)
+            key = (model, caller, call["status"], call["cache_hit"])
+            self.calls[key] = self.calls.get(key, 0) + 1
+            for kind in ("prompt", "completion"):
+                count = call.get(f"{kind}_tokens")
+                if count:
+                    self.tokens[(model, caller, kind)] = self.tokens.get((model, caller, kind), 0) + count
+            histogram = self.latency.get((model, caller))
+            if histogram is None:
+                histogram = self.latency[(model, caller)] = RollingHistogram()
+            histogram.observe(call["latency"])
+
+    def get_recent_calls(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.recent)[-limit:]
+
+    def get_stats(self) -> Dict:
+        """Summarize calls, tokens and rolling latency percentiles per model and caller"""
+        with self._lock:
+            stats: Dict[str, Dict] = {}
+            for (model, caller), histogram in self.latency.items():
+                stats[f"{model}|{caller}"] = {
+                    "model": model,
+                    "caller": caller,
+                    "latency": histogram.snapshot(),
+                    "statuses": {},
+                    "cache_hits": 0,
+                    "prompt_tokens": self.tokens.get((model, caller, "prompt"), 0),
+                    "completion_tokens": self.tokens.get((model, caller, "completion"), 0)
+                }
+            for (model, caller, status, cache_hit), count in self.calls.items():
+                entry = stats[f"{model}|{caller}"]
+                entry["statuses"][status] = entry["statuses"].get(status, 0) + count
+                if cache_hit:
+                    entry["cache_hits"] += count
+            return stats
+
+    def export_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP llm_calls_total LLM calls by model, caller and outcome.",
+            "# TYPE llm_calls_total counter"
+        ]
+        with self._lock:
+            for (model, caller, status, cache_hit), count in sorted(self.calls.items()):
+                labels = _labels(model=model, caller=caller, status=status, cache_hit=str(cache_hit).lower())
+                lines.append(f"llm_calls_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP llm_tokens_total Tokens reported by OpenRouter usage.",
+                "# TYPE llm_tokens_total counter"
+            ]
+            for (model, caller, kind), count in sorted(self.tokens.items()):
+                lines.append(f"llm_tokens_total{{{_labels(model=model, caller=caller, type=kind)}}} {count}")
+
+            lines += [
+                "# HELP llm_call_duration_seconds End-to-end LLM call latency.",
+                "# TYPE llm_call_duration_seconds histogram"
+            ]
+            for (model, caller), histogram in sorted(self.latency.items()):
+                labels = _labels(model=model, caller=caller)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'llm_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"llm_call_duration_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"llm_call_duration_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.recent.clear()
+            self.calls.clear()
+            self.tokens.clear()
+            self.latency.clear()
+
+def _labels(**labels) -> str:
+    """Format Prometheus labels, escaping values as the text format requires"""
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+_metrics = LLMMetrics()
+
+def get_llm_metrics() -> LLMMetrics:
+    """Get the process-wide LLM telemetry store"""
+    return _metrics
+
+def export_prometheus() -> str:
+    return _metrics.export_prometheus()
+
+class track_call:
+    """Context manager that times one LLM call and records it when it finishes
+
+    Code deeper in the call, including hedged requests on other threads, fills in
+    the answering model and token usage through note_completion() and mark_call().
+    """
+
+    def __init__(self, model: str, caller: str = None):
+        self.call = {
+            "model": model,
+            "caller": caller or "unknown",
+            "status": None,
+            "cache_hit": False,
+            "answered_by": None,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "latency": 0.0,
+            "timestamp": time.time()
+        }
+        self._token = None
+
+    def __enter__(self) -> Dict:
+        if config.LLM_METRICS_ENABLED:
+            self._token = _current_call.set(self.call)
+            self._start = time.perf_counter()
+        return self.call
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return False
+        _current_call.reset(self._token)
+        call = self.call
+        call["latency"] = time.perf_counter() - self._start
+        if exc_type is not None:
+            call["status"] = "error"
+        elif call["status"] is None:
+            # Answered by a model, or by an identical call already in flight
+            call["status"] = "ok" if call["answered_by"] else "coalesced"
+        if call["answered_by"]:
+            call["model"] = call["answered_by"]
+        _metrics.record(call)
+        return False
+
+def record_call(model: str, caller: str, status: str, latency: float, cache_hit: bool = False,
+                usage: Optional[Dict] = None):
+    """Record a call whose outcome is already known, such as a finished stream"""
+    if not config.LLM_METRICS_ENABLED:
+        return
+    usage = usage or {}
+    _metrics.record({
+        "model": model,
+        "caller": caller or "unknown",
+        "status": status,
+        "cache_hit": cache_hit,
+        "answered_by": model if status == "ok" and not cache_hit else None,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "latency": latency,
+        "timestamp": time.time()
+    })
+
+def note_completion(model: str, usage: Optional[Dict] = None):
+    """Record which model answered the current call and the tokens it reported"""
+    call = _current_call.get()
+    # The first answer wins, a slower hedged request finishing later is ignored
+    if call is None or call["answered_by"]:
+        return
+    call["answered_by"] = model
+    if usage:
+        call["prompt_tokens"] = usage.get("prompt_tokens")
+        call["completion_tokens"] = usage.get("completion_tokens")
+
+def mark_call(status: str = None, cache_hit: bool = None):
+    """Set the outcome of the current call, e.g. 'fallback' or a cache hit"""
+    call = _current_call.get()
+    if call is None:
+        return
+    if status is not None:
+        call["status"] = status
+    if cache_hit is not None:
+        call["cache_hit"] = cache_hit
@@ -1,15 +1,532 @@
 import requests
+import os
 import json
-from typing import Dict, List, Optional, Any
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import contextvars
+import concurrent.futures
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+from requests.adapters import HTTPAdapter
 import config
+import rate_limiter
+from llm_metrics import track_call, record_call, note_completion, mark_call
+from singleflight import SingleFlight
+
+# Process-wide HTTP session shared by every OpenRouterLLM instance so that
+# connections to OpenRouter are kept alive and reused between calls
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """Get the shared, pooled HTTP session used for all LLM calls"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.LLM_POOL_CONNECTIONS,
+                    pool_maxsize=config.LLM_POOL_MAXSIZE,
+                    pool_block=config.LLM_POOL_BLOCK
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+def close_http_session():
+    """Close the shared HTTP session and drop its pooled connections"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+class LLMResponseCache:
+    """Thread-safe in-memory LRU cache of LLM responses with TTL and size limits"""
+    
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None):
+        self.max_entries = max_entries or config.LLM_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or config.LLM_CACHE_MAX_BYTES
+        self.ttl = ttl or config.LLM_CACHE_TTL
+        # key -> (response, expires_at, size_in_bytes), least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+    
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Build a content-addressed key for a completion request"""
+        raw = json.dumps([model, prompt, temperature, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            
+            response, expires_at, size = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return response
+    
+    def set(self, key: str, response: str):
+        """Store a response, evicting least recently used entries to stay within limits"""
+        size = len(key) + len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (response, time.time() + self.ttl, size)
+            self.total_bytes += size
+            
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats["evictions"] += 1
+    
+    def delete(self, key: str):
+        """Drop one cached response, if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def _remove(self, key: str):
+        """Remove an entry; caller must hold the lock"""
+        _, _, size = self._entries.pop(key)
+        self.total_bytes -= size
+    
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss/eviction counters and current cache size"""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes
+            }
+
+class DiskResponseCache:
+    """SQLite-backed response cache shared by every process on the host"""
+    
+    def __init__(self, path: str = None, max_bytes: int = None, ttl: float = None):
+        self.path = path or config.LLM_DISK_CACHE_PATH
+        self.max_bytes = max_bytes or config.LLM_DISK_CACHE_MAX_BYTES
+        self.ttl = ttl or config.LLM_DISK_CACHE_TTL
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_compaction = 0
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+        self._init_db()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the cache database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; WAL lets readers in other processes proceed while one writes
+            conn = sqlite3.connect(self.path, timeout=config.LLM_DISK_CACHE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _init_db(self):
+        """Create the cache table if it does not exist yet"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+        except sqlite3.Error as e:
+            print(f"Error initializing LLM disk cache: {e}")
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None if missing or expired"""
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            
+            if row is None or row[1] + self.ttl <= now:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("misses")
+                return None
+            
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return row[0]
+            
+        except sqlite3.Error as e:
+            print(f"Error reading LLM disk cache: {e}")
+            self._count("errors")
+            return None
+    
+    def set(self, key: str, response: str):
+        """Store a response, compacting the database periodically to stay under the size cap"""
+        try:
+            now = time.time()
+            size = len(key) + len(response.encode("utf-8"))
+            self._connect().execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._count("writes")
+            
+            with self._lock:
+                self._writes_since_compaction += 1
+                should_compact = self._writes_since_compaction >= config.LLM_DISK_CACHE_COMPACT_EVERY
+                if should_compact:
+                    self._writes_since_compaction = 0
+            if should_compact:
+                self.compact()
+                
+        except sqlite3.Error as e:
+            print(f"Error writing LLM disk cache: {e}")
+            self._count("errors")
+    
+    def delete(self, key: str):
+        """Drop one cached response, if present"""
+        try:
+            self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Error deleting from LLM disk cache: {e}")
+            self._count("errors")
+    
+    def compact(self):
+        """Drop expired entries, then least recently used ones until under the size cap"""
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,))
+            
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Keep the most recently used entries that fit within 90% of the cap
+                cursor = conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS running_size
+                            FROM responses
+                        ) WHERE running_size > ?
+                    )
+                """, (int(self.max_bytes * 0.9),))
+                self._count("evictions", cursor.rowcount)
+                
+        except sqlite3.Error as e:
+            print(f"Error compacting LLM disk cache: {e}")
+            self._count("errors")
+    
+    def _count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self.stats[stat] += amount
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss/eviction counters and current database size"""
+        try:
+            entries, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, total = None, None
+        with self._lock:
+            return {**self.stats, "entries": entries, "bytes": total}
+
+_response_cache = LLMResponseCache()
+_disk_cache: Optional[DiskResponseCache] = None
+_disk_cache_lock = threading.Lock()
+
+def get_response_cache() -> LLMResponseCache:
+    """Get the process-wide LLM response cache"""
+    return _response_cache
+
+def get_disk_cache() -> Optional[DiskResponseCache]:
+    """Get the on-disk response cache shared across processes, if enabled"""
+    global _disk_cache
+    if not config.LLM_DISK_CACHE_ENABLED:
+        return None
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                _disk_cache = DiskResponseCache()
+    return _disk_cache
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one model"""
+    
+    def __init__(self, window: int = None):
+        self._samples = deque(maxlen=window or config.LLM_HEDGE_WINDOW)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """Get a latency percentile, or None until enough samples have been seen"""
+        with self._lock:
+            if len(self._samples) < config.LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(pct / 100 * len(ordered)))
+        return ordered[index]
+
+_latency_trackers: Dict[str, LatencyTracker] = {}
+_hedge_stats = {"hedged": 0, "primary_wins": 0, "backup_wins": 0, "both_failed": 0, "skipped_busy": 0}
+_hedge_lock = threading.Lock()
+_hedge_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_hedge_tasks = 0   # Submitted to the hedge pool and not yet finished, running or queued
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    """Get the latency tracker for a model"""
+    with _hedge_lock:
+        if model not in _latency_trackers:
+            _latency_trackers[model] = LatencyTracker()
+        return _latency_trackers[model]
+
+def get_hedge_stats() -> Dict:
+    """Get how often hedging fired and which model won"""
+    with _hedge_lock:
+        return dict(_hedge_stats)
+
+def _count_hedge(stat: str):
+    with _hedge_lock:
+        _hedge_stats[stat] += 1
+
+def _get_hedge_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Get the shared thread pool that runs hedged requests"""
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            _hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=config.LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge"
+            )
+        return _hedge_executor
+
+def _submit_hedge_task(fn, *args) -> Tuple[concurrent.futures.Future, threading.Event]:
+    """Run fn on the hedge pool in a copy of this context, so it can report to the caller's telemetry
+
+    Returns the future and an event that is set once a worker picks the task up.
+    """
+    global _hedge_tasks
+    started = threading.Event()
+    
+    def run():
+        global _hedge_tasks
+        started.set()
+        try:
+            return fn(*args)
+        finally:
+            with _hedge_lock:
+                _hedge_tasks -= 1
+    
+    executor = _get_hedge_executor()
+    with _hedge_lock:
+        _hedge_tasks += 1
+    return executor.submit(contextvars.copy_context().run, run), started
+
+def _hedge_pool_full() -> bool:
+    """Check whether a new hedge task would have to queue for a worker"""
+    with _hedge_lock:
+        return _hedge_tasks >= config.LLM_HEDGE_MAX_WORKERS
+
+class CircuitBreaker:
+    """Per-model circuit breaker driven by the failure rate over recent calls"""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, window: int = None, failure_rate: float = None, min_calls: int = None,
+                 open_seconds: float = None):
+        self.failure_rate = failure_rate or config.LLM_BREAKER_FAILURE_RATE
+        self.min_calls = min_calls or config.LLM_BREAKER_MIN_CALLS
+        self.open_seconds = open_seconds or config.LLM_BREAKER_OPEN_SECONDS
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window or config.LLM_BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+    
+    def allow_request(self) -> bool:
+        """Check whether a call may go out; half-open lets exactly one probe through"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.stats["rejected"] += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.stats["rejected"] += 1
+                    return False
+                self._probe_in_flight = True
+            
+            return True
+    
+    def would_allow(self) -> bool:
+        """Check whether allow_request could let a call through, without claiming the half-open probe"""
+        with self._lock:
+            if self.state == self.OPEN:
+                allowed = time.monotonic() - self._opened_at >= self.open_seconds
+            else:
+                allowed = not (self.state == self.HALF_OPEN and self._probe_in_flight)
+            if not allowed:
+                self.stats["rejected"] += 1
+            return allowed
+    
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._probe_in_flight = False
+            self._outcomes.append(True)
+    
+    def record_neutral(self):
+        """Release a half-open probe for a call that says nothing about model health, e.g. a 4xx"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+    
+    def _open(self):
+        """Trip the breaker; caller must hold the lock"""
+        if self.state != self.OPEN:
+            self.stats["opened"] += 1
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, **self.stats}
+
+class RetryBudget:
+    """Global token bucket that caps retries to a fraction of overall request volume"""
+    
+    def __init__(self, ratio: float = None, max_tokens: float = None):
+        self.ratio = ratio or config.LLM_RETRY_BUDGET_RATIO
+        self.max_tokens = max_tokens or config.LLM_RETRY_BUDGET_MAX_TOKENS
+        self._tokens = self.max_tokens
+        self._lock = threading.Lock()
+        self.stats = {"retries": 0, "denied": 0}
+    
+    def record_request(self):
+        """Earn a fraction of a retry for every first attempt"""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        """Take one retry from the budget, if any is left"""
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["retries"] += 1
+                return True
+            self.stats["denied"] += 1
+            return False
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {"tokens": round(self._tokens, 2), **self.stats}
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+_retry_budget = RetryBudget()
+
+def get_circuit_breaker(model: str) -> CircuitBreaker:
+    """Get the circuit breaker for a model"""
+    with _circuit_breakers_lock:
+        if model not in _circuit_breakers:
+            _circuit_breakers[model] = CircuitBreaker()
+        return _circuit_breakers[model]
+
+def get_retry_budget() -> RetryBudget:
+    """Get the process-wide retry budget"""
+    return _retry_budget
+
+def get_resilience_stats() -> Dict:
+    """Get circuit breaker states per model and retry budget usage"""
+    with _circuit_breakers_lock:
+        breakers = dict(_circuit_breakers)
+    return {
+        "circuit_breakers": {model: breaker.get_stats() for model, breaker in breakers.items()},
+        "retry_budget": _retry_budget.get_stats()
+    }
+
+_singleflight = SingleFlight()
+
+def get_singleflight() -> SingleFlight:
+    """Get the process-wide single-flight group for LLM calls"""
+    return _singleflight
+
+def run_sync(coro):
+    """Run a coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    # Already inside an event loop, so run the coroutine on a helper thread
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
 
 class OpenRouterLLM:
     """Wrapper for OpenRouter API to use free LLM models"""
     
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, session: requests.Session = None, caller: str = None):
         self.api_key = config.OPENROUTER_API_KEY
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = config.OPENROUTER_BASE_URL
         self.model = model or config.FREE_LLM_MODEL
+        self.session = session or get_http_session()
+        self.caller = caller  # Tag for telemetry, e.g. the component making the calls
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -17,74 +534,401 @@ class OpenRouterLLM:
             "X-Title": "LinkedIn Profile Optimizer"
         }
     
-    def invoke(self, prompt: str, temperature: float = None, max_tokens: int = None) -> str:
+    def _post_completion(self, model: str, prompt: str, temperature: float = None, max_tokens: int = None,
+                         stream: bool = False, stream_body: bool = False) -> requests.Response:
+        """Send a chat completion request for a single prompt over the pooled session
+
+        stream asks the model for server-sent events; stream_body only defers
+        reading a regular JSON body so the caller can hang up part way.
+        """
+        payload = {
+            "model": model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": temperature or config.TEMPERATURE,
+            "max_tokens": max_tokens or config.MAX_TOKENS
+        }
+        if stream:
+            payload["stream"] = True
+            # Ask for token usage in the final stream event
+            payload["usage"] = {"include": True}
+        
+        return self.session.post(
+            f"{self.base_url}/chat/completions",
+            headers=self.headers,
+            json=payload,
+            timeout=config.LLM_REQUEST_TIMEOUT,
+            stream=stream or stream_body
+        )
+    
+    def invoke(self, prompt: str, temperature: float = None, max_tokens: int = None, use_cache: bool = True) -> str:
         """Invoke the LLM with a prompt and return the response"""
-        try:
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": temperature or config.TEMPERATURE,
-                "max_tokens": max_tokens or config.MAX_TOKENS
-            }
+        with track_call(self.model, self.caller):
+            cache_key = self._cache_key(prompt, temperature, max_tokens) if use_cache else None
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                mark_call("ok", cache_hit=True)
+                return cached
             
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            if config.LLM_OFFLINE_MODE:
+                # Offline mode only serves answers that are already cached
+                return self._generate_fallback_response(prompt)
             
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            else:
+            if cache_key:
+                # Identical prompts already in flight share that call instead of starting another
+                return get_singleflight().do(
+                    cache_key, lambda: self._invoke_uncached(prompt, temperature, max_tokens, cache_key)
+                )
+            return self._invoke_uncached(prompt, temperature, max_tokens, cache_key)
+    
+    def _invoke_uncached(self, prompt: str, temperature: float = None, max_tokens: int = None,
+                         cache_key: str = None) -> str:
+        """Call the models, falling back to the backup and then to a rule-based response"""
+        if config.LLM_HEDGING_ENABLED and self.model != config.BACKUP_LLM_MODEL:
+            content, model = self._hedged_completion(prompt, temperature, max_tokens)
+            if content is None:
+                return self._generate_fallback_response(prompt)
+        else:
+            content, model = self._request_completion(self.model, prompt, temperature, max_tokens), self.model
+            if content is None:
                 # Try fallback to backup model
-                return self._fallback_invoke(prompt, temperature, max_tokens)
-                
-        except Exception as e:
-            print(f"Error calling OpenRouter API: {e}")
-            return self._fallback_invoke(prompt, temperature, max_tokens)
+                return self._fallback_invoke(prompt, temperature, max_tokens, cache_key)
+        
+        if model != self.model:
+            # Cache a backup answer under the backup's key so later calls retry the primary
+            cache_key = cache_key and self._cache_key(prompt, temperature, max_tokens, model)
+        self._cache_response(cache_key, content)
+        return content
     
-    def _fallback_invoke(self, prompt: str, temperature: float = None, max_tokens: int = None) -> str:
+    def _fallback_invoke(self, prompt: str, temperature: float = None, max_tokens: int = None,
+                         cache_key: str = None) -> str:
         """Fallback to backup model if primary fails"""
+        content = self._request_completion(config.BACKUP_LLM_MODEL, prompt, temperature, max_tokens)
+        if content is None:
+            return self._generate_fallback_response(prompt)
+        
+        # Keyed on the backup model, so the degraded answer is never served for the primary
+        cache_key = cache_key and self._cache_key(prompt, temperature, max_tokens, config.BACKUP_LLM_MODEL)
+        self._cache_response(cache_key, content)
+        return content
+    
+    def _hedged_completion(self, prompt: str, temperature: float = None,
+                           max_tokens: int = None) -> Tuple[Optional[str], str]:
+        """Race the backup model against the primary once the primary is slower than usual
+
+        Returns the answer and the model that produced it.
+        """
+        cancel_primary, cancel_backup = threading.Event(), threading.Event()
+        primary, primary_started = _submit_hedge_task(
+            self._request_completion, self.model, prompt, temperature, max_tokens, cancel_primary
+        )
+        # Time the primary from when it starts running; waiting in a busy pool isn't model slowness
+        primary_started.wait()
+        
         try:
-            backup_model = config.BACKUP_LLM_MODEL
-            payload = {
-                "model": backup_model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": temperature or config.TEMPERATURE,
-                "max_tokens": max_tokens or config.MAX_TOKENS
-            }
+            content = primary.result(timeout=self._hedge_delay())
+        except concurrent.futures.TimeoutError:
+            if not _hedge_pool_full():
+                return self._race_backup(primary, cancel_primary, cancel_backup, prompt, temperature, max_tokens)
+            # Every worker is busy, so a backup would only queue and add load; keep waiting on the primary
+            _count_hedge("skipped_busy")
+            content = primary.result()
+        
+        if content is not None:
+            return content, self.model
+        # Primary failed outright, so the backup is simply the next attempt
+        content = self._request_completion(config.BACKUP_LLM_MODEL, prompt, temperature, max_tokens)
+        return content, config.BACKUP_LLM_MODEL
+    
+    def _race_backup(self, primary: concurrent.futures.Future, cancel_primary: threading.Event,
+                     cancel_backup: threading.Event, prompt: str, temperature: float = None,
+                     max_tokens: int = None) -> Tuple[Optional[str], str]:
+        """Start the backup model and return whichever of it and the running primary answers first"""
+        _count_hedge("hedged")
+        backup, _ = _submit_hedge_task(
+            self._request_completion, config.BACKUP_LLM_MODEL, prompt, temperature, max_tokens, cancel_backup
+        )
+        pending = {primary: ("primary", self.model, cancel_primary),
+                   backup: ("backup", config.BACKUP_LLM_MODEL, cancel_backup)}
+        
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                winner, model, _ = pending.pop(future)
+                content = future.result()
+                if content is not None:
+                    # Stop the loser so it frees its worker instead of running out its retries
+                    for _, _, cancel in pending.values():
+                        cancel.set()
+                    _count_hedge(f"{winner}_wins")
+                    return content, model
+        
+        _count_hedge("both_failed")
+        return None, self.model
+    
+    def _hedge_delay(self) -> float:
+        """Get how long to wait for the primary before hedging, based on its recent p95 latency"""
+        p95 = get_latency_tracker(self.model).percentile(95)
+        if p95 is None:
+            return config.LLM_HEDGE_DEFAULT_DELAY
+        return min(max(p95, config.LLM_HEDGE_MIN_DELAY), config.LLM_HEDGE_MAX_DELAY)
+    
+    def _request_completion(self, model: str, prompt: str, temperature: float = None, max_tokens: int = None,
+                            cancelled: threading.Event = None) -> Optional[str]:
+        """Call a single model, returning None if it did not produce an answer
+
+        Setting cancelled abandons the call: it is checked between attempts,
+        interrupts backoff sleeps, and closes a response still being received.
+        """
+        breaker = get_circuit_breaker(model)
+        if not self._admit(model, breaker):
+            return None
+        
+        budget = get_retry_budget()
+        budget.record_request()
+        start = time.perf_counter()
+        attempt = 0
+        
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                breaker.record_neutral()
+                return None
+            retry_after = None
+            try:
+                response = self._post_completion(model, prompt, temperature, max_tokens,
+                                                 stream_body=cancelled is not None)
+                
+                if response.status_code == 200:
+                    result = self._read_json(response, cancelled)
+                    if result is None:
+                        breaker.record_neutral()
+                        return None
+                    content = result["choices"][0]["message"]["content"]
+                    breaker.record_success()
+                    get_latency_tracker(model).record(time.perf_counter() - start)
+                    note_completion(model, result.get("usage"))
+                    return content
+                
+                if cancelled is not None:
+                    response.close()   # Unread streamed body would otherwise hold the connection
+                if response.status_code != 429 and response.status_code < 500:
+                    # Client errors won't succeed on retry and say nothing about model health
+                    breaker.record_neutral()
+                    return None
+                retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                
+            except requests.Timeout as e:
+                # A timed out call already used the whole timeout, so don't retry it
+                print(f"Timed out calling OpenRouter model {model}: {e}")
+                breaker.record_failure()
+                return None
+            except Exception as e:
+                print(f"Error calling OpenRouter model {model}: {e}")
             
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            breaker.record_failure()
+            delay = retry_after if retry_after is not None else self._backoff_delay(attempt)
+            if (attempt >= config.LLM_MAX_RETRIES or delay > config.LLM_RETRY_MAX_DELAY
+                    or not breaker.would_allow()):
+                return None
+            if not budget.try_spend():
+                return None
             
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            if cancelled is not None:
+                if cancelled.wait(delay):
+                    return None
             else:
-                return self._generate_fallback_response(prompt)
+                time.sleep(delay)
+            if not self._admit(model, breaker):
+                return None
+            attempt += 1
+    
+    @staticmethod
+    def _admit(model: str, breaker: "CircuitBreaker") -> bool:
+        """Let a call out once both the breaker and the rate limiter allow it
+
+        The breaker is checked first so calls to a failing model are rejected
+        straight away instead of queueing for (and using up) rate limit tokens.
+        """
+        if not breaker.would_allow():
+            # Model is known to be failing, skip it instead of waiting on a timeout
+            return False
+        if not rate_limiter.acquire(f"openrouter:{model}"):
+            print(f"Rate limit wait exceeded for OpenRouter model {model}")
+            return False
+        return breaker.allow_request()
+    
+    @staticmethod
+    def _read_json(response: requests.Response, cancelled: threading.Event = None) -> Optional[Dict]:
+        """Read a JSON body, in chunks when cancellable, returning None if cancelled before it arrived"""
+        if cancelled is None:
+            return response.json()
+        
+        # OpenRouter sends the headers straight away and keep-alive whitespace while the model
+        # works, so checking between chunks lets a cancelled call hang up before the answer
+        body = bytearray()
+        try:
+            for chunk in response.iter_content(chunk_size=8192):
+                if cancelled.is_set():
+                    return None
+                body.extend(chunk)
+        finally:
+            response.close()
+        return json.loads(body)
+    
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+    
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given either in seconds or as an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    
+    def _cache_key(self, prompt: str, temperature: float = None, max_tokens: int = None,
+                   model: str = None) -> Optional[str]:
+        """Get the response cache key for a request, or None when caching is disabled"""
+        if not config.LLM_CACHE_ENABLED:
+            return None
+        return LLMResponseCache.make_key(
+            model or self.model, prompt, temperature or config.TEMPERATURE, max_tokens or config.MAX_TOKENS
+        )
+    
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """Look a response up in memory first, then in the shared disk cache"""
+        if not cache_key:
+            return None
+        
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            return cached
+        
+        disk_cache = get_disk_cache()
+        cached = disk_cache.get(cache_key) if disk_cache else None
+        if cached is not None:
+            # Promote to the memory tier so repeats skip the disk
+            get_response_cache().set(cache_key, cached)
+        return cached
+    
+    def evict_cached(self, prompt: str, temperature: float = None, max_tokens: int = None):
+        """Forget cached answers to a prompt from either model, e.g. when they turned out unusable"""
+        for model in (self.model, config.BACKUP_LLM_MODEL):
+            cache_key = self._cache_key(prompt, temperature, max_tokens, model)
+            if cache_key:
+                get_response_cache().delete(cache_key)
+                disk_cache = get_disk_cache()
+                if disk_cache:
+                    disk_cache.delete(cache_key)
+    
+    def _cache_response(self, cache_key: Optional[str], content: str):
+        """Store a model response in the memory and disk caches"""
+        if cache_key:
+            get_response_cache().set(cache_key, content)
+            disk_cache = get_disk_cache()
+            if disk_cache:
+                disk_cache.set(cache_key, content)
+    
+    def stream(self, prompt: str, temperature: float = None, max_tokens: int = None,
+               use_cache: bool = True) -> Iterator[str]:
+        """Stream the LLM response as text chunks while it is being generated"""
+        start = time.perf_counter()
+        cache_key = self._cache_key(prompt, temperature, max_tokens) if use_cache else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            record_call(self.model, self.caller, "ok", time.perf_counter() - start, cache_hit=True)
+            yield cached
+            return
+        
+        if config.LLM_OFFLINE_MODE:
+            with track_call(self.model, self.caller):
+                answer = self._generate_fallback_response(prompt)
+            yield answer
+            return
+        
+        chunks = []
+        usage = {}
+        breaker = get_circuit_breaker(self.model)
+        try:
+            if self._admit(self.model, breaker):
+                response = self._post_completion(self.model, prompt, temperature, max_tokens, stream=True)
+                
+                if response.status_code == 200:
+                    for chunk in self._iter_sse_chunks(response, usage):
+                        chunks.append(chunk)
+                        yield chunk
+                    breaker.record_success()
+                    if chunks:
+                        self._cache_response(cache_key, "".join(chunks))
+                        record_call(self.model, self.caller, "ok", time.perf_counter() - start, usage=usage)
+                        return
+                else:
+                    response.close()
+                    if response.status_code == 429 or response.status_code >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_neutral()
                 
         except Exception as e:
-            print(f"Error calling backup model: {e}")
-            return self._generate_fallback_response(prompt)
+            print(f"Error streaming from OpenRouter API: {e}")
+            breaker.record_failure()
+            if chunks:
+                # Part of the answer is already on screen, so don't start over
+                record_call(self.model, self.caller, "error", time.perf_counter() - start, usage=usage)
+                return
+        
+        # Streaming failed before any text arrived, use the regular fallback chain
+        with track_call(self.model, self.caller):
+            answer = self._fallback_invoke(prompt, temperature, max_tokens, cache_key)
+        yield answer
+    
+    @staticmethod
+    def _iter_sse_chunks(response: requests.Response, usage: Dict = None) -> Iterator[str]:
+        """Parse an OpenRouter server-sent event stream into text chunks, collecting token usage"""
+        try:
+            if response.encoding is None:
+                response.encoding = "utf-8"
+            
+            for line in response.iter_lines(decode_unicode=True):
+                # Blank lines separate events, lines starting with ':' are keep-alive comments
+                if not line or line.startswith(":") or not line.startswith("data:"):
+                    continue
+                
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                event = json.loads(data)
+                if "error" in event:
+                    error = event["error"]
+                    raise RuntimeError(error.get("message", "stream error") if isinstance(error, dict) else error)
+                
+                if usage is not None and event.get("usage"):
+                    usage.update(event["usage"])
+                
+                choices = event.get("choices") or []
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            response.close()
     
     def _generate_fallback_response(self, prompt: str) -> str:
         """Generate a basic response when all API calls fail"""
+        mark_call("fallback")
         # Simple rule-based responses for common prompts
         prompt_lower = prompt.lower()
         
@@ -100,15 +944,102 @@ class OpenRouterLLM:
         else:
             return "I'm experiencing technical difficulties. Please try again later or contact support."
 
+class AsyncOpenRouterLLM:
+    """Asyncio front-end for OpenRouterLLM that lets several prompts run concurrently"""
+    
+    def __init__(self, model: str = None, max_concurrency: int = None, llm: OpenRouterLLM = None):
+        self.llm = llm or OpenRouterLLM(model)
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+    
+    async def ainvoke(self, prompt: str, temperature: float = None, max_tokens: int = None,
+                      use_cache: bool = True) -> str:
+        """Invoke the LLM without blocking the event loop"""
+        # The blocking call runs on a worker thread and still uses the shared connection pool
+        return await asyncio.to_thread(self.llm.invoke, prompt, temperature, max_tokens, use_cache)
+    
+    async def agather(self, prompts: List[str], temperature: float = None, max_tokens: int = None,
+                      use_cache: bool = True) -> List[str]:
+        """Invoke the LLM for every prompt concurrently, returning responses in prompt order"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def bounded_invoke(prompt: str) -> str:
+            async with semaphore:
+                return await self.ainvoke(prompt, temperature, max_tokens, use_cache)
+        
+        return await asyncio.gather(*(bounded_invoke(prompt) for prompt in prompts))
+
 class ChatOpenAI:
     """Compatibility wrapper to maintain existing code structure"""
     
     def __init__(self, model: str = None, temperature: float = None, 
-                 max_tokens: int = None, api_key: str = None):
-        self.llm = OpenRouterLLM(model)
+                 max_tokens: int = None, api_key: str = None, caller: str = None):
+        self.llm = OpenRouterLLM(model, caller=caller)
+        self.async_llm = AsyncOpenRouterLLM(llm=self.llm)
         self.temperature = temperature
         self.max_tokens = max_tokens
     
-    def invoke(self, prompt: str) -> str:
+    def invoke(self, prompt: str, use_cache: bool = True) -> str:
         """Invoke the LLM and return response"""
-        return self.llm.invoke(prompt, self.temperature, self.max_tokens)
+        return self.llm.invoke(prompt, self.temperature, self.max_tokens, use_cache)
+    
+    def stream(self, prompt: str, use_cache: bool = True) -> Iterator[str]:
+        """Stream the LLM response as text chunks"""
+        return self.llm.stream(prompt, self.temperature, self.max_tokens, use_cache)
+    
+    async def ainvoke(self, prompt: str, use_cache: bool = True) -> str:
+        """Invoke the LLM asynchronously and return response"""
+        return await self.async_llm.ainvoke(prompt, self.temperature, self.max_tokens, use_cache)
+    
+    async def agather(self, prompts: List[str], use_cache: bool = True) -> List[str]:
+        """Invoke the LLM for several prompts concurrently"""
+        return await self.async_llm.agather(prompts, self.temperature, self.max_tokens, use_cache)
+    
+    def invoke_many(self, prompts: List[str], use_cache: bool = True) -> List[str]:
+        """Invoke the LLM for several prompts in parallel from synchronous code"""
+        return run_sync(self.agather(prompts, use_cache))
+    
+    def invoke_batch(self, prompts: List[str], use_cache: bool = True) -> List[str]:
+        """Answer several small prompts with one LLM call, falling back to one call per prompt"""
+        if len(prompts) <= 1:
+            return [self.invoke(prompt, use_cache) for prompt in prompts]
+        
+        packed = self._pack_prompts(prompts)
+        raw = self.invoke(packed, use_cache)
+        answers = self._unpack_answers(raw, len(prompts))
+        if answers is None:
+            print(f"Batched response could not be split into {len(prompts)} answers, invoking individually")
+            if use_cache:
+                # Otherwise every repeat of this batch would get the same unusable reply from the cache
+                self.llm.evict_cached(packed, self.temperature, self.max_tokens)
+            return self.invoke_many(prompts, use_cache)
+        return answers
+    
+    @staticmethod
+    def _pack_prompts(prompts: List[str]) -> str:
+        """Combine prompts into one request that asks for a JSON object of numbered answers"""
+        keys = ", ".join(f'"{i}"' for i in range(1, len(prompts) + 1))
+        tasks = "\n\n".join(f"### Task {i}\n{prompt.strip()}" for i, prompt in enumerate(prompts, 1))
+        return (
+            f"You will answer {len(prompts)} independent tasks. Answer each one exactly as if it "
+            f"had been asked on its own.\n\n{tasks}\n\n"
+            f"Return ONLY a JSON object with the keys {keys}, where each value is the complete "
+            f"answer to the task with that number. If a task asks for JSON, put that JSON object "
+            f"as the value."
+        )
+    
+    @staticmethod
+    def _unpack_answers(raw: str, count: int) -> Optional[List[str]]:
+        """Split a packed response back into per-prompt answers, or None if it is malformed"""
+        try:
+            cleaned = (raw or "").strip()
+            start, end = cleaned.find("{"), cleaned.rfind("}")
+            if start < 0 or end < start:
+                return None
+            parsed = json.loads(cleaned[start:end + 1])
+            answers = []
+            for i in range(1, count + 1):
+                value = parsed[str(i)]
+                answers.append(value if isinstance(value, str) else json.dumps(value))
+            return answers
+        except (ValueError, KeyError, TypeError):
+            return None
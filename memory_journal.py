@@ -0,0 +1,216 @@
+import os
+import json
+import threading
+from typing import Dict, Optional
+import config
+from memory_store import MemoryStore, WriteBehindFlusher, atomic_write
+
+class MemoryJournal(MemoryStore):
+    """Persistent user memory held in RAM and stored as a snapshot plus an append-only journal
+
+    Every mutation is applied in memory and appended to the journal as one JSON
+    line, so persisting a chat message costs the same however many users exist.
+    When the journal outgrows the snapshot it is compacted into a new snapshot.
+    Entries carry sequence numbers, so replay after a crash at any point, even
+    mid-compaction, applies each mutation exactly once; a torn final line is dropped.
+
+    With write-behind on, mutations only mark the user dirty; a background
+    flusher writes one 'put' entry per dirty user, coalescing all of that user's
+    changes since the last flush, and fsyncs the batch once.
+    """
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, snapshot_path: str = None, journal_path: str = None, fsync: bool = None,
+                 write_behind: bool = None, flush_interval: float = None, flush_max_dirty: int = None):
+        self.snapshot_path = snapshot_path or config.MEMORY_SNAPSHOT_PATH
+        self.journal_path = journal_path or config.MEMORY_JOURNAL_PATH
+        self.fsync = config.MEMORY_JOURNAL_FSYNC if fsync is None else fsync
+        self.users: Dict[str, Dict] = {}
+        self._seq = 0
+        self._snapshot_bytes = 0
+        self._lock = threading.RLock()        # Guards users and the dirty set
+        self._io_lock = threading.RLock()     # Orders journal writes and compactions
+        self._dirty = set()
+        self.stats = {"entries_written": 0, "entries_replayed": 0, "compactions": 0, "torn_bytes_dropped": 0,
+                      "mutations": 0, "flushes": 0, "coalesced": 0}
+        self._load()
+        self._journal = open(self.journal_path, "ab")
+        self._journal_bytes = self._journal.tell()
+        write_behind = config.MEMORY_WRITE_BEHIND if write_behind is None else write_behind
+        self._flusher = WriteBehindFlusher(self.flush, "memory-journal", flush_interval,
+                                           flush_max_dirty) if write_behind else None
+
+    def _load(self):
+        """Load the snapshot, then replay journal entries newer than it"""
+        snapshot_seq = 0
+        try:
+            if os.path.exists(self.snapshot_path):
+                self._snapshot_bytes = os.path.getsize(self.snapshot_path)
+                with open(self.snapshot_path, "r") as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and data.get("version") == self.SNAPSHOT_VERSION and "users" in data:
+                    self.users = data["users"]
+                    snapshot_seq = data.get("seq", 0)
+                else:
+                    # A plain user_memory.json written before the journal existed
+                    self.users = data
+        except Exception as e:
+            print(f"Error loading persistent memory: {e}")
+        self._seq = snapshot_seq
+
+        if not os.path.exists(self.journal_path):
+            return
+        good_bytes = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete entry")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Only the last write can be torn; anything after it is unusable too
+                    break
+                good_bytes += len(line)
+                if entry["seq"] <= self._seq:
+                    # Already part of the snapshot (crash between snapshot and journal reset)
+                    continue
+                self._apply(entry)
+                self._seq = entry["seq"]
+                self.stats["entries_replayed"] += 1
+
+        torn = os.path.getsize(self.journal_path) - good_bytes
+        if torn:
+            print(f"⚠️  Dropping {torn} bytes of incomplete memory journal entries")
+            self.stats["torn_bytes_dropped"] += torn
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good_bytes)
+
+    def _apply(self, entry: Dict):
+        op, user_id = entry["op"], entry["user"]
+        if op in ("create", "put"):
+            self.users[user_id] = entry["record"]
+            return
+        user = self.users.get(user_id)
+        if user is None:
+            return
+        if op == "append":
+            history = user.setdefault(entry["field"], [])
+            history.append(entry["value"])
+            if len(history) > entry["keep"]:
+                del history[:len(history) - entry["keep"]]
+        elif op == "set":
+            user[entry["field"]] = entry["value"]
+        user["last_updated"] = entry["at"]
+
+    def _record(self, entry: Dict):
+        """Apply a mutation, then journal it now or mark the user for the next flush"""
+        if self._flusher is None:
+            # Hold the I/O lock throughout so entries reach the journal in seq order
+            with self._io_lock:
+                with self._lock:
+                    self._apply(entry)
+                    self.stats["mutations"] += 1
+                    self._seq += 1
+                    entry["seq"] = self._seq
+                    line = json.dumps(entry, separators=(",", ":")) + "\n"
+                self._write([line.encode()])
+            return
+
+        with self._lock:
+            self._apply(entry)
+            self.stats["mutations"] += 1
+            if entry["user"] in self._dirty:
+                self.stats["coalesced"] += 1
+            self._dirty.add(entry["user"])
+            dirty_count = len(self._dirty)
+        self._flusher.notify(dirty_count)
+
+    def flush(self):
+        """Write one entry per dirty user holding their whole record"""
+        with self._io_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                lines = []
+                for user_id in self._dirty:
+                    self._seq += 1
+                    lines.append((json.dumps({"op": "put", "user": user_id, "record": self.users[user_id],
+                                              "seq": self._seq}, separators=(",", ":")) + "\n").encode())
+                self._dirty = set()
+                self.stats["flushes"] += 1
+            self._write(lines, fsync=True)
+
+    def _write(self, lines, fsync: bool = False):
+        with self._io_lock:
+            try:
+                data = b"".join(lines)
+                self._journal.write(data)
+                self._journal.flush()
+                if fsync or self.fsync:
+                    os.fsync(self._journal.fileno())
+                self._journal_bytes += len(data)
+                self.stats["entries_written"] += len(lines)
+                if self._journal_bytes > max(config.MEMORY_JOURNAL_COMPACT_MIN_BYTES,
+                                             self._snapshot_bytes * config.MEMORY_JOURNAL_COMPACT_RATIO):
+                    self.compact()
+            except Exception as e:
+                print(f"Error saving persistent memory: {e}")
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self.users.get(user_id)
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self.users
+
+    def create_user(self, user_id: str, record: Dict) -> Dict:
+        self._record({"op": "create", "user": user_id, "record": record})
+        return self.users[user_id]
+
+    def append(self, user_id: str, field: str, value, keep: int, at: str):
+        self._record({"op": "append", "user": user_id, "field": field, "value": value, "keep": keep, "at": at})
+
+    def set(self, user_id: str, field: str, value, at: str):
+        self._record({"op": "set", "user": user_id, "field": field, "value": value, "at": at})
+
+    def is_empty(self) -> bool:
+        return not self.users
+
+    def import_users(self, users: Dict[str, Dict]):
+        for user_id, record in users.items():
+            if user_id not in self.users:
+                self.create_user(user_id, record)
+
+    def compact(self):
+        """Write every user to a new snapshot and start an empty journal"""
+        with self._io_lock:
+            with self._lock:
+                data = json.dumps({"version": self.SNAPSHOT_VERSION, "seq": self._seq, "users": self.users})
+            atomic_write(self.snapshot_path, data.encode())
+            self._snapshot_bytes = len(data)
+
+            # Entries up to the snapshot's seq are in it, so the journal can start over; users
+            # still dirty are flushed later with higher seqs and replay over the snapshot
+            self._journal.close()
+            self._journal = open(self.journal_path, "wb")
+            self._journal_bytes = 0
+            self.stats["compactions"] += 1
+
+    def close(self):
+        """Flush pending changes and close the journal"""
+        if self._flusher is not None:
+            self._flusher.close()
+        with self._io_lock:
+            self._journal.close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "users": len(self.users),
+                "seq": self._seq,
+                "dirty_users": len(self._dirty),
+                "journal_bytes": self._journal_bytes,
+                "snapshot_bytes": self._snapshot_bytes
+            }
@@ -0,0 +1,213 @@
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import config
+from memory_store import MemoryStore, SessionStore
+
+try:
+    # Optional: only needed with MEMORY_BACKEND=redis
+    import redis
+except ImportError:
+    redis = None
+
+def create_redis_client(url: str = None):
+    """Connect to the Redis server at url (default config.REDIS_URL) with str responses"""
+    if redis is None:
+        raise RuntimeError("MEMORY_BACKEND=redis needs the redis package: pip install redis")
+    return redis.Redis.from_url(url or config.REDIS_URL, decode_responses=True)
+
+class RedisMemoryStore(MemoryStore):
+    """Persistent user memory in Redis, shared by every replica of the app
+
+    Each user is a hash of scalar and JSON fields plus one capped list per
+    history, trimmed with LTRIM. Multi-command updates go out as one pipeline.
+    """
+
+    HISTORY_FIELDS = ("interaction_history", "profile_history")
+    JSON_FIELDS = ("career_goals", "job_preferences", "skill_gaps", "preferences")
+    IMPORT_CHUNK = 500     # Users per pipeline when importing
+
+    def __init__(self, client=None, prefix: str = None):
+        self.client = client if client is not None else create_redis_client()
+        self.prefix = config.REDIS_KEY_PREFIX if prefix is None else prefix
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.prefix}user:{user_id}"
+
+    def _history_key(self, user_id: str, field: str) -> str:
+        return f"{self.prefix}user:{user_id}:{field}"
+
+    def has_user(self, user_id: str) -> bool:
+        return bool(self.client.exists(self._user_key(user_id)))
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        pipe = self.client.pipeline()
+        pipe.hgetall(self._user_key(user_id))
+        for field in self.HISTORY_FIELDS:
+            pipe.lrange(self._history_key(user_id, field), 0, -1)
+        fields, *histories = pipe.execute()
+        if not fields:
+            return None
+
+        user = {key: json.loads(value) if key in self.JSON_FIELDS else value for key, value in fields.items()}
+        for field, items in zip(self.HISTORY_FIELDS, histories):
+            user[field] = [json.loads(item) for item in items]
+        return user
+
+    def create_user(self, user_id: str, record: Dict) -> Dict:
+        key = self._user_key(user_id)
+        # HSETNX decides the winner when two replicas create the same user at once
+        if self.client.hsetnx(key, "created_at", record["created_at"]):
+            pipe = self.client.pipeline()
+            self._queue_record(pipe, user_id, record)
+            pipe.execute()
+        return self.get_user(user_id) or record
+
+    def _queue_record(self, pipe, user_id: str, record: Dict):
+        """Add the commands writing a user's fields and histories to a pipeline"""
+        pipe.hset(self._user_key(user_id), mapping={
+            "user_id": user_id,
+            "last_updated": record["last_updated"],
+            **{field: json.dumps(record.get(field, {})) for field in self.JSON_FIELDS}
+        })
+        for field in self.HISTORY_FIELDS:
+            if record.get(field):
+                pipe.rpush(self._history_key(user_id, field), *(json.dumps(item) for item in record[field]))
+
+    def is_empty(self) -> bool:
+        return next(iter(self.client.scan_iter(match=f"{self.prefix}user:*", count=1000)), None) is None
+
+    def import_users(self, users: Dict[str, Dict]):
+        """Copy users in with two pipelines per chunk; HSETNX skips users another replica already has"""
+        items = list(users.items())
+        for start in range(0, len(items), self.IMPORT_CHUNK):
+            chunk = items[start:start + self.IMPORT_CHUNK]
+            pipe = self.client.pipeline()
+            for user_id, record in chunk:
+                pipe.hsetnx(self._user_key(user_id), "created_at", record["created_at"])
+            claimed = pipe.execute()
+            pipe = self.client.pipeline()
+            for (user_id, record), won in zip(chunk, claimed):
+                if won:
+                    self._queue_record(pipe, user_id, record)
+            pipe.execute()
+
+    def append(self, user_id: str, field: str, value, keep: int, at: str):
+        if field not in self.HISTORY_FIELDS:
+            raise ValueError(f"Unknown memory history: {field}")
+        history_key = self._history_key(user_id, field)
+        pipe = self.client.pipeline()
+        pipe.rpush(history_key, json.dumps(value))
+        pipe.ltrim(history_key, -keep, -1)
+        pipe.hset(self._user_key(user_id), "last_updated", at)
+        pipe.execute()
+
+    def set(self, user_id: str, field: str, value, at: str):
+        if field not in self.JSON_FIELDS:
+            raise ValueError(f"Unknown memory field: {field}")
+        self.client.hset(self._user_key(user_id), mapping={field: json.dumps(value), "last_updated": at})
+
+    def get_preferences(self, user_id: str) -> Dict:
+        values = self.client.hmget(self._user_key(user_id), list(self.JSON_FIELDS))
+        defaults = {"career_goals": [], "job_preferences": {}, "skill_gaps": [], "preferences": {}}
+        return {field: json.loads(value) if value is not None else defaults[field]
+                for field, value in zip(self.JSON_FIELDS, values)}
+
+    def get_summary(self, user_id: str) -> Dict:
+        pipe = self.client.pipeline()
+        pipe.hmget(self._user_key(user_id), ["created_at", "last_updated", "career_goals", "skill_gaps"])
+        pipe.llen(self._history_key(user_id, "profile_history"))
+        (created_at, last_updated, career_goals, skill_gaps), profiles = pipe.execute()
+        return {
+            "created_at": created_at,
+            "last_updated": last_updated,
+            "profile_history_count": profiles,
+            "career_goals": json.loads(career_goals) if career_goals else [],
+            "skill_gaps_count": len(json.loads(skill_gaps)) if skill_gaps else 0
+        }
+
+    def create_session_store(self) -> SessionStore:
+        return RedisSessionStore(self.client, self.prefix)
+
+    def close(self):
+        self.client.close()
+
+class RedisSessionStore(SessionStore):
+    """Session memory in Redis, so any replica can serve any session
+
+    Sessions expire config.MEMORY_TTL seconds after they start through key
+    TTLs, which replaces the in-process cleanup sweep.
+    """
+
+    def __init__(self, client, prefix: str = None, ttl: int = None):
+        self.client = client
+        self.prefix = config.REDIS_KEY_PREFIX if prefix is None else prefix
+        self.ttl = ttl or config.MEMORY_TTL
+
+    def _keys(self, user_id: str):
+        key = f"{self.prefix}session:{user_id}"
+        return key, f"{key}:messages"
+
+    def _start(self, user_id: str) -> int:
+        """Create the session if needed and get the Unix time it expires"""
+        key, _ = self._keys(user_id)
+        expires_at = self.client.hget(key, "expires_at")
+        if expires_at is None:
+            expires_at = int(time.time()) + self.ttl
+            if self.client.hsetnx(key, "expires_at", expires_at):
+                pipe = self.client.pipeline()
+                pipe.hset(key, mapping={
+                    "session_start": datetime.now().isoformat(),
+                    "interaction_count": 0,
+                    "profile_data": "null",
+                    "current_context": "{}"
+                })
+                pipe.expireat(key, expires_at)
+                pipe.execute()
+            else:
+                expires_at = self.client.hget(key, "expires_at")
+        return int(expires_at)
+
+    def get(self, user_id: str) -> Dict:
+        self._start(user_id)
+        key, messages_key = self._keys(user_id)
+        pipe = self.client.pipeline()
+        pipe.hgetall(key)
+        pipe.lrange(messages_key, 0, -1)
+        fields, messages = pipe.execute()
+        return {
+            "session_start": fields.get("session_start"),
+            "messages": [json.loads(message) for message in messages],
+            "profile_data": json.loads(fields.get("profile_data", "null")),
+            "current_context": json.loads(fields.get("current_context", "{}")),
+            "interaction_count": int(fields.get("interaction_count", 0))
+        }
+
+    def add_message(self, user_id: str, message_data: Dict, keep: int):
+        expires_at = self._start(user_id)
+        key, messages_key = self._keys(user_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(messages_key, json.dumps(message_data))
+        pipe.ltrim(messages_key, -keep, -1)
+        pipe.hincrby(key, "interaction_count", 1)
+        pipe.expireat(messages_key, expires_at)
+        pipe.execute()
+
+    def get_messages(self, user_id: str, limit: int) -> List[Dict]:
+        self._start(user_id)
+        return [json.loads(message) for message in self.client.lrange(self._keys(user_id)[1], -limit, -1)]
+
+    def set_profile(self, user_id: str, profile_data: Optional[Dict]):
+        self._start(user_id)
+        self.client.hset(self._keys(user_id)[0], "profile_data", json.dumps(profile_data))
+
+    def get_profile(self, user_id: str) -> Optional[Dict]:
+        self._start(user_id)
+        return json.loads(self.client.hget(self._keys(user_id)[0], "profile_data") or "null")
+
+    def clear(self, user_id: str):
+        self.client.delete(*self._keys(user_id))
+
+    def cleanup_expired(self, ttl: float):
+        """Nothing to do: Redis expires session keys on its own"""
@@ -0,0 +1,233 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import config
+from memory_store import MemoryStore, WriteBehindFlusher, atomic_write
+
+class ShardedMemoryStore(MemoryStore):
+    """Persistent user memory stored as one JSON file per user, loaded on first access
+
+    Nothing is read at startup; users are loaded when first touched and kept in
+    an LRU of at most cache_size hot users, so startup time and RSS depend on
+    how many users are active rather than how many exist. Changes are written
+    back by the write-behind flusher (or immediately with write_behind off), and
+    a user is only evicted once their changes are on disk.
+
+    Every write rewrites the user's whole file, so without write-behind each
+    message costs more than a journal append as the history grows.
+    """
+
+    def __init__(self, directory: str = None, cache_size: int = None, write_behind: bool = None,
+                 flush_interval: float = None, flush_max_dirty: int = None, fsync: bool = None):
+        self.directory = directory or config.MEMORY_SHARD_DIR
+        self.cache_size = cache_size or config.MEMORY_SHARD_CACHE_SIZE
+        self.fsync = config.MEMORY_JOURNAL_FSYNC if fsync is None else fsync
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._dirty = set()      # Changed since their last flush
+        self._writing = set()    # Being flushed; must stay cached until the write lands
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self.stats = {"loads": 0, "misses": 0, "evictions": 0, "files_written": 0, "flushes": 0, "errors": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        write_behind = config.MEMORY_WRITE_BEHIND if write_behind is None else write_behind
+        self._flusher = WriteBehindFlusher(self.flush, "memory-shards", flush_interval,
+                                           flush_max_dirty) if write_behind else None
+
+    def _path(self, user_id: str) -> str:
+        """Hash the id into a safe file name, bucketed by prefix to keep directories small"""
+        digest = hashlib.sha1(user_id.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def _load(self, user_id: str) -> Optional[Dict]:
+        """Get a user from the LRU, reading their file on a miss without holding the store lock"""
+        with self._lock:
+            user = self._cache.get(user_id)
+            if user is not None:
+                self._cache.move_to_end(user_id)
+                return user
+
+        path = self._path(user_id)
+        while True:
+            try:
+                with open(path, "rb") as f:
+                    try:
+                        user, error = json.loads(f.read()), None
+                    except ValueError as e:
+                        user, error = None, e
+                    with self._lock:
+                        cached = self._cache.get(user_id)
+                        if cached is not None:
+                            # Another thread loaded or created the user while we were reading
+                            self._cache.move_to_end(user_id)
+                            return cached
+                        if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                            # A flush replaced the file while we read it; read the new version
+                            continue
+                        if error is not None:
+                            self._quarantine(user_id, path, error)
+                            return None
+                        self.stats["loads"] += 1
+                        self._cache[user_id] = user
+                        self._evict()
+                        return user
+            except FileNotFoundError:
+                with self._lock:
+                    self.stats["misses"] += 1
+                    return self._cache.get(user_id)
+            except Exception as e:
+                # Unreadable but possibly intact; don't let the user be recreated over it
+                print(f"Error loading persistent memory for {user_id}: {e}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                raise
+
+    def _quarantine(self, user_id: str, path: str, error: Exception):
+        """Move a corrupt shard to <file>.corrupt so a fresh record doesn't overwrite it"""
+        corrupt_path = f"{path}.corrupt"
+        os.replace(path, corrupt_path)
+        self.stats["errors"] += 1
+        print(f"Corrupt persistent memory for {user_id} ({error}); moved {path} to {corrupt_path}, "
+              f"the user will start with empty memory")
+
+    def _evict(self, flush_if_blocked: bool = True):
+        """Drop least recently used users beyond cache_size, skipping any with unsaved changes"""
+        excess = len(self._cache) - self.cache_size
+        if excess <= 0:
+            return
+        for user_id in list(self._cache):
+            if excess <= 0:
+                break
+            if user_id in self._dirty or user_id in self._writing:
+                continue
+            del self._cache[user_id]
+            self.stats["evictions"] += 1
+            excess -= 1
+        if excess > 0 and flush_if_blocked and self._flusher is not None:
+            # Only dirty users left to evict; flush now so the next pass can drop them
+            self._flusher.notify(self._flusher.max_dirty)
+
+    def _changed(self, user_id: str):
+        """Mark a user dirty after a mutation; callers flush after releasing the lock when write-behind is off"""
+        self._dirty.add(user_id)
+        if self._flusher is not None:
+            self._flusher.notify(len(self._dirty))
+
+    def _persist(self):
+        """Write changes now unless the flusher batches them"""
+        if self._flusher is None:
+            self.flush()
+
+    def _encode(self, user: Dict) -> bytes:
+        return json.dumps(user, separators=(",", ":")).encode()
+
+    def _write(self, user_id: str, data: bytes):
+        try:
+            path = self._path(user_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Like the journal, background flushes are always synced; immediate writes only with fsync on
+            atomic_write(path, data, fsync=self.fsync or self._flusher is not None)
+            self.stats["files_written"] += 1
+        except Exception as e:
+            print(f"Error saving persistent memory for {user_id}: {e}")
+            self.stats["errors"] += 1
+            with self._lock:
+                self._dirty.add(user_id)
+
+    def flush(self):
+        """Write every dirty user to their file"""
+        with self._io_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                pending = {user_id: self._encode(self._cache[user_id]) for user_id in self._dirty}
+                self._writing = set(pending)
+                self._dirty = set()
+                self.stats["flushes"] += 1
+            for user_id, data in pending.items():
+                self._write(user_id, data)
+            with self._lock:
+                self._writing = set()
+                # Users whose write failed are dirty again; don't spin retrying them
+                self._evict(flush_if_blocked=False)
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        return self._load(user_id)
+
+    def has_user(self, user_id: str) -> bool:
+        with self._lock:
+            if user_id in self._cache:
+                return True
+        return os.path.exists(self._path(user_id))
+
+    def create_user(self, user_id: str, record: Dict) -> Dict:
+        with self._lock:
+            self._cache[user_id] = record
+            self._changed(user_id)
+            self._evict()
+        self._persist()
+        return record
+
+    def is_empty(self) -> bool:
+        with os.scandir(self.directory) as entries:
+            return next(entries, None) is None
+
+    def import_users(self, users: Dict[str, Dict]):
+        """Write users straight to their files, e.g. to migrate a user_memory.json snapshot
+
+        Files are synced once at the end rather than one by one, and users that
+        already have a file are skipped.
+        """
+        for user_id, user in users.items():
+            path = self._path(user_id)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, self._encode(user), fsync=False)
+            self.stats["files_written"] += 1
+        if hasattr(os, "sync"):
+            os.sync()
+
+    def _update(self, user_id: str, change: Callable[[Dict], None]):
+        """Apply change to a cached user under the lock, loading them first if needed"""
+        while self._load(user_id) is not None:
+            with self._lock:
+                user = self._cache.get(user_id)
+                if user is None:
+                    # Evicted between loading and locking; load again
+                    continue
+                change(user)
+                self._changed(user_id)
+            self._persist()
+            return
+
+    def append(self, user_id: str, field: str, value, keep: int, at: str):
+        def change(user: Dict):
+            history = user.setdefault(field, [])
+            history.append(value)
+            if len(history) > keep:
+                del history[:len(history) - keep]
+            user["last_updated"] = at
+        self._update(user_id, change)
+
+    def set(self, user_id: str, field: str, value, at: str):
+        def change(user: Dict):
+            user[field] = value
+            user["last_updated"] = at
+        self._update(user_id, change)
+
+    def close(self):
+        """Flush pending changes and stop the flusher"""
+        if self._flusher is not None:
+            self._flusher.close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "cached_users": len(self._cache),
+                "dirty_users": len(self._dirty),
+                "cache_size": self.cache_size
+            }
@@ -0,0 +1,495 @@
+import os
+import json
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import config
+
+def atomic_write(path: str, data: bytes, fsync: bool = True):
+    """Replace a file's contents so readers and crashes only ever see the old or the new version
+
+    fsync=False skips the syncs for bulk writes that are synced together afterwards.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if not fsync:
+        return
+    # Make the rename itself durable
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+class WriteBehindFlusher:
+    """Calls flush() on a background thread every interval, sooner once enough users are dirty, and at exit
+
+    Stores mark users dirty and return straight away, so request latency no
+    longer includes disk I/O; all changes made between flushes are written together.
+    """
+
+    def __init__(self, flush: Callable[[], None], name: str, interval: float = None, max_dirty: int = None):
+        self._flush = flush
+        self.interval = interval if interval is not None else config.MEMORY_FLUSH_INTERVAL
+        self.max_dirty = max_dirty or config.MEMORY_FLUSH_MAX_DIRTY
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"{name}-flusher", daemon=True)
+        self._thread.start()
+        # Daemon threads die with the interpreter, so flush what is left on the way out
+        atexit.register(self.close)
+
+    def notify(self, dirty_count: int):
+        """Tell the flusher how many users are dirty; crossing the threshold flushes early"""
+        if dirty_count >= self.max_dirty:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"Error flushing persistent memory: {e}")
+
+    def close(self):
+        """Stop the background thread and flush anything still pending"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+        atexit.unregister(self.close)
+        self._flush()
+
+class SessionStore:
+    """Per-process session memory: recent messages and the current profile for each user"""
+
+    def __init__(self):
+        self.sessions: Dict[str, Dict] = {}
+
+    def get(self, user_id: str) -> Dict:
+        """Get or create a user's session"""
+        if user_id not in self.sessions:
+            self.sessions[user_id] = {
+                "session_start": datetime.now().isoformat(),
+                "messages": [],
+                "profile_data": None,
+                "current_context": {},
+                "interaction_count": 0
+            }
+        return self.sessions[user_id]
+
+    def add_message(self, user_id: str, message_data: Dict, keep: int):
+        session = self.get(user_id)
+        session["messages"].append(message_data)
+        session["interaction_count"] += 1
+        if len(session["messages"]) > keep:
+            session["messages"] = session["messages"][-keep:]
+
+    def get_messages(self, user_id: str, limit: int) -> List[Dict]:
+        session = self.get(user_id)
+        return session["messages"][-limit:] if session["messages"] else []
+
+    def set_profile(self, user_id: str, profile_data: Optional[Dict]):
+        self.get(user_id)["profile_data"] = profile_data
+
+    def get_profile(self, user_id: str) -> Optional[Dict]:
+        return self.get(user_id)["profile_data"]
+
+    def clear(self, user_id: str):
+        self.sessions.pop(user_id, None)
+
+    def cleanup_expired(self, ttl: float):
+        """Drop sessions started more than ttl seconds ago"""
+        current_time = datetime.now()
+        expired = [user_id for user_id, session in self.sessions.items()
+                   if current_time - datetime.fromisoformat(session["session_start"]) > timedelta(seconds=ttl)]
+        for user_id in expired:
+            self.clear(user_id)
+
+class MemoryStore:
+    """Storage engine for persistent user memory
+
+    A user record holds 'created_at', 'last_updated', the 'interaction_history'
+    and 'profile_history' lists, and the 'career_goals', 'job_preferences',
+    'skill_gaps' and 'preferences' values. Engines only need the record-level
+    methods; the summary and preference lookups can be overridden with cheaper
+    queries.
+    """
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        """Get a user's full record, or None if the user is unknown"""
+        raise NotImplementedError
+
+    def has_user(self, user_id: str) -> bool:
+        return self.get_user(user_id) is not None
+
+    def create_user(self, user_id: str, record: Dict) -> Dict:
+        raise NotImplementedError
+
+    def append(self, user_id: str, field: str, value, keep: int, at: str):
+        """Append to one of a user's history lists, keeping only the newest keep items"""
+        raise NotImplementedError
+
+    def set(self, user_id: str, field: str, value, at: str):
+        raise NotImplementedError
+
+    def get_preferences(self, user_id: str) -> Dict:
+        user = self.get_user(user_id) or {}
+        return {
+            "career_goals": user.get("career_goals", []),
+            "job_preferences": user.get("job_preferences", {}),
+            "skill_gaps": user.get("skill_gaps", []),
+            "preferences": user.get("preferences", {})
+        }
+
+    def get_summary(self, user_id: str) -> Dict:
+        user = self.get_user(user_id) or {}
+        return {
+            "created_at": user.get("created_at"),
+            "last_updated": user.get("last_updated"),
+            "profile_history_count": len(user.get("profile_history", [])),
+            "career_goals": user.get("career_goals", []),
+            "skill_gaps_count": len(user.get("skill_gaps", []))
+        }
+
+    def is_empty(self) -> bool:
+        """Whether the store holds no users yet, so existing memory can be imported into it"""
+        raise NotImplementedError
+
+    def import_users(self, users: Dict[str, Dict]):
+        """Copy full user records in, skipping users the store already has"""
+        raise NotImplementedError
+
+    def create_session_store(self) -> SessionStore:
+        """Sessions stay in the calling process unless the engine can share them between replicas"""
+        return SessionStore()
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> Dict:
+        return {}
+
+class SqliteMemoryStore(MemoryStore):
+    """Persistent user memory in SQLite, normalized so every lookup is an indexed per-user query
+
+    Nothing is held in RAM, so memory use and startup time don't grow with the
+    number of users, and WAL mode lets other threads and processes read while
+    one writes.
+    """
+
+    # History list -> its table's columns besides id and user_id
+    HISTORY_COLUMNS = {
+        "interaction_history": ("timestamp", "sender", "message"),
+        "profile_history": ("timestamp", "profile_data"),
+    }
+    # Lists stored one row per item, in order
+    LIST_TABLES = {"career_goals": "goal", "skill_gaps": "skill_gap"}
+    # Values stored as JSON on the users row
+    USER_COLUMNS = ("job_preferences", "preferences")
+    JSON_COLUMNS = ("profile_data", "goal", "skill_gap", "job_preferences", "preferences")
+
+    def __init__(self, path: str = None):
+        self.path = path or config.MEMORY_SQLITE_PATH
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.stats = {"writes": 0, "errors": 0}
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the memory database"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode with explicit transactions; WAL keeps readers unblocked by writers
+            conn = sqlite3.connect(self.path, timeout=config.MEMORY_SQLITE_BUSY_TIMEOUT,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _init_db(self):
+        """Create the memory tables and indexes if they do not exist yet"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                last_updated TEXT NOT NULL,
+                job_preferences TEXT NOT NULL DEFAULT '[]',
+                preferences TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE TABLE IF NOT EXISTS interaction_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                timestamp TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_interaction_history_user ON interaction_history (user_id);
+            CREATE INDEX IF NOT EXISTS idx_interaction_history_timestamp ON interaction_history (timestamp);
+            CREATE TABLE IF NOT EXISTS profile_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                timestamp TEXT NOT NULL,
+                profile_data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_profile_history_user ON profile_history (user_id);
+            CREATE INDEX IF NOT EXISTS idx_profile_history_timestamp ON profile_history (timestamp);
+            CREATE TABLE IF NOT EXISTS career_goals (
+                user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                goal TEXT NOT NULL,
+                PRIMARY KEY (user_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS skill_gaps (
+                user_id TEXT NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                skill_gap TEXT NOT NULL,
+                PRIMARY KEY (user_id, position)
+            );
+        """)
+
+    def _encode(self, column: str, value):
+        return json.dumps(value) if column in self.JSON_COLUMNS else value
+
+    def _decode(self, column: str, value):
+        return json.loads(value) if column in self.JSON_COLUMNS else value
+
+    def _write(self, description: str, fn):
+        """Run fn(conn) in a transaction, reporting rather than raising database errors"""
+        try:
+            with self._transaction() as conn:
+                fn(conn)
+            with self._lock:
+                self.stats["writes"] += 1
+        except sqlite3.Error as e:
+            print(f"Error {description}: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+
+    def has_user(self, user_id: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute(
+            f"SELECT created_at, last_updated, {', '.join(self.USER_COLUMNS)} FROM users WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        user = {"user_id": user_id, "created_at": row[0], "last_updated": row[1]}
+        for table, columns in self.HISTORY_COLUMNS.items():
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+            user[table] = [{column: self._decode(column, value) for column, value in zip(columns, values)}
+                           for values in rows]
+        for table, column in self.LIST_TABLES.items():
+            user[table] = self._get_list(conn, table, column, user_id)
+        for column, value in zip(self.USER_COLUMNS, row[2:]):
+            user[column] = self._decode(column, value)
+        return user
+
+    def _get_list(self, conn: sqlite3.Connection, table: str, column: str, user_id: str) -> List:
+        rows = conn.execute(f"SELECT {column} FROM {table} WHERE user_id = ? ORDER BY position", (user_id,))
+        return [self._decode(column, value) for (value,) in rows]
+
+    def create_user(self, user_id: str, record: Dict) -> Dict:
+        def insert(conn):
+            self._insert_user(conn, user_id, record)
+        self._write("creating memory user", insert)
+        return self.get_user(user_id) or record
+
+    def _insert_user(self, conn: sqlite3.Connection, user_id: str, record: Dict):
+        conn.execute(
+            f"INSERT OR IGNORE INTO users (user_id, created_at, last_updated, {', '.join(self.USER_COLUMNS)}) "
+            f"VALUES (?, ?, ?{', ?' * len(self.USER_COLUMNS)})",
+            (user_id, record["created_at"], record["last_updated"],
+             *(self._encode(column, record.get(column, {})) for column in self.USER_COLUMNS))
+        )
+        for table, columns in self.HISTORY_COLUMNS.items():
+            conn.executemany(
+                f"INSERT INTO {table} (user_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+                [(user_id, *(self._encode(column, item.get(column, "")) for column in columns))
+                 for item in record.get(table, [])]
+            )
+        for table, column in self.LIST_TABLES.items():
+            self._replace_list(conn, table, column, user_id, record.get(table, []))
+
+    def _replace_list(self, conn: sqlite3.Connection, table: str, column: str, user_id: str, items: List):
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            f"INSERT INTO {table} (user_id, position, {column}) VALUES (?, ?, ?)",
+            [(user_id, position, self._encode(column, item)) for position, item in enumerate(items)]
+        )
+
+    def is_empty(self) -> bool:
+        return self._connect().execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+    def import_users(self, users: Dict[str, Dict]):
+        """Copy users from another store's records, e.g. a user_memory.json snapshot, in one transaction"""
+        def insert(conn):
+            for user_id, record in users.items():
+                # Checked inside the transaction, so two processes importing at once can't double histories
+                if conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is None:
+                    self._insert_user(conn, user_id, record)
+        self._write("importing memory users", insert)
+
+    def append(self, user_id: str, field: str, value, keep: int, at: str):
+        columns = self.HISTORY_COLUMNS[field]
+
+        def insert(conn):
+            conn.execute(
+                f"INSERT INTO {field} (user_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+                (user_id, *(self._encode(column, value.get(column, "")) for column in columns))
+            )
+            # Everything older than the newest keep rows goes, found through the user_id index
+            conn.execute(
+                f"DELETE FROM {field} WHERE user_id = ? AND id <= "
+                f"(SELECT id FROM {field} WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (user_id, user_id, keep)
+            )
+            conn.execute("UPDATE users SET last_updated = ? WHERE user_id = ?", (at, user_id))
+        self._write(f"saving {field}", insert)
+
+    def set(self, user_id: str, field: str, value, at: str):
+        def update(conn):
+            if field in self.LIST_TABLES:
+                self._replace_list(conn, field, self.LIST_TABLES[field], user_id, value)
+                conn.execute("UPDATE users SET last_updated = ? WHERE user_id = ?", (at, user_id))
+            elif field in self.USER_COLUMNS:
+                conn.execute(f"UPDATE users SET {field} = ?, last_updated = ? WHERE user_id = ?",
+                             (self._encode(field, value), at, user_id))
+            else:
+                raise ValueError(f"Unknown memory field: {field}")
+        self._write(f"saving {field}", update)
+
+    def get_preferences(self, user_id: str) -> Dict:
+        conn = self._connect()
+        row = conn.execute(f"SELECT {', '.join(self.USER_COLUMNS)} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        values = dict(zip(self.USER_COLUMNS, row or ()))
+        return {
+            "career_goals": self._get_list(conn, "career_goals", "goal", user_id),
+            "job_preferences": self._decode("job_preferences", values["job_preferences"]) if row else {},
+            "skill_gaps": self._get_list(conn, "skill_gaps", "skill_gap", user_id),
+            "preferences": self._decode("preferences", values["preferences"]) if row else {}
+        }
+
+    def get_summary(self, user_id: str) -> Dict:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT created_at, last_updated, "
+            "(SELECT COUNT(*) FROM profile_history WHERE user_id = users.user_id), "
+            "(SELECT COUNT(*) FROM skill_gaps WHERE user_id = users.user_id) "
+            "FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        created_at, last_updated, profiles, skill_gaps = row or (None, None, 0, 0)
+        return {
+            "created_at": created_at,
+            "last_updated": last_updated,
+            "profile_history_count": profiles,
+            "career_goals": self._get_list(conn, "career_goals", "goal", user_id),
+            "skill_gaps_count": skill_gaps
+        }
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict:
+        try:
+            users = self._connect().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        except sqlite3.Error:
+            users = None
+        with self._lock:
+            return {**self.stats, "users": users}
+
+MEMORY_BACKENDS = ("journal", "sqlite", "redis", "sharded")
+
+_memory_store: Optional[MemoryStore] = None
+_memory_store_lock = threading.Lock()
+
+def migrate_journal_memory(store: MemoryStore, backend: str) -> int:
+    """Import the journal backend's users into a store that has none yet, so switching engines keeps history"""
+    if not (os.path.exists(config.MEMORY_SNAPSHOT_PATH) or os.path.exists(config.MEMORY_JOURNAL_PATH)):
+        return 0
+    if not store.is_empty():
+        return 0
+
+    from memory_journal import MemoryJournal
+    journal = MemoryJournal(write_behind=False)
+    users = journal.users
+    journal.close()
+    if users:
+        store.import_users(users)
+        print(f"Imported {len(users)} users from {config.MEMORY_SNAPSHOT_PATH} into the {backend} memory store")
+    return len(users)
+
+def create_memory_store(backend: str = None) -> MemoryStore:
+    """Create the storage engine named by config.MEMORY_BACKEND
+
+    A new store for any other engine starts with the users already saved by the journal backend.
+    """
+    backend = backend or config.MEMORY_BACKEND
+    if backend == "sqlite":
+        store = SqliteMemoryStore()
+        migrate_journal_memory(store, backend)
+        return store
+    if backend == "journal":
+        from memory_journal import MemoryJournal
+        return MemoryJournal()
+    if backend == "redis":
+        from memory_redis import RedisMemoryStore
+        store = RedisMemoryStore()
+        migrate_journal_memory(store, backend)
+        return store
+    if backend == "sharded":
+        from memory_shards import ShardedMemoryStore
+        store = ShardedMemoryStore()
+        migrate_journal_memory(store, backend)
+        return store
+    raise ValueError(f"Unknown memory backend: {backend} (expected one of {', '.join(MEMORY_BACKENDS)})")
+
+def get_memory_store() -> MemoryStore:
+    """Get the process-wide persistent memory store shared by every Streamlit session"""
+    global _memory_store
+    with _memory_store_lock:
+        if _memory_store is None:
+            _memory_store = create_memory_store()
+        return _memory_store
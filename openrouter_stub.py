@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Speaks enough of /chat/completions for llm_wrapper.py: JSON and SSE streaming
+responses with a usage block, configurable latency distributions, injected
+500 and 429 errors, and canned or echo answers. Point the app at it with
+OPENROUTER_BASE_URL to run load and tail-latency experiments offline.
+
+Usage:
+    python openrouter_stub.py --port 8765 --latency lognormal --latency-ms 800 --error-rate 0.02
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1 streamlit run app.py
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from prompt_budget import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+class OpenRouterStub:
+    """Configurable fake OpenRouter server running on a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed",
+                 latency_ms: float = 0.0, latency_jitter_ms: float = 0.0, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                 mode: str = "echo", canned: Dict[str, str] = None, stream_chunk_words: int = 3,
+                 stream_chunk_delay_ms: float = 0.0, connect_delay_ms: float = 0.0, seed: int = None):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        self.latency = latency
+        self.latency_ms = latency_ms                  # Mean (median for lognormal) response delay
+        self.latency_jitter_ms = latency_jitter_ms    # Spread for the uniform and normal distributions
+        self.latency_sigma = latency_sigma            # Shape of the lognormal tail
+        self.error_rate = error_rate                  # Share of requests answered with a 500
+        self.rate_limit_rate = rate_limit_rate        # Share of requests answered with a 429
+        self.retry_after = retry_after                # Retry-After seconds sent with a 429
+        self.mode = mode                              # 'echo' repeats the prompt, 'canned' uses canned answers
+        self.canned = canned or {}                    # Prompt substring -> answer, '*' is the default
+        self.stream_chunk_words = max(1, stream_chunk_words)
+        self.stream_chunk_delay_ms = stream_chunk_delay_ms
+        self.connect_delay_ms = connect_delay_ms      # Paid once per new connection, like a TLS handshake
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "ok": 0, "errors": 0, "rate_limited": 0, "connections": 0}
+
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self) -> "OpenRouterStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "OpenRouterStub":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def sample_latency(self) -> float:
+        """Draw one response delay in seconds from the configured distribution"""
+        mean = self.latency_ms
+        with self._lock:
+            if self.latency == "uniform":
+                value = self._rng.uniform(mean - self.latency_jitter_ms, mean + self.latency_jitter_ms)
+            elif self.latency == "normal":
+                value = self._rng.gauss(mean, self.latency_jitter_ms)
+            elif self.latency == "lognormal":
+                value = mean * self._rng.lognormvariate(0, self.latency_sigma) if mean else 0.0
+            elif self.latency == "exponential":
+                value = self._rng.expovariate(1 / mean) if mean else 0.0
+            else:
+                value = mean
+        return max(0.0, value) / 1000
+
+    def pick_outcome(self) -> str:
+        """Decide whether a request succeeds, fails or is rate limited"""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limited"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def answer(self, prompt: str) -> str:
+        """Build the completion text for a prompt"""
+        if self.mode == "canned":
+            for pattern, response in self.canned.items():
+                if pattern != "*" and pattern.lower() in prompt.lower():
+                    return response
+            return self.canned.get("*", "This is a canned response from the local OpenRouter stub.")
+        return f"Echo: {prompt}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(_StubHandler):
+            pass
+
+        Handler.stub = stub
+        return Handler
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Request handler for OpenRouterStub; keeps connections alive like the real API"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    stub: OpenRouterStub = None
+
+    def setup(self):
+        if self.stub.connect_delay_ms:
+            time.sleep(self.stub.connect_delay_ms / 1000)
+        self.stub._count("connections")
+        super().setup()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "code": 400}})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}", "code": 404}})
+            return
+
+        stub = self.stub
+        stub._count("requests")
+        time.sleep(stub.sample_latency())
+
+        outcome = stub.pick_outcome()
+        if outcome == "rate_limited":
+            stub._count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit exceeded (injected)", "code": 429}},
+                            {"Retry-After": str(stub.retry_after)})
+            return
+        if outcome == "error":
+            stub._count("errors")
+            self._send_json(500, {"error": {"message": "Internal server error (injected)", "code": 500}})
+            return
+
+        messages = payload.get("messages") or []
+        prompt = "\n".join(str(message.get("content", "")) for message in messages if message.get("role") == "user")
+        content = stub.answer(prompt)
+        model = payload.get("model", "stub-model")
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        stub._count("ok")
+        if payload.get("stream"):
+            stub._count("streamed")
+            self._send_stream(model, content, usage)
+        else:
+            self._send_json(200, {
+                "id": f"gen-stub-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+
+    def _send_json(self, status: int, body: Dict, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model: str, content: str, usage: Dict):
+        """Send the answer as server-sent events using chunked transfer encoding"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = content.split(" ")
+        size = self.stub.stream_chunk_words
+        chunks: List[str] = [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+                             for i in range(0, len(words), size)]
+
+        self._write_chunk(": OPENROUTER PROCESSING\n\n")
+        for i, chunk in enumerate(chunks):
+            if i and self.stub.stream_chunk_delay_ms:
+                time.sleep(self.stub.stream_chunk_delay_ms / 1000)
+            self._write_event({
+                "model": model,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+            })
+        self._write_event({
+            "model": model,
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_event(self, event: Dict):
+        self._write_chunk(f"data: {json.dumps(event)}\n\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode()
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(**options) -> OpenRouterStub:
+    """Start an OpenRouterStub on a free local port and return it"""
+    return OpenRouterStub(**options).start()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--mode", choices=("echo", "canned"), default="echo")
+    parser.add_argument("--canned", help="JSON file mapping prompt substrings to answers ('*' = default)")
+    parser.add_argument("--stream-chunk-words", type=int, default=3)
+    parser.add_argument("--stream-chunk-delay-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    canned = None
+    if args.canned:
+        with open(args.canned, "r") as f:
+            canned = json.load(f)
+
+    stub = OpenRouterStub(
+        host=args.host, port=args.port, latency=args.latency, latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms, latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        mode=args.mode, canned=canned, stream_chunk_words=args.stream_chunk_words,
+        stream_chunk_delay_ms=args.stream_chunk_delay_ms, seed=args.seed
+    )
+    print(f"🧪 OpenRouter stub listening on {stub.base_url}")
+    print(f"   export OPENROUTER_BASE_URL={stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+        print(f"📊 {stub.get_stats()}")
+
+if __name__ == "__main__":
+    main()
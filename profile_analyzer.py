@@ -10,7 +10,8 @@ class ProfileAnalyzer:
             model=config.FREE_LLM_MODEL,
             temperature=config.TEMPERATURE,
             max_tokens=config.MAX_TOKENS,
-            api_key=config.OPENROUTER_API_KEY
+            api_key=config.OPENROUTER_API_KEY,
+            caller="profile_analyzer"
         )
         
     def analyze_profile(self, profile_data: Dict) -> Dict:
@@ -0,0 +1,142 @@
+import copy
+import time
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import config
+
+class ProfileCache:
+    """Thread-safe LRU cache of scraped profiles keyed by LinkedIn public identifier
+
+    Entries younger than the TTL are fresh. Within the stale window after that they
+    are served immediately while a background refresh runs (stale-while-revalidate).
+    Older entries are only served when a new scrape fails.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, stale_ttl: float = None):
+        self.max_entries = max_entries or config.PROFILE_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else config.PROFILE_CACHE_TTL
+        self.stale_ttl = stale_ttl if stale_ttl is not None else config.PROFILE_CACHE_STALE_TTL
+        # profile_id -> (profile, fetched_at), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.stats = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0,
+            "refreshes": 0, "refresh_failures": 0, "stale_on_error": 0
+        }
+
+    def lookup(self, profile_id: str) -> Tuple[Optional[Dict], str]:
+        """Get a copy of a cached profile and its state: 'fresh', 'stale', 'expired' or 'miss'"""
+        with self._lock:
+            entry = self._entries.get(profile_id)
+            if entry is None:
+                return None, "miss"
+            self._entries.move_to_end(profile_id)
+            profile, fetched_at = entry
+
+        age = time.time() - fetched_at
+        if age < self.ttl:
+            state = "fresh"
+        elif age < self.ttl + self.stale_ttl:
+            state = "stale"
+        else:
+            state = "expired"
+        # Callers may edit the profile, which must not change the cached copy
+        return copy.deepcopy(profile), state
+
+    def set(self, profile_id: str, profile: Dict):
+        """Store a freshly scraped profile, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[profile_id] = (copy.deepcopy(profile), time.time())
+            self._entries.move_to_end(profile_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, profile_id: str):
+        with self._lock:
+            self._entries.pop(profile_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_fetch(self, profile_id: str, fetch: Callable[[], Optional[Dict]],
+                     force_refresh: bool = False) -> Optional[Dict]:
+        """Get a profile from the cache, scraping it with fetch() when needed"""
+        cached, state = self.lookup(profile_id)
+
+        if not force_refresh:
+            if state == "fresh":
+                self._count("hits")
+                return cached
+            if state == "stale" and config.PROFILE_CACHE_STALE_WHILE_REVALIDATE:
+                self._count("stale_hits")
+                self._refresh_in_background(profile_id, fetch)
+                return cached
+        self._count("misses")
+
+        profile = fetch()
+        if profile:
+            self.set(profile_id, profile)
+            return profile
+        if cached is not None:
+            # An old profile is more useful than none when the scrape fails
+            self._count("stale_on_error")
+            return cached
+        return None
+
+    def _refresh_in_background(self, profile_id: str, fetch: Callable[[], Optional[Dict]]):
+        """Re-scrape a stale profile on a worker thread, at most once at a time per profile"""
+        with self._lock:
+            if profile_id in self._refreshing:
+                return
+            self._refreshing.add(profile_id)
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=config.PROFILE_CACHE_REFRESH_WORKERS, thread_name_prefix="profile-refresh"
+                )
+            self.stats["refreshes"] += 1
+
+        def refresh():
+            try:
+                profile = fetch()
+                if profile:
+                    self.set(profile_id, profile)
+                else:
+                    self._count("refresh_failures")
+            except Exception as e:
+                print(f"Background profile refresh failed for {profile_id}: {e}")
+                self._count("refresh_failures")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(profile_id)
+
+        self._executor.submit(refresh)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss/refresh counters and current cache size"""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "refreshing": len(self._refreshing)
+            }
+
+_profile_cache: Optional[ProfileCache] = None
+_profile_cache_lock = threading.Lock()
+
+def get_profile_cache() -> ProfileCache:
+    """Get the process-wide scraped profile cache"""
+    global _profile_cache
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = ProfileCache()
+        return _profile_cache
@@ -0,0 +1,147 @@
+import json
+from typing import Dict, Iterator, List
+import requests
+
+try:
+    # Optional faster decoder; the standard library is used when it isn't installed
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(data):
+    """Decode JSON from str or bytes with the fastest decoder available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Profile fields copied straight from the raw Apify item: (output key, raw key)
+BASIC_INFO_FIELDS = (
+    ("headline", "headline"),
+    ("location", "geoLocationName"),
+    ("summary", "summary"),
+)
+
+# Lists built from raw item lists. Each item copies (output key, raw key, default)
+# fields, adds fixed values, and derives 'duration' from the timePeriod years:
+# 'open_ended' allows a missing end ("2020 - Present"), 'closed' needs both years.
+SECTION_PLANS = (
+    {
+        "section": "experience",
+        "source": "positions",
+        "fields": (("title", "title", ""), ("company", "companyName", "")),
+        "duration": "open_ended",
+        "fixed": (("location", ""), ("description", "")),
+    },
+    {
+        "section": "education",
+        "source": "educations",
+        "fields": (("school", "schoolName", ""), ("degree", None, ""), ("field", None, "")),
+        "duration": "closed",
+        "fixed": (("description", ""),),
+    },
+    {
+        "section": "skills",
+        "source": "skills",
+        "fields": (("name", "name", ""), ("endorsements", "endorsements", 0)),
+        "duration": None,
+        "fixed": (),
+    },
+)
+
+# Sections the raw item doesn't provide, always present as empty lists
+EMPTY_SECTIONS = (
+    "certifications", "languages", "volunteer_experience", "publications", "patents", "courses",
+    "projects", "honors_awards", "test_scores", "organizations", "people_also_viewed", "recommendations"
+)
+
+class ProfileNormalizer:
+    """Turns raw Apify profile items into the app's profile structure using a precompiled plan
+
+    The field mapping is resolved once into tuples of keys so that normalizing an
+    item is a flat loop over them, rather than nested lookups per field.
+    """
+
+    def __init__(self):
+        self._basic_fields = BASIC_INFO_FIELDS
+        self._sections = []
+        for plan in SECTION_PLANS:
+            # Output keys in order, with the duration slot placed where the structure expects it
+            keys: List[str] = [out for out, _, _ in plan["fields"]]
+            copied = tuple((out, raw, default) for out, raw, default in plan["fields"] if raw is not None)
+            constant = tuple((out, default) for out, raw, default in plan["fields"] if raw is None)
+            if plan["duration"]:
+                keys.append("duration")
+            keys.extend(out for out, _ in plan["fixed"])
+            self._sections.append((
+                plan["section"], plan["source"], copied, constant + plan["fixed"],
+                plan["duration"], tuple(keys)
+            ))
+
+    def normalize(self, raw: Dict) -> Dict:
+        """Normalize one raw profile item; raises on malformed input the caller should handle"""
+        get = raw.get
+        basic_info = {
+            "full_name": f"{get('firstName', '')} {get('lastName', '')}".strip()
+        }
+        for out, key in self._basic_fields:
+            basic_info[out] = get(key, "")
+        basic_info["profile_url"] = f"https://linkedin.com/in/{get('publicIdentifier', '')}"
+        basic_info["profile_picture"] = get("pictureUrl", "")
+
+        profile = {"basic_info": basic_info}
+        for section, source, copied, constant, duration_rule, keys in self._sections:
+            items = []
+            for item in get(source, []):
+                if not isinstance(item, dict):
+                    continue
+                values = {out: item.get(key, default) for out, key, default in copied}
+                if duration_rule:
+                    values["duration"] = self._duration(item, duration_rule)
+                values.update(constant)
+                items.append({key: values[key] for key in keys})
+            profile[section] = items
+
+        for section in EMPTY_SECTIONS:
+            profile[section] = []
+        profile["connections"] = str(get("connectionsCount", ""))
+        profile["followers"] = str(get("followersCount", ""))
+        return profile
+
+    @staticmethod
+    def _duration(item: Dict, rule: str) -> str:
+        period = item.get("timePeriod")
+        if not period or not isinstance(period, dict):
+            return ""
+        start = period.get("startDate")
+        if not start or not isinstance(start, dict):
+            return ""
+        end = period.get("endDate")
+        if not end or not isinstance(end, dict):
+            return f"{start.get('year', '')} - Present" if rule == "open_ended" else ""
+        return f"{start.get('year', '')} - {end.get('year', '')}"
+
+_normalizer = ProfileNormalizer()
+
+def normalize_profile(raw: Dict) -> Dict:
+    """Normalize a raw Apify profile item with the shared precompiled plan"""
+    return _normalizer.normalize(raw)
+
+def iter_dataset_items(url: str, headers: Dict = None, page_size: int = 1000,
+                       session: requests.Session = None, max_items: int = None) -> Iterator[Dict]:
+    """Stream items from an Apify dataset items endpoint one page at a time
+
+    Only one page is held in memory, and each page is decoded with the fastest
+    JSON decoder available.
+    """
+    http = session or requests
+    offset = 0
+    while max_items is None or offset < max_items:
+        limit = page_size if max_items is None else min(page_size, max_items - offset)
+        response = http.get(url, params={"offset": offset, "limit": limit, "clean": "true"},
+                            headers=headers, timeout=60)
+        response.raise_for_status()
+        page = loads(response.content)
+        yield from page
+        if len(page) < limit:
+            return
+        offset += len(page)
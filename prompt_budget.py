@@ -0,0 +1,129 @@
+import math
+import threading
+from typing import Dict, List, Optional
+import config
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a piece of text uses, without a model-specific tokenizer"""
+    if not text:
+        return 0
+    # ~4 characters per token for English prose, ~0.75 words per token for short-word text;
+    # take whichever is larger so the estimate errs on the side of a smaller prompt
+    by_chars = math.ceil(len(text) / 4)
+    by_words = math.ceil(len(text.split()) * 4 / 3)
+    return max(by_chars, by_words)
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Shorten text to roughly max_tokens, keeping the start ('head') or the end ('tail')"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    chars = max_tokens * 4
+    while chars > 0:
+        if keep == "tail":
+            cut = text[-chars:]
+            # Start at a word boundary
+            space = cut.find(" ")
+            candidate = "… " + (cut[space + 1:] if 0 <= space < len(cut) // 4 else cut)
+        else:
+            cut = text[:chars]
+            space = cut.rfind(" ")
+            candidate = (cut[:space] if space > len(cut) * 3 // 4 else cut) + " …"
+        if estimate_tokens(candidate) <= max_tokens:
+            return candidate
+        chars = int(chars * 0.9)
+    return ""
+
+class PromptSection:
+    """One named part of a prompt with its value ranking for truncation"""
+
+    def __init__(self, name: str, text: str, priority: int = 0, max_tokens: int = None,
+                 keep: str = "head", required: bool = False):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority      # Lower priority sections are shortened first
+        self.max_tokens = max_tokens if max_tokens is not None else config.PROMPT_SECTION_BUDGETS.get(name)
+        self.keep = keep              # 'tail' keeps the most recent part, e.g. for history
+        self.required = required      # Required sections are never shortened
+
+class BudgetedPrompt:
+    """A prompt fitted to a token budget, with its size report"""
+
+    def __init__(self, text: str, section_tokens: Dict[str, int], truncated: List[str]):
+        self.text = text
+        self.section_tokens = section_tokens
+        self.truncated = truncated
+        self.estimated_tokens = estimate_tokens(text)
+
+    def report(self) -> Dict:
+        return {
+            "estimated_tokens": self.estimated_tokens,
+            "section_tokens": self.section_tokens,
+            "truncated_sections": self.truncated
+        }
+
+class PromptBudget:
+    """Fits prompt sections into a total token budget, shortening the least valuable first"""
+
+    def __init__(self, max_tokens: int = None):
+        self.max_tokens = max_tokens or config.PROMPT_TOKEN_BUDGET
+        self.last_report: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self.stats = {"prompts": 0, "truncated_prompts": 0, "estimated_tokens": 0, "max_estimated_tokens": 0}
+
+    def fit(self, sections: List[PromptSection], separator: str = "\n") -> BudgetedPrompt:
+        """Build a prompt from sections, in order, that stays within the token budget"""
+        texts = {}
+        truncated = []
+
+        # First cap every section at its own budget
+        for section in sections:
+            text = section.text
+            if not section.required and section.max_tokens is not None:
+                shortened = truncate_to_tokens(text, section.max_tokens, section.keep)
+                if shortened != text:
+                    truncated.append(section.name)
+                text = shortened
+            texts[section.name] = text
+
+        # Then shorten the lowest value sections until the whole prompt fits
+        overflow = sum(estimate_tokens(text) for text in texts.values()) - self.max_tokens
+        for section in sorted(sections, key=lambda s: s.priority):
+            if overflow <= 0:
+                break
+            if section.required:
+                continue
+            current = estimate_tokens(texts[section.name])
+            if not current:
+                continue
+            texts[section.name] = truncate_to_tokens(texts[section.name], max(0, current - overflow), section.keep)
+            overflow -= current - estimate_tokens(texts[section.name])
+            if section.name not in truncated:
+                truncated.append(section.name)
+
+        prompt = BudgetedPrompt(
+            separator.join(texts[section.name] for section in sections if texts[section.name]),
+            {name: estimate_tokens(text) for name, text in texts.items()},
+            truncated
+        )
+        self._record(prompt)
+        return prompt
+
+    def _record(self, prompt: BudgetedPrompt):
+        with self._lock:
+            self.last_report = prompt.report()
+            self.stats["prompts"] += 1
+            self.stats["estimated_tokens"] += prompt.estimated_tokens
+            self.stats["max_estimated_tokens"] = max(self.stats["max_estimated_tokens"], prompt.estimated_tokens)
+            if prompt.truncated:
+                self.stats["truncated_prompts"] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            prompts = self.stats["prompts"]
+            return {
+                **self.stats,
+                "avg_estimated_tokens": self.stats["estimated_tokens"] / prompts if prompts else 0
+            }
@@ -0,0 +1,98 @@
+import time
+import threading
+from typing import Dict, Optional
+import config
+
+class TokenBucket:
+    """Thread-safe token bucket that queues callers until a token is available"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate          # Tokens added per second
+        self.burst = burst        # Maximum tokens that can be saved up
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._cond = threading.Condition()
+        self.queue_depth = 0
+        self.stats = {
+            "acquired": 0,
+            "rejected": 0,
+            "max_queue_depth": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0
+        }
+
+    def _refill(self):
+        """Add the tokens earned since the last update; caller must hold the lock"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, max_wait: float = None) -> bool:
+        """Wait for a token, giving up if none can be had within max_wait seconds"""
+        max_wait = config.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        start = time.monotonic()
+        deadline = start + max_wait
+
+        with self._cond:
+            self.queue_depth += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+            try:
+                while True:
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        waited = time.monotonic() - start
+                        self.stats["acquired"] += 1
+                        self.stats["total_wait_seconds"] += waited
+                        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+                        return True
+
+                    # Give up early if the next token can't arrive before the deadline
+                    until_next_token = (1 - self._tokens) / self.rate
+                    if time.monotonic() + until_next_token > deadline:
+                        self.stats["rejected"] += 1
+                        return False
+                    self._cond.wait(until_next_token)
+            finally:
+                self.queue_depth -= 1
+
+    def get_stats(self) -> Dict:
+        """Get queue depth and wait-time metrics"""
+        with self._cond:
+            acquired = self.stats["acquired"]
+            return {
+                "name": self.name,
+                "rate": self.rate,
+                "burst": self.burst,
+                "queue_depth": self.queue_depth,
+                **self.stats,
+                "avg_wait_seconds": self.stats["total_wait_seconds"] / acquired if acquired else 0.0
+            }
+
+_limiters: Dict[str, Optional[TokenBucket]] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name: str) -> Optional[TokenBucket]:
+    """Get the shared limiter for an endpoint such as 'openrouter:<model>' or 'apify:api'
+
+    Limits come from config.RATE_LIMITS; names without their own entry use the
+    '<provider>:default' entry, and None is returned when neither exists.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            provider = name.split(":", 1)[0]
+            limits = config.RATE_LIMITS.get(name) or config.RATE_LIMITS.get(f"{provider}:default")
+            _limiters[name] = TokenBucket(name, limits["rate"], limits["burst"]) if limits else None
+        return _limiters[name]
+
+def acquire(name: str, max_wait: float = None) -> bool:
+    """Wait for permission to call an endpoint; always allowed when it has no limit"""
+    limiter = get_rate_limiter(name)
+    return limiter.acquire(max_wait) if limiter else True
+
+def get_rate_limiter_stats() -> Dict:
+    """Get metrics for every limiter created so far"""
+    with _limiters_lock:
+        limiters = [limiter for limiter in _limiters.values() if limiter]
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
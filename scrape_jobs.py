@@ -0,0 +1,156 @@
+import time
+import uuid
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import config
+from linkedin_scraper import LinkedInScraper, set_progress_callback
+
+class ScrapeJob:
+    """One queued profile scrape and what is known about its progress"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, linkedin_url: str, user_id: str = None, force_refresh: bool = False):
+        self.id = uuid.uuid4().hex
+        self.linkedin_url = linkedin_url
+        self.user_id = user_id
+        self.force_refresh = force_refresh
+        self.status = self.QUEUED
+        self.actor_status: Optional[str] = None    # Latest Apify run status, e.g. 'RUNNING'
+        self.progress: List[Dict] = []             # Progress messages with timestamps
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def to_dict(self) -> Dict:
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "linkedin_url": self.linkedin_url,
+            "user_id": self.user_id,
+            "status": self.status,
+            "actor_status": self.actor_status,
+            "message": self.progress[-1]["message"] if self.progress else "Waiting for a free worker",
+            "progress": list(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "elapsed_seconds": end - (self.started_at or self.created_at),
+            "queued_seconds": (self.started_at or end) - self.created_at
+        }
+
+class ScrapeJobQueue:
+    """Runs profile scrapes on a bounded worker pool so callers never block on them"""
+
+    def __init__(self, scraper: LinkedInScraper = None, max_workers: int = None, max_finished_jobs: int = None):
+        self.scraper = scraper or LinkedInScraper()
+        self.max_finished_jobs = max_finished_jobs or config.SCRAPE_JOB_MAX_FINISHED
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or config.SCRAPE_JOB_WORKERS, thread_name_prefix="scrape-job"
+        )
+        self._jobs: "OrderedDict[str, ScrapeJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0}
+
+    def submit(self, linkedin_url: str, user_id: str = None, force_refresh: bool = False) -> str:
+        """Queue a profile scrape and return its job ID right away"""
+        job = ScrapeJob(linkedin_url, user_id, force_refresh)
+        with self._lock:
+            self._jobs[job.id] = job
+            self.stats["submitted"] += 1
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def _run(self, job: ScrapeJob):
+        with self._lock:
+            job.status = ScrapeJob.RUNNING
+            job.started_at = time.time()
+
+        def on_progress(actor_status: str, message: str):
+            with self._lock:
+                job.actor_status = actor_status
+                job.progress.append({"time": time.time(), "status": actor_status, "message": message})
+
+        set_progress_callback(on_progress)
+        try:
+            result = self.scraper.get_profile(job.linkedin_url, force_refresh=job.force_refresh)
+            error = None if result else "The profile could not be scraped"
+        except Exception as e:
+            print(f"Scrape job {job.id} failed: {e}")
+            result, error = None, str(e)
+        finally:
+            set_progress_callback(None)
+
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.status = ScrapeJob.SUCCEEDED if result else ScrapeJob.FAILED
+            job.finished_at = time.time()
+            self.stats[job.status] += 1
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job's status, progress and, once finished, its result"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def get_user_jobs(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values() if job.user_id == user_id]
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[Dict]:
+        """Block until a job finishes or the timeout passes, then return its state"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            job = self.get_job(job_id)
+            if job is None or job["status"] in (ScrapeJob.SUCCEEDED, ScrapeJob.FAILED):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    def forget(self, job_id: str):
+        """Drop a job once its result has been picked up"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the retention limit; caller must hold the lock"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                **self.stats,
+                "queued": statuses.count(ScrapeJob.QUEUED),
+                "running": statuses.count(ScrapeJob.RUNNING)
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+_job_queue: Optional[ScrapeJobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_scrape_job_queue() -> ScrapeJobQueue:
+    """Get the process-wide scrape job queue shared by every Streamlit session"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = ScrapeJobQueue()
+        return _job_queue
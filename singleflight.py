@@ -0,0 +1,58 @@
+import threading
+from typing import Callable, Dict, Optional
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into a single execution"""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self._calls: Dict[str, "SingleFlight._Call"] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executions": 0, "collapsed": 0}
+
+    def do(self, key: str, fn: Callable, on_wait: Callable[[], None] = None):
+        """Run fn, or wait for the identical call already in flight and share its result
+
+        on_wait is called before waiting when this caller attaches to a call in flight.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.stats["executions"] += 1
+            else:
+                self.stats["collapsed"] += 1
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._calls)}
@@ -7,11 +7,25 @@ Run this to verify all components are working correctly
 import os
 import sys
 import json
+import atexit
+import shutil
+import tempfile
 from unittest.mock import Mock
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import config
+
+# Persistent memory written by the tests goes to a scratch directory, not the working tree.
+# Registered first so it runs last at exit, after the stores' own final flushes.
+_memory_dir = tempfile.mkdtemp(prefix="memory-test-")
+atexit.register(shutil.rmtree, _memory_dir, ignore_errors=True)
+config.MEMORY_SNAPSHOT_PATH = os.path.join(_memory_dir, "user_memory.json")
+config.MEMORY_JOURNAL_PATH = os.path.join(_memory_dir, "user_memory.journal")
+config.MEMORY_SQLITE_PATH = os.path.join(_memory_dir, "user_memory.sqlite3")
+config.MEMORY_SHARD_DIR = os.path.join(_memory_dir, "user_memory")
+
 def test_imports():
     """Test that all modules can be imported"""
     print("🔍 Testing imports...")
@@ -98,6 +112,370 @@ def test_memory_system():
         print(f"❌ Memory system test failed: {e}")
         return False
 
+def test_memory_journal():
+    """Test that journaled memory replays after restarts, torn writes and compaction"""
+    print("\n📓 Testing Memory Journal...")
+    
+    try:
+        import tempfile
+        from memory_journal import MemoryJournal
+        from memory_system import ProfileMemorySystem
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = (os.path.join(tmp, "memory.json"), os.path.join(tmp, "memory.journal"))
+            journal = MemoryJournal(*paths)
+            memory = ProfileMemorySystem(store=journal)
+            for i in range(3):
+                memory.add_message("alice", f"message {i}")
+            memory.update_career_goals("alice", ["Staff Engineer"])
+            expected = json.loads(json.dumps(journal.users))
+            journal.close()
+            
+            with open(paths[1], "ab") as f:
+                f.write(b'{"op":"append","user":"alice","fie')   # Torn by a crash mid-write
+            journal = MemoryJournal(*paths)
+            assert journal.users == expected and journal.get_stats()["torn_bytes_dropped"] > 0
+            print("✅ Journal replays after a restart and drops a torn final entry")
+            
+            with open(paths[1], "rb") as f:
+                entries = f.read()
+            journal.compact()
+            journal.close()
+            with open(paths[1], "wb") as f:
+                f.write(entries)   # Crash after the snapshot was written but before the journal reset
+            journal = MemoryJournal(*paths)
+            assert journal.users == expected, "entries already in the snapshot were replayed again"
+            assert len(journal.users["alice"]["interaction_history"]) == 3
+            journal.close()
+            print("✅ Compaction survives a crash without applying entries twice")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Memory journal test failed: {e}")
+        return False
+
+def test_write_behind_flush():
+    """Test that write-behind coalesces changes and flushes on threshold, interval and close"""
+    print("\n⏳ Testing Write-Behind Flushing...")
+    
+    try:
+        import time
+        import tempfile
+        from memory_journal import MemoryJournal
+        from memory_system import ProfileMemorySystem
+    
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = (os.path.join(tmp, "memory.json"), os.path.join(tmp, "memory.journal"))
+            journal = MemoryJournal(*paths, write_behind=True, flush_interval=60, flush_max_dirty=3)
+            memory = ProfileMemorySystem(store=journal)
+            for i in range(20):
+                memory.add_message("alice", f"message {i}")
+            assert os.path.getsize(paths[1]) == 0, "write-behind wrote on the request path"
+            assert journal.get_stats()["coalesced"] > 0
+    
+            memory.add_message("bob", "hi")
+            memory.add_message("carol", "hi")   # Third dirty user crosses max_dirty
+            deadline = time.time() + 5
+            while journal.get_stats()["entries_written"] < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            with open(paths[1], "rb") as f:
+                entries = [json.loads(line) for line in f]
+            assert sorted(entry["user"] for entry in entries) == ["alice", "bob", "carol"], entries
+            print("✅ Twenty messages coalesce into one entry, flushed once max_dirty users are dirty")
+    
+            journal.close()
+            
+            journal = MemoryJournal(*paths, write_behind=True, flush_interval=0.05)
+            memory = ProfileMemorySystem(store=journal)
+            memory.update_career_goals("alice", ["Staff Engineer"])
+            time.sleep(0.3)
+            assert journal.get_stats()["dirty_users"] == 0, "interval flush did not run"
+    
+            memory.add_message("dave", "last words")
+            expected = json.loads(json.dumps(journal.users))
+            journal.close()
+            reloaded = MemoryJournal(*paths, write_behind=False)
+            assert reloaded.users == expected
+            assert len(reloaded.users["alice"]["interaction_history"]) == 20
+            reloaded.close()
+            print("✅ Interval and shutdown flushes persist every change")
+    
+        return True
+    
+    except Exception as e:
+        print(f"❌ Write-behind test failed: {e}")
+        return False
+
+def test_sharded_memory_store():
+    """Test that sharded memory loads users lazily and only evicts them once saved"""
+    print("\n🗂️  Testing Sharded Memory Store...")
+    
+    try:
+        import time
+        import tempfile
+        from memory_journal import MemoryJournal
+        from memory_shards import ShardedMemoryStore
+        from memory_store import create_memory_store
+        from memory_system import ProfileMemorySystem
+    
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ShardedMemoryStore(tmp, cache_size=3, write_behind=True, flush_interval=60)
+            memory = ProfileMemorySystem(store=store)
+            for i in range(6):
+                memory.add_message(f"user-{i}", f"hello from {i}")
+            memory.update_career_goals("user-0", ["Staff Engineer"])
+            assert store.get_stats()["cached_users"] > 3, "evicted users with unsaved changes"
+    
+            # Eviction is blocked by dirty users, so the flusher is woken early
+            deadline = time.time() + 5
+            while store.get_stats()["cached_users"] > 3 and time.time() < deadline:
+                time.sleep(0.01)
+            stats = store.get_stats()
+            assert stats["cached_users"] == 3 and stats["dirty_users"] == 0, stats
+            assert store.get_user("user-1")["interaction_history"][0]["message"] == "hello from 1"   # Reloaded from its file
+            assert store.get_stats()["loads"] == 1
+            print("✅ Dirty users stay cached until flushed, then the LRU trims to cache_size")
+    
+            memory.add_message("user-0", "after reload")
+            store.close()
+            reopened = ShardedMemoryStore(tmp, cache_size=3, write_behind=False)
+            assert reopened.get_stats()["cached_users"] == 0, "users were loaded at startup"
+            assert reopened.has_user("user-5") and not reopened.has_user("nobody")
+            assert reopened.get_stats()["cached_users"] == 0, "has_user loaded the record"
+            messages = [m["message"] for m in reopened.get_user("user-0")["interaction_history"]]
+            assert messages == ["hello from 0", "after reload"], messages
+            assert reopened.get_user("user-0")["career_goals"] == ["Staff Engineer"]
+            reopened.append("user-1", "interaction_history", {"message": "sync"}, keep=1, at="t1")
+            assert ShardedMemoryStore(tmp, write_behind=False).get_user("user-1")["interaction_history"] == [{"message": "sync"}]
+            print("✅ Nothing loads at startup and every change survives a reopen")
+    
+            corrupt = ShardedMemoryStore(tmp, write_behind=False)
+            shard_path = corrupt._path("user-2")
+            with open(shard_path, "w") as f:
+                f.write('{"user_id": "user-2", "interaction_hist')
+            assert corrupt.get_user("user-2") is None and not corrupt.has_user("user-2")
+            with open(f"{shard_path}.corrupt") as f:
+                assert f.read().startswith('{"user_id": "user-2"'), "the corrupt shard was not kept"
+            recovered = ProfileMemorySystem(store=corrupt)
+            recovered.add_message("user-2", "fresh start")
+            assert recovered.get_user_persistent("user-2")["interaction_history"][0]["message"] == "fresh start"
+            print("✅ A corrupt shard is moved aside instead of being overwritten")
+    
+            journal = MemoryJournal(os.path.join(tmp, "memory.json"), os.path.join(tmp, "memory.journal"),
+                                    write_behind=False)
+            journal.create_user("bob", {"user_id": "bob", "interaction_history": [{"message": "from the journal"}]})
+            journal.close()
+            saved = (config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH, config.MEMORY_SHARD_DIR)
+            try:
+                config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH = journal.snapshot_path, journal.journal_path
+                config.MEMORY_SHARD_DIR = os.path.join(tmp, "migrated")
+                for _ in range(2):   # The second open finds a populated directory and imports nothing
+                    migrated = create_memory_store("sharded")
+                    assert migrated.get_user("bob") == journal.get_user("bob"), migrated.get_user("bob")
+                    migrated.close()
+                assert create_memory_store("sharded").get_stats()["files_written"] == 0, "imported twice"
+                print("✅ A new shard directory imports the existing journal memory once")
+            finally:
+                config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH, config.MEMORY_SHARD_DIR = saved
+    
+        return True
+    
+    except Exception as e:
+        print(f"❌ Sharded memory store test failed: {e}")
+        return False
+
+def test_sqlite_memory_store():
+    """Test that the SQLite memory store keeps the same records as the journal"""
+    print("\n🗄️  Testing SQLite Memory Store...")
+    
+    try:
+        import tempfile
+        from memory_journal import MemoryJournal
+        from memory_store import SqliteMemoryStore
+        from memory_system import ProfileMemorySystem
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = MemoryJournal(os.path.join(tmp, "memory.json"), os.path.join(tmp, "memory.journal"))
+            sqlite_store = SqliteMemoryStore(os.path.join(tmp, "memory.sqlite3"))
+            for store in (journal, sqlite_store):
+                store.create_user("bob", {"user_id": "bob", "created_at": "t0", "last_updated": "t0",
+                                          "profile_history": [], "career_goals": [], "job_preferences": [],
+                                          "skill_gaps": [], "interaction_history": [], "preferences": {}})
+                for i in range(5):
+                    store.append("bob", "interaction_history",
+                                 {"timestamp": f"t{i}", "sender": "user", "message": f"hi {i}"}, keep=3, at=f"t{i}")
+                store.append("bob", "profile_history", {"timestamp": "t5", "profile_data": {"skills": ["SQL"]}},
+                             keep=10, at="t5")
+                store.set("bob", "career_goals", ["Data Engineer", "Team Lead"], at="t6")
+                store.set("bob", "skill_gaps", [{"skill": "Spark"}], at="t7")
+                store.set("bob", "job_preferences", {"remote": True}, at="t8")
+            
+            assert sqlite_store.get_user("bob") == journal.get_user("bob"), sqlite_store.get_user("bob")
+            assert [m["message"] for m in sqlite_store.get_user("bob")["interaction_history"]] == ["hi 2", "hi 3", "hi 4"]
+            assert sqlite_store.get_summary("bob") == journal.get_summary("bob")
+            assert sqlite_store.get_preferences("bob") == journal.get_preferences("bob")
+            print("✅ SQLite records, summaries and preferences match the journal")
+            
+            memory = ProfileMemorySystem(store=sqlite_store)
+            memory.add_message("carol", "Hello")
+            assert memory.get_memory_summary("carol")["persistent_info"]["profile_history_count"] == 0
+            conn = sqlite_store._connect()
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM interaction_history WHERE user_id = ?", ("carol",)).fetchall()
+            assert any("idx_interaction_history_user" in str(row) for row in plan), plan
+            print("✅ Memory system runs on SQLite with WAL and indexed per-user lookups")
+            sqlite_store.close()
+            journal.close()
+            
+            import config
+            from memory_store import create_memory_store
+            saved = (config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH, config.MEMORY_SQLITE_PATH)
+            try:
+                config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH = journal.snapshot_path, journal.journal_path
+                config.MEMORY_SQLITE_PATH = os.path.join(tmp, "migrated.sqlite3")
+                for _ in range(2):   # The second open finds a populated database and imports nothing
+                    migrated = create_memory_store("sqlite")
+                    assert migrated.get_user("bob") == journal.get_user("bob"), migrated.get_user("bob")
+                    migrated.close()
+                print("✅ A new SQLite store imports the existing journal memory once")
+            finally:
+                config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH, config.MEMORY_SQLITE_PATH = saved
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ SQLite memory store test failed: {e}")
+        return False
+
+def test_redis_memory_store():
+    """Test the Redis memory backend against REDIS_TEST_URL or an in-process fake"""
+    print("\n🟥 Testing Redis Memory Store...")
+    
+    try:
+        import time
+        import uuid
+        import fnmatch
+        import tempfile
+        import config
+        from memory_journal import MemoryJournal
+        from memory_store import migrate_journal_memory
+        from memory_redis import RedisMemoryStore, create_redis_client
+        from memory_system import ProfileMemorySystem
+        
+        class FakeRedis:
+            """Just enough of redis-py (decode_responses=True) for the memory backend"""
+            def __init__(self):
+                self.data, self.expiry, self.commands = {}, {}, 0
+            
+            def _get(self, key, default):
+                if key in self.expiry and self.expiry[key] <= time.time():
+                    self.delete(key)
+                return self.data.setdefault(key, default) if default is not None else self.data.get(key)
+            
+            def _range(self, items, start, stop):
+                start = max(len(items) + start, 0) if start < 0 else start
+                stop = len(items) + stop if stop < 0 else stop
+                return items[start:stop + 1]
+            
+            def pipeline(self):
+                redis_client = self
+                class Pipeline:
+                    def __init__(self):
+                        self.calls = []
+                    def __getattr__(self, name):
+                        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+                    def execute(self):
+                        redis_client.commands += 1
+                        return [getattr(redis_client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+                return Pipeline()
+            
+            def exists(self, key):
+                return int(bool(self._get(key, None)))
+            def delete(self, *keys):
+                for key in keys:
+                    self.data.pop(key, None)
+                    self.expiry.pop(key, None)
+            def hgetall(self, key):
+                return dict(self._get(key, {}))
+            def hget(self, key, field):
+                return self._get(key, {}).get(field)
+            def hmget(self, key, fields):
+                return [self._get(key, {}).get(field) for field in fields]
+            def hset(self, key, field=None, value=None, mapping=None):
+                values = dict(mapping or {}, **({field: value} if field is not None else {}))
+                self._get(key, {}).update({k: str(v) for k, v in values.items()})
+            def hsetnx(self, key, field, value):
+                if field in self._get(key, {}):
+                    return 0
+                self.hset(key, field, value)
+                return 1
+            def hincrby(self, key, field, amount):
+                self.hset(key, field, int(self.hget(key, field) or 0) + amount)
+            def rpush(self, key, *values):
+                self._get(key, []).extend(values)
+            def ltrim(self, key, start, stop):
+                self.data[key] = self._range(self._get(key, []), start, stop)
+            def lrange(self, key, start, stop):
+                return self._range(self._get(key, []), start, stop)
+            def llen(self, key):
+                return len(self._get(key, []))
+            def expireat(self, key, when):
+                self.expiry[key] = when
+            def scan_iter(self, match, count=None):
+                return (key for key in list(self.data) if fnmatch.fnmatch(key, match))
+            def close(self):
+                pass
+        
+        url = os.getenv("REDIS_TEST_URL")
+        client = create_redis_client(url) if url else FakeRedis()
+        store = RedisMemoryStore(client, prefix=f"test-{uuid.uuid4().hex}:")
+        memory = ProfileMemorySystem(store=store)
+        other_replica = ProfileMemorySystem(store=RedisMemoryStore(client, prefix=store.prefix))
+        
+        for i in range(4):
+            memory.add_message("dave", f"message {i}")
+        memory.update_profile_data("dave", {"basic_info": {"full_name": "Dave"}})
+        memory.update_career_goals("dave", ["Architect"])
+        assert [m["message"] for m in other_replica.get_conversation_context("dave", 2)] == ["message 2", "message 3"]
+        assert other_replica.get_profile_context("dave")["basic_info"]["full_name"] == "Dave"
+        assert other_replica.get_user_preferences("dave")["career_goals"] == ["Architect"]
+        summary = other_replica.get_memory_summary("dave")
+        assert summary["session_info"]["interaction_count"] == 4, summary
+        assert summary["persistent_info"]["profile_history_count"] == 1
+        assert len(other_replica.get_user_persistent("dave")["interaction_history"]) == 4
+        print("✅ Session and persistent memory are shared between replicas")
+        
+        if isinstance(client, FakeRedis):
+            session_key = f"{store.prefix}session:dave"
+            assert client.expiry[session_key] == client.expiry[session_key + ":messages"]
+            assert client.expiry[session_key] - time.time() <= config.MEMORY_TTL
+            client.expiry[session_key] = client.expiry[session_key + ":messages"] = time.time() - 1
+            assert memory.get_conversation_context("dave") == [], "expired session still served"
+            print("✅ Sessions expire through key TTLs")
+        
+        memory.clear_session("dave")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = MemoryJournal(os.path.join(tmp, "memory.json"), os.path.join(tmp, "memory.journal"))
+            ProfileMemorySystem(store=journal).add_message("erin", "from the journal")
+            journal.close()
+            saved = (config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH)
+            try:
+                config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH = journal.snapshot_path, journal.journal_path
+                fresh = RedisMemoryStore(client, prefix=f"test-{uuid.uuid4().hex}:")
+                assert migrate_journal_memory(fresh, "redis") == 1
+                assert fresh.get_user("erin") == journal.get_user("erin"), fresh.get_user("erin")
+                assert migrate_journal_memory(fresh, "redis") == 0, "imported into a populated store"
+                print("✅ A new Redis store imports the existing journal memory once")
+            finally:
+                config.MEMORY_SNAPSHOT_PATH, config.MEMORY_JOURNAL_PATH = saved
+        return True
+        
+    except Exception as e:
+        print(f"❌ Redis memory store test failed: {e}")
+        return False
+
 def test_profile_analyzer():
     """Test profile analyzer with mock data"""
     print("\n📊 Testing Profile Analyzer...")
@@ -246,6 +624,17 @@ def test_content_generator():
         assert "enhanced_experiences" in experience_enhancements
         print("✅ Experience enhancements generated successfully")
         
+        # Batched package: both answers from the single call are used
+        generator.llm = Mock()
+        generator.llm.invoke_batch.return_value = [
+            '{"achievement_focused": "a", "skill_focused": "s", "value_focused": "v"}',
+            '```json\n{"story_focused": "LLM story", "achievement_focused": "LLM results"}\n```'
+        ]
+        package = generator.generate_content_package(mock_profile)
+        assert package["headlines"]["skill_focused"] == "s"
+        assert package["summaries"] == {"story_focused": "LLM story", "achievement_focused": "LLM results"}
+        print("✅ Content package uses the batched LLM summary")
+        
         return True
         
     except Exception as e:
@@ -275,6 +664,27 @@ def test_chat_agent():
         assert intent == "job_analysis"
         print("✅ Job analysis intent detected correctly")
         
+        # A tight budget trims history and profile but never the user's question
+        from prompt_budget import PromptBudget
+        agent.prompt_budget = PromptBudget(max_tokens=200)
+        history = [{"sender": "user", "message": "Earlier question " * 100} for _ in range(5)]
+        profile = {"basic_info": {"full_name": "Ada Lovelace", "headline": "Engineer " * 300}}
+        prompt = agent._build_general_prompt("How do I improve my headline?", profile, history)
+        assert "User: How do I improve my headline?" in prompt
+        print("✅ The user's message survives prompt budgeting")
+        
+        def broken_stream(prompt, use_cache=True):
+            yield "Start with "
+            yield "a clear headline"
+            raise ConnectionError("stream dropped")
+        agent.llm = Mock(stream=broken_stream)
+        chunks = list(agent.stream_message("stream-test-user", "Tell me something nice"))
+        assert chunks[:2] == ["Start with ", "a clear headline"], chunks
+        assert "interrupted" in chunks[2] and "apologize" not in "".join(chunks), chunks
+        history = agent.memory_system.get_conversation_context("stream-test-user")
+        assert history[-1]["sender"] == "assistant" and history[-1]["message"] == "Start with a clear headline", history
+        print("✅ A stream that fails midway keeps only the streamed text in memory")
+        
         return True
         
     except Exception as e:
@@ -282,6 +692,426 @@ def test_chat_agent():
         print("   This might be due to missing OpenRouter API key")
         return False
 
+def test_rate_limiter():
+    """Test token bucket queueing and max-wait rejection"""
+    print("\n🚦 Testing Rate Limiter...")
+    
+    try:
+        import time
+        from rate_limiter import TokenBucket
+        
+        bucket = TokenBucket("test", rate=20, burst=2)
+        start = time.perf_counter()
+        for _ in range(4):
+            assert bucket.acquire(max_wait=1)
+        elapsed = time.perf_counter() - start
+        
+        # Two calls use the burst, the other two wait ~50ms each for a token
+        assert 0.08 <= elapsed < 0.5, f"took {elapsed:.3f}s"
+        print("✅ Requests queue for tokens instead of firing blind")
+        
+        slow_bucket = TokenBucket("slow", rate=0.1, burst=1)
+        assert slow_bucket.acquire(max_wait=0)
+        assert not slow_bucket.acquire(max_wait=0.5)
+        stats = slow_bucket.get_stats()
+        assert stats["acquired"] == 1 and stats["rejected"] == 1
+        print("✅ Requests that can't get a token in time are rejected")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Rate limiter test failed: {e}")
+        return False
+
+def test_prompt_budget():
+    """Test that prompts stay within budget, trimming low-value sections first"""
+    print("\n📏 Testing Prompt Budget...")
+    
+    try:
+        from prompt_budget import PromptBudget, PromptSection, estimate_tokens
+        
+        budget = PromptBudget(max_tokens=800)
+        instructions = "Answer the user's question about their LinkedIn profile."
+        prompt = budget.fit([
+            PromptSection("instructions", instructions, required=True),
+            PromptSection("profile", "Skills: Python, SQL. " * 200, priority=2, max_tokens=200),
+            PromptSection("history", "\n".join(f"User: message {i}" for i in range(500)), priority=1,
+                          max_tokens=1000, keep="tail"),
+            PromptSection("message", "User: How can I improve my headline?", priority=3)
+        ])
+        
+        assert prompt.estimated_tokens <= 800
+        assert instructions in prompt.text
+        assert "How can I improve my headline?" in prompt.text
+        assert "message 499" in prompt.text and "message 0\n" not in prompt.text
+        assert prompt.section_tokens["profile"] <= 200
+        assert "history" in prompt.truncated
+        assert budget.last_report["estimated_tokens"] == estimate_tokens(prompt.text)
+        print("✅ Prompt fitted to budget keeping instructions and latest history")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Prompt budget test failed: {e}")
+        return False
+
+def test_batch_scraping():
+    """Test that many profiles share a few actor runs and map back to their URLs"""
+    print("\n📦 Testing Batch Profile Scraping...")
+    
+    try:
+        import threading
+        from linkedin_scraper import LinkedInScraper
+        
+        class FakeApifyClient:
+            def __init__(self):
+                self.runs = []
+                self.lock = threading.Lock()
+            
+            def actor(self, name):
+                client = self
+                class Actor:
+                    def start(self, run_input):
+                        with client.lock:
+                            client.runs.append(run_input["urls"])
+                            n = len(client.runs)
+                        return {"id": f"run-{n}", "defaultDatasetId": str(n)}
+                return Actor()
+            
+            def run(self, run_id):
+                class Run:
+                    def wait_for_finish(self, wait_secs=None):
+                        return {"status": "SUCCEEDED"}
+                return Run()
+            
+            def dataset(self, dataset_id):
+                urls = self.runs[int(dataset_id) - 1]
+                class Dataset:
+                    def iterate_items(self):
+                        for url in urls:
+                            profile_id = url.rstrip("/").split("/in/")[1]
+                            if profile_id == "ghost":
+                                continue  # Private profile, the actor returns nothing
+                            yield {"publicIdentifier": profile_id.upper(), "firstName": profile_id, "lastName": "Test"}
+                return Dataset()
+        
+        scraper = LinkedInScraper()
+        scraper.client = FakeApifyClient()
+        urls = [f"https://www.linkedin.com/in/user{i}/" for i in range(5)] + [
+            "https://www.linkedin.com/in/ghost",
+            "https://www.linkedin.com/in/user0?trk=share",
+            "https://example.com/not-linkedin"
+        ]
+        outcomes = scraper.scrape_profiles(urls, chunk_size=2)
+        
+        assert len(scraper.client.runs) == 3, f"{len(scraper.client.runs)} actor runs"
+        assert all(outcomes[f"https://www.linkedin.com/in/user{i}/"]["status"] == "ok" for i in range(5))
+        assert outcomes["https://www.linkedin.com/in/user0?trk=share"]["profile"]["basic_info"]["full_name"] == "user0 Test"
+        assert outcomes["https://www.linkedin.com/in/ghost"]["status"] == "not_found"
+        assert outcomes["https://example.com/not-linkedin"]["status"] == "invalid_url"
+        print("✅ 6 unique profiles scraped in 3 actor runs and mapped back to 8 URLs")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Batch scraping test failed: {e}")
+        return False
+
+def test_run_completion_wait():
+    """Test that run waits return when the run ends and back off when they can't long-poll"""
+    print("\n⏱️ Testing Run Completion Wait...")
+    
+    try:
+        import time
+        import config
+        from linkedin_scraper import LinkedInScraper
+        
+        scraper = LinkedInScraper()
+        finish_at = time.monotonic() + 0.3
+        checks = []
+        
+        def no_long_poll(wait_secs):
+            # Server answers right away, as if waitForFinish were ignored
+            checks.append(wait_secs)
+            return {"status": "SUCCEEDED" if time.monotonic() >= finish_at else "RUNNING"}
+        
+        original = (config.APIFY_POLL_INITIAL_INTERVAL, config.APIFY_POLL_MAX_INTERVAL)
+        config.APIFY_POLL_INITIAL_INTERVAL, config.APIFY_POLL_MAX_INTERVAL = 0.05, 0.2
+        try:
+            start = time.monotonic()
+            assert scraper._wait_for_run("run-1", no_long_poll, max_wait=5)
+            elapsed = time.monotonic() - start
+        finally:
+            config.APIFY_POLL_INITIAL_INTERVAL, config.APIFY_POLL_MAX_INTERVAL = original
+        
+        assert 0.3 <= elapsed < 0.6, f"took {elapsed:.2f}s"
+        assert len(checks) <= 6, f"{len(checks)} status checks"
+        print(f"✅ Finished run noticed {elapsed - 0.3:.2f}s after it ended with {len(checks)} checks")
+        
+        assert not scraper._wait_for_run("run-2", lambda wait_secs: {"status": "FAILED"}, max_wait=5)
+        print("✅ Failed runs end the wait immediately")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Run completion wait test failed: {e}")
+        return False
+
+def test_profile_cache():
+    """Test profile cache hits, stale-while-revalidate, force refresh and LRU eviction"""
+    print("\n🗃️ Testing Profile Cache...")
+    
+    try:
+        import time
+        from profile_cache import ProfileCache
+        
+        scrapes = []
+        def fetch(profile_id):
+            def scrape():
+                time.sleep(0.05)  # Stand-in for a slow actor run
+                scrapes.append(profile_id)
+                return {"basic_info": {"full_name": profile_id, "version": len(scrapes)}}
+            return scrape
+        
+        cache = ProfileCache(max_entries=2, ttl=0.2, stale_ttl=10)
+        assert cache.get_or_fetch("jane", fetch("jane"))["basic_info"]["version"] == 1
+        start = time.perf_counter()
+        profile = cache.get_or_fetch("jane", fetch("jane"))
+        hit_ms = (time.perf_counter() - start) * 1000
+        assert profile["basic_info"]["version"] == 1 and len(scrapes) == 1
+        assert hit_ms < 5, f"cache hit took {hit_ms:.2f} ms"
+        print(f"✅ Repeat lookup served from cache in {hit_ms:.2f} ms")
+        
+        time.sleep(0.25)
+        profile = cache.get_or_fetch("jane", fetch("jane"))
+        assert profile["basic_info"]["version"] == 1       # Stale copy served right away
+        time.sleep(0.2)
+        assert len(scrapes) == 2 and cache.get_stats()["stale_hits"] == 1
+        assert cache.lookup("jane")[0]["basic_info"]["version"] == 2
+        print("✅ Stale profile served while refreshed in the background")
+        
+        assert cache.get_or_fetch("jane", fetch("jane"), force_refresh=True)["basic_info"]["version"] == 3
+        print("✅ Force refresh re-scrapes")
+        
+        cache.get_or_fetch("john", fetch("john"))
+        cache.get_or_fetch("jane", fetch("jane"))
+        cache.get_or_fetch("ann", fetch("ann"))
+        assert cache.lookup("john")[1] == "miss" and cache.lookup("jane")[1] == "fresh"
+        assert cache.get_stats()["evictions"] == 1
+        print("✅ Least recently used profile evicted")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Profile cache test failed: {e}")
+        return False
+
+def test_scrape_job_queue():
+    """Test that scrapes run as background jobs with progress and bounded workers"""
+    print("\n🧵 Testing Scrape Job Queue...")
+    
+    try:
+        import time
+        import threading
+        from linkedin_scraper import LinkedInScraper
+        from scrape_jobs import ScrapeJobQueue
+        
+        class FakeScraper(LinkedInScraper):
+            running = 0
+            max_running = 0
+            lock = threading.Lock()
+            
+            def get_profile(self, linkedin_url, force_refresh=False):
+                with self.lock:
+                    FakeScraper.running += 1
+                    FakeScraper.max_running = max(FakeScraper.max_running, FakeScraper.running)
+                try:
+                    for status in ["READY", "RUNNING"]:
+                        self._report_progress(status, f"⏳ Scraping in progress... Status: {status}")
+                        time.sleep(0.05)
+                    if "private" in linkedin_url:
+                        return None
+                    self._report_progress("SUCCEEDED", "✅ Scraping completed successfully!")
+                    return {"basic_info": {"full_name": linkedin_url.rsplit("/", 1)[1]}}
+                finally:
+                    with self.lock:
+                        FakeScraper.running -= 1
+        
+        queue = ScrapeJobQueue(scraper=FakeScraper(), max_workers=2)
+        start = time.perf_counter()
+        job_ids = [queue.submit(f"https://linkedin.com/in/user{i}", user_id="u1") for i in range(3)]
+        job_ids.append(queue.submit("https://linkedin.com/in/private", user_id="u2"))
+        submit_ms = (time.perf_counter() - start) * 1000
+        assert submit_ms < 50, f"submit took {submit_ms:.1f} ms"
+        print(f"✅ 4 jobs submitted in {submit_ms:.1f} ms")
+        
+        jobs = [queue.wait(job_id, timeout=5) for job_id in job_ids]
+        assert [job["status"] for job in jobs] == ["succeeded"] * 3 + ["failed"]
+        assert jobs[0]["result"]["basic_info"]["full_name"] == "user0"
+        assert [p["status"] for p in jobs[0]["progress"]] == ["READY", "RUNNING", "SUCCEEDED"]
+        assert jobs[3]["error"] and FakeScraper.max_running == 2
+        assert len(queue.get_user_jobs("u1")) == 3
+        print("✅ Progress and results picked up, at most 2 scrapes ran at once")
+        
+        queue.forget(job_ids[0])
+        assert queue.get_job(job_ids[0]) is None
+        queue.shutdown()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Scrape job queue test failed: {e}")
+        return False
+
+def test_scrape_dedup():
+    """Test that concurrent scrapes of one profile share a single actor run"""
+    print("\n🔗 Testing Scrape Deduplication...")
+    
+    try:
+        import time
+        import threading
+        from linkedin_scraper import LinkedInScraper, get_scrape_dedup_stats
+        
+        class SlowApifyClient:
+            starts = 0
+            
+            def actor(self, name):
+                class Actor:
+                    def start(self, run_input):
+                        SlowApifyClient.starts += 1
+                        return {"id": "run-1", "defaultDatasetId": "1"}
+                return Actor()
+            
+            def run(self, run_id):
+                class Run:
+                    def wait_for_finish(self, wait_secs=None):
+                        time.sleep(0.3)
+                        return {"status": "SUCCEEDED"}
+                return Run()
+            
+            def dataset(self, dataset_id):
+                class Dataset:
+                    def iterate_items(self):
+                        yield {"publicIdentifier": "jane-doe", "firstName": "Jane", "lastName": "Doe"}
+                return Dataset()
+        
+        scraper = LinkedInScraper()
+        scraper.client = SlowApifyClient()
+        before = get_scrape_dedup_stats()
+        urls = ["https://www.linkedin.com/in/jane-doe", "https://linkedin.com/in/Jane-Doe/",
+                "https://www.linkedin.com/in/jane-doe?trk=x"] * 2
+        results = []
+        threads = [threading.Thread(target=lambda url=url: results.append(scraper.scrape_profile(url))) for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = get_scrape_dedup_stats()
+        
+        assert SlowApifyClient.starts == 1, f"{SlowApifyClient.starts} actor runs"
+        assert len(results) == 6 and all(r and r["basic_info"]["full_name"] == "Jane Doe" for r in results)
+        assert after["duplicate_runs_avoided"] - before["duplicate_runs_avoided"] == 5
+        print("✅ 6 concurrent requests for one profile started 1 actor run")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Scrape deduplication test failed: {e}")
+        return False
+
+def test_profile_normalizer():
+    """Test the precompiled normalizer and the paged dataset iterator"""
+    print("\n🧾 Testing Profile Normalizer...")
+    
+    try:
+        from profile_normalizer import normalize_profile, iter_dataset_items
+        
+        raw = {
+            "publicIdentifier": "jane-doe", "firstName": "Jane", "lastName": "", "connectionsCount": 500,
+            "positions": [
+                {"title": "CTO", "companyName": "Acme", "timePeriod": {"startDate": {"year": 2020}}},
+                {"title": "Dev", "timePeriod": {"startDate": {"year": 2015}, "endDate": {"year": 2019}}},
+                {"title": "Intern", "timePeriod": None},
+                "not a position"
+            ],
+            "educations": [{"schoolName": "MIT", "timePeriod": {"startDate": {"year": 2011}}}],
+            "skills": [{"name": "Python"}]
+        }
+        profile = normalize_profile(raw)
+        assert profile["basic_info"]["full_name"] == "Jane"
+        assert profile["basic_info"]["profile_url"] == "https://linkedin.com/in/jane-doe"
+        assert [e["duration"] for e in profile["experience"]] == ["2020 - Present", "2015 - 2019", ""]
+        assert list(profile["experience"][0]) == ["title", "company", "duration", "location", "description"]
+        assert profile["education"] == [{"school": "MIT", "degree": "", "field": "", "duration": "", "description": ""}]
+        assert profile["skills"] == [{"name": "Python", "endorsements": 0}]
+        assert profile["connections"] == "500" and profile["followers"] == "" and profile["recommendations"] == []
+        print("✅ Raw items normalize to the profile structure")
+        
+        class FakeSession:
+            def __init__(self):
+                self.requests = []
+            
+            def get(self, url, params=None, headers=None, timeout=None):
+                self.requests.append(params)
+                items = [{"n": n} for n in range(params["offset"], min(5, params["offset"] + params["limit"]))]
+                return Mock(content=json.dumps(items).encode(), raise_for_status=lambda: None)
+        
+        session = FakeSession()
+        assert [item["n"] for item in iter_dataset_items("items", page_size=2, session=session)] == [0, 1, 2, 3, 4]
+        assert [params["offset"] for params in session.requests] == [0, 2, 4]
+        session = FakeSession()
+        assert len(list(iter_dataset_items("items", page_size=2, session=session, max_items=1))) == 1
+        assert len(session.requests) == 1
+        print("✅ Dataset items stream in pages")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Profile normalizer test failed: {e}")
+        return False
+
+def test_apify_stub():
+    """Test the scraper's REST path end to end against the local Apify stub"""
+    print("\n🧪 Testing Apify Stub...")
+    
+    try:
+        import config
+        from apify_stub import start_stub_server
+        from linkedin_scraper import LinkedInScraper
+        from profile_normalizer import iter_dataset_items
+        
+        recorded = {"jane-doe": {"publicIdentifier": "jane-doe", "firstName": "Jane", "lastName": "Doe",
+                                 "headline": "Recorded headline"}}
+        original_url = config.APIFY_API_URL
+        try:
+            with start_stub_server(run_secs=0.2, profiles=recorded, seed=1) as stub:
+                config.APIFY_API_URL = stub.base_url
+                scraper = LinkedInScraper()
+                scraper.client = None
+                profile = scraper.scrape_profile("https://www.linkedin.com/in/Jane-Doe")
+                assert profile["basic_info"]["headline"] == "Recorded headline", profile
+                
+                run = stub.start_run("actor", {"urls": [f"https://linkedin.com/in/user-{i}" for i in range(5)]})
+                items_url = f"{stub.base_url}/v2/datasets/{run.dataset_id}/items"
+                assert list(iter_dataset_items(items_url, page_size=2)) == [], "items served while running"
+                run.finish_at = 0
+                ids = [item["publicIdentifier"] for item in iter_dataset_items(items_url, page_size=2)]
+                assert ids == [f"user-{i}" for i in range(5)], ids
+                print("✅ Recorded and synthetic profiles are served through runs and paged datasets")
+            
+            with start_stub_server(failure_rate=1.0) as stub:
+                config.APIFY_API_URL = stub.base_url
+                assert scraper.scrape_profile("https://www.linkedin.com/in/john-roe") is None
+                assert stub.get_stats()["runs_failed"] == 1
+                print("✅ Injected run failures are reported as failed scrapes")
+        finally:
+            config.APIFY_API_URL = original_url
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Apify stub test failed: {e}")
+        return False
+
 def test_config():
     """Test configuration loading"""
     print("\n⚙️ Testing Configuration...")
@@ -315,10 +1145,24 @@ def main():
         ("Configuration", test_config),
         ("Imports", test_imports),
         ("Memory System", test_memory_system),
+        ("Memory Journal", test_memory_journal),
+        ("Write-Behind Flushing", test_write_behind_flush),
+        ("SQLite Memory Store", test_sqlite_memory_store),
+        ("Redis Memory Store", test_redis_memory_store),
+        ("Sharded Memory Store", test_sharded_memory_store),
         ("Profile Analyzer", test_profile_analyzer),
         ("Job Analyzer", test_job_analyzer),
         ("Content Generator", test_content_generator),
         ("Chat Agent", test_chat_agent),
+        ("Rate Limiter", test_rate_limiter),
+        ("Prompt Budget", test_prompt_budget),
+        ("Batch Scraping", test_batch_scraping),
+        ("Run Completion Wait", test_run_completion_wait),
+        ("Profile Cache", test_profile_cache),
+        ("Scrape Job Queue", test_scrape_job_queue),
+        ("Scrape Deduplication", test_scrape_dedup),
+        ("Profile Normalizer", test_profile_normalizer),
+        ("Apify Stub", test_apify_stub),
     ]
     
     passed = 0
@@ -4,8 +4,36 @@ Test script for OpenRouter integration
 """
 
 import os
+import time
+import io
+import json
+import tempfile
+import asyncio
+import threading
+import requests
+import config
+import llm_wrapper
+import rate_limiter
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from llm_wrapper import OpenRouterLLM, ChatOpenAI
+from llm_wrapper import OpenRouterLLM, AsyncOpenRouterLLM, ChatOpenAI, LLMResponseCache, DiskResponseCache, get_http_session, get_hedge_stats, CircuitBreaker, get_singleflight, get_response_cache
+from llm_metrics import get_llm_metrics, export_prometheus
+from openrouter_stub import start_stub_server
+
+@contextmanager
+def isolated_llm_cache():
+    """Point the response caches at a fresh temporary database instead of the real llm_cache.sqlite3"""
+    original_path, original_disk_cache = config.LLM_DISK_CACHE_PATH, llm_wrapper._disk_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        config.LLM_DISK_CACHE_PATH = os.path.join(tmp, "llm_cache.sqlite3")
+        llm_wrapper._disk_cache = None
+        get_response_cache().clear()
+        try:
+            yield
+        finally:
+            config.LLM_DISK_CACHE_PATH = original_path
+            llm_wrapper._disk_cache = original_disk_cache
+            get_response_cache().clear()
 
 def test_openrouter_connection():
     """Test basic OpenRouter API connection"""
@@ -60,6 +88,475 @@ def test_fallback_mechanism():
     print("🎉 Fallback mechanism test passed!")
     return True
 
+def test_shared_connection_pool():
+    """Test that all LLM wrappers reuse the same pooled HTTP session"""
+    print("\n🧪 Testing Shared Connection Pool...")
+    
+    try:
+        primary = OpenRouterLLM()
+        backup = OpenRouterLLM("meta-llama/llama-2-7b-chat")
+        chat_llm = ChatOpenAI()
+        
+        assert primary.session is get_http_session()
+        assert backup.session is primary.session
+        assert chat_llm.llm.session is primary.session
+        print("✅ All wrappers share one pooled session")
+    except Exception as e:
+        print(f"❌ Shared connection pool test failed: {e}")
+        return False
+    
+    return True
+
+def test_async_fan_out():
+    """Test that agather runs prompts concurrently and keeps their order"""
+    print("\n🧪 Testing Async Fan-out...")
+    
+    class SlowLLM(OpenRouterLLM):
+        def invoke(self, prompt, temperature=None, max_tokens=None, use_cache=True):
+            time.sleep(0.2)
+            return prompt.upper()
+    
+    try:
+        async_llm = AsyncOpenRouterLLM(llm=SlowLLM(), max_concurrency=5)
+        prompts = [f"prompt {i}" for i in range(5)]
+        
+        start = time.perf_counter()
+        responses = asyncio.run(async_llm.agather(prompts))
+        elapsed = time.perf_counter() - start
+        
+        assert responses == [prompt.upper() for prompt in prompts]
+        assert elapsed < 0.6, f"fan-out took {elapsed:.2f}s"
+        print(f"✅ 5 prompts answered in {elapsed:.2f}s")
+    except Exception as e:
+        print(f"❌ Async fan-out test failed: {e}")
+        return False
+    
+    return True
+
+def test_stream_parsing():
+    """Test parsing of OpenRouter server-sent event streams"""
+    print("\n🧪 Testing Stream Parsing...")
+    
+    try:
+        raw = (
+            b": OPENROUTER PROCESSING\n\n"
+            b'data: {"choices": [{"delta": {"role": "assistant", "content": "Hello"}}]}\n\n'
+            b'data: {"choices": [{"delta": {"content": ", world"}}]}\n\n'
+            b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n\n'
+            b"data: [DONE]\n\n"
+        )
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(raw)
+        
+        chunks = list(OpenRouterLLM._iter_sse_chunks(response))
+        assert chunks == ["Hello", ", world"]
+        print("✅ Stream chunks parsed correctly")
+    except Exception as e:
+        print(f"❌ Stream parsing test failed: {e}")
+        return False
+    
+    return True
+
+def test_response_cache():
+    """Test LRU, TTL and size-based eviction of the response cache"""
+    print("\n🧪 Testing Response Cache...")
+    
+    try:
+        cache = LLMResponseCache(max_entries=2, max_bytes=10_000, ttl=60)
+        key_a = LLMResponseCache.make_key("model", "prompt a", 0.7, 100)
+        key_b = LLMResponseCache.make_key("model", "prompt b", 0.7, 100)
+        key_c = LLMResponseCache.make_key("model", "prompt c", 0.7, 100)
+        assert key_a != LLMResponseCache.make_key("model", "prompt a", 0.2, 100)
+        
+        cache.set(key_a, "answer a")
+        cache.set(key_b, "answer b")
+        assert cache.get(key_a) == "answer a"
+        cache.set(key_c, "answer c")  # evicts b, the least recently used
+        assert cache.get(key_b) is None
+        assert cache.get(key_c) == "answer c"
+        
+        stats = cache.get_stats()
+        assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+        print("✅ LRU eviction and counters work")
+        
+        expiring = LLMResponseCache(ttl=0.05)
+        expiring.set(key_a, "answer a")
+        time.sleep(0.1)
+        assert expiring.get(key_a) is None
+        assert expiring.get_stats()["expirations"] == 1
+        print("✅ TTL expiry works")
+        
+        small = LLMResponseCache(max_bytes=200)
+        small.set(key_a, "x" * 100)
+        small.set(key_b, "y" * 100)
+        assert small.get_stats()["bytes"] <= 200
+        assert small.get(key_a) is None and small.get(key_b) is not None
+        print("✅ Size-based eviction works")
+    except Exception as e:
+        print(f"❌ Response cache test failed: {e}")
+        return False
+    
+    return True
+
+def test_disk_cache():
+    """Test that the SQLite cache is shared between instances and respects its size cap"""
+    print("\n🧪 Testing Disk Cache...")
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm_cache.sqlite3")
+            writer = DiskResponseCache(path=path, max_bytes=2_000, ttl=60)
+            reader = DiskResponseCache(path=path, max_bytes=2_000, ttl=60)
+            
+            key = LLMResponseCache.make_key("model", "shared prompt", 0.7, 100)
+            writer.set(key, "shared answer")
+            assert reader.get(key) == "shared answer"
+            print("✅ Responses are shared between cache instances")
+            
+            for i in range(20):
+                writer.set(LLMResponseCache.make_key("model", f"prompt {i}", 0.7, 100), "z" * 200)
+            writer.compact()
+            stats = writer.get_stats()
+            assert stats["bytes"] <= 2_000 and stats["evictions"] > 0
+            print("✅ Compaction keeps the database under its size cap")
+    except Exception as e:
+        print(f"❌ Disk cache test failed: {e}")
+        return False
+    
+    return True
+
+def test_hedged_requests():
+    """Test that a slow primary model is raced against the backup"""
+    print("\n🧪 Testing Hedged Requests...")
+    
+    class SlowPrimaryLLM(OpenRouterLLM):
+        abandoned = threading.Event()
+        
+        def _request_completion(self, model, prompt, temperature=None, max_tokens=None, cancelled=None):
+            if model != self.model:
+                time.sleep(0.05)
+            elif cancelled is not None and cancelled.wait(1.0):
+                SlowPrimaryLLM.abandoned.set()
+                return None
+            return f"answer from {model}"
+    
+    original_delay = config.LLM_HEDGE_DEFAULT_DELAY
+    try:
+        config.LLM_HEDGE_DEFAULT_DELAY = 0.1
+        before = get_hedge_stats()
+        
+        start = time.perf_counter()
+        response = SlowPrimaryLLM("hedge-test-model").invoke("Hedge me", use_cache=False)
+        elapsed = time.perf_counter() - start
+        
+        after = get_hedge_stats()
+        assert response == f"answer from {config.BACKUP_LLM_MODEL}"
+        assert elapsed < 0.5, f"hedged call took {elapsed:.2f}s"
+        assert after["hedged"] == before["hedged"] + 1
+        assert after["backup_wins"] == before["backup_wins"] + 1
+        print(f"✅ Backup won the race in {elapsed:.2f}s")
+        assert SlowPrimaryLLM.abandoned.wait(0.3), "losing primary kept running"
+        print("✅ The losing primary was cancelled")
+        
+        with isolated_llm_cache():
+            llm = SlowPrimaryLLM("hedge-test-model")
+            llm.invoke("Hedge and cache me")
+            cache = get_response_cache()
+            assert cache.get(llm._cache_key("Hedge and cache me")) is None, "backup answer cached for the primary"
+            assert cache.get(llm._cache_key("Hedge and cache me", model=config.BACKUP_LLM_MODEL)) == response
+        print("✅ Backup answers are cached under the backup model")
+        
+        class TimedPrimaryLLM(OpenRouterLLM):
+            backup_calls = 0
+            
+            def _request_completion(self, model, prompt, temperature=None, max_tokens=None, cancelled=None):
+                if model != self.model:
+                    TimedPrimaryLLM.backup_calls += 1
+                time.sleep(0.2 if prompt == "slow" else 0.02)
+                return f"answer from {model}"
+        
+        # Fill the pool so the primary queues longer than the hedge delay before it runs
+        release = threading.Event()
+        blockers = [llm_wrapper._submit_hedge_task(release.wait, 5)[0] for _ in range(config.LLM_HEDGE_MAX_WORKERS)]
+        threading.Timer(0.3, release.set).start()
+        before = get_hedge_stats()
+        llm = TimedPrimaryLLM("hedge-busy-model")
+        assert llm._hedged_completion("fast") == ("answer from hedge-busy-model", llm.model)
+        assert get_hedge_stats()["hedged"] == before["hedged"] and TimedPrimaryLLM.backup_calls == 0
+        print("✅ Time spent queued in a saturated pool doesn't trigger a hedge")
+        for blocker in blockers:
+            blocker.result()
+        
+        # With the primary slow and no worker free for the backup, hedging is skipped
+        release = threading.Event()
+        blockers = [llm_wrapper._submit_hedge_task(release.wait, 5)[0]
+                    for _ in range(config.LLM_HEDGE_MAX_WORKERS - 1)]
+        before = get_hedge_stats()
+        assert llm._hedged_completion("slow") == ("answer from hedge-busy-model", llm.model)
+        after = get_hedge_stats()
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+        assert after["skipped_busy"] == before["skipped_busy"] + 1 and after["hedged"] == before["hedged"], after
+        assert TimedPrimaryLLM.backup_calls == 0
+        print("✅ No backup is queued when every worker is busy")
+    except Exception as e:
+        print(f"❌ Hedged request test failed: {e}")
+        return False
+    finally:
+        config.LLM_HEDGE_DEFAULT_DELAY = original_delay
+    
+    return True
+
+def test_circuit_breaker_and_retries():
+    """Test that the breaker opens on failures and that 5xx responses are retried"""
+    print("\n🧪 Testing Circuit Breaker and Retries...")
+    
+    def make_response(status_code, body=None, headers=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body or {}).encode()
+        response.raw = io.BytesIO(response._content)
+        response.headers.update(headers or {})
+        return response
+    
+    class FlakySession:
+        def __init__(self, responses):
+            self.responses = list(responses)
+            self.calls = 0
+        
+        def post(self, *args, **kwargs):
+            self.calls += 1
+            return self.responses.pop(0)
+    
+    try:
+        breaker = CircuitBreaker(window=10, failure_rate=0.5, min_calls=4, open_seconds=0.1)
+        for _ in range(4):
+            assert breaker.allow_request()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        time.sleep(0.15)
+        assert breaker.allow_request()          # half-open probe
+        assert not breaker.allow_request()      # only one probe at a time
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        print("✅ Breaker opens, probes and closes again")
+        
+        for _ in range(4):
+            breaker.record_failure()
+        time.sleep(0.15)
+        assert breaker.allow_request()
+        breaker.record_neutral()                # a 4xx probe got no answer
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()          # the probe slot was released
+        print("✅ A 4xx releases the half-open probe without closing the breaker")
+        
+        assert not breaker.would_allow()        # the probe is in flight
+        breaker.record_neutral()
+        assert breaker.would_allow() and breaker.would_allow()   # checking doesn't claim the probe
+        assert breaker.allow_request()
+        breaker.record_success()
+        
+        open_model = "open-breaker-model"
+        for _ in range(config.LLM_BREAKER_MIN_CALLS):
+            llm_wrapper.get_circuit_breaker(open_model).record_failure()
+        limiter = rate_limiter.get_rate_limiter(f"openrouter:{open_model}")
+        session = FlakySession([])
+        start = time.perf_counter()
+        assert OpenRouterLLM(open_model, session=session)._request_completion(open_model, "Fail fast") is None
+        assert time.perf_counter() - start < 0.1 and session.calls == 0
+        assert limiter is None or limiter.get_stats()["acquired"] == 0, limiter.get_stats()
+        print("✅ An open breaker rejects calls before they take a rate limit token")
+        
+        ok_body = {"choices": [{"message": {"content": "recovered"}}]}
+        session = FlakySession([
+            make_response(503, headers={"Retry-After": "0"}),
+            make_response(429, headers={"Retry-After": "0"}),
+            make_response(200, ok_body)
+        ])
+        llm = OpenRouterLLM("retry-test-model", session=session)
+        assert llm._request_completion(llm.model, "Retry me") == "recovered"
+        assert session.calls == 3
+        print("✅ 429/5xx responses are retried honouring Retry-After")
+        
+        cancelled = threading.Event()
+        session = FlakySession([make_response(503, headers={"Retry-After": "5"}), make_response(200, ok_body)])
+        llm = OpenRouterLLM("cancel-test-model", session=session)
+        threading.Timer(0.1, cancelled.set).start()
+        start = time.perf_counter()
+        assert llm._request_completion(llm.model, "Cancel me", cancelled=cancelled) is None
+        assert time.perf_counter() - start < 1.0 and session.calls == 1
+        streamed = requests.Response()
+        streamed.status_code = 200
+        streamed.raw = io.BytesIO(json.dumps(ok_body).encode())
+        assert OpenRouterLLM._read_json(streamed, cancelled) is None
+        print("✅ Cancellation interrupts backoff and hangs up on a pending response")
+    except Exception as e:
+        print(f"❌ Circuit breaker test failed: {e}")
+        return False
+    
+    return True
+
+def test_request_coalescing():
+    """Test that identical concurrent prompts share one upstream call"""
+    print("\n🧪 Testing Request Coalescing...")
+    
+    class CountingLLM(OpenRouterLLM):
+        calls = 0
+        
+        def _request_completion(self, model, prompt, temperature=None, max_tokens=None, cancelled=None):
+            CountingLLM.calls += 1
+            time.sleep(0.2)
+            return "shared answer"
+    
+    try:
+        with isolated_llm_cache():
+            llm = CountingLLM("coalesce-test-model")
+            prompt = "Describe a role nobody has asked about yet"
+            before = get_singleflight().get_stats()
+            results = []
+            
+            threads = [threading.Thread(target=lambda: results.append(llm.invoke(prompt))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            after = get_singleflight().get_stats()
+            assert results == ["shared answer"] * 5
+            assert CountingLLM.calls == 1, f"{CountingLLM.calls} upstream calls"
+            assert after["collapsed"] - before["collapsed"] == 4
+            print("✅ 5 concurrent requests collapsed into 1 upstream call")
+    except Exception as e:
+        print(f"❌ Request coalescing test failed: {e}")
+        return False
+    
+    return True
+
+def test_batched_invocation():
+    """Test that several prompts are packed into one call and split back apart"""
+    print("\n🧪 Testing Batched Invocation...")
+    
+    class PackingLLM(OpenRouterLLM):
+        reply = ""
+        calls = []
+        
+        def _request_completion(self, model, prompt, temperature=None, max_tokens=None, cancelled=None):
+            PackingLLM.calls.append(prompt)
+            return PackingLLM.reply if "### Task" in prompt else f"single: {prompt}"
+    
+    try:
+        chat = ChatOpenAI("batch-test-model")
+        chat.llm = PackingLLM("batch-test-model")
+        chat.async_llm.llm = chat.llm
+        prompts = [f"Headline task {time.time()}", f"Summary task {time.time()}"]
+        
+        PackingLLM.reply = '```json\n{"1": "first answer", "2": {"story_focused": "s"}}\n```'
+        answers = chat.invoke_batch(prompts, use_cache=False)
+        assert len(PackingLLM.calls) == 1, f"{len(PackingLLM.calls)} upstream calls"
+        assert answers[0] == "first answer"
+        assert json.loads(answers[1]) == {"story_focused": "s"}
+        print("✅ 2 prompts answered by 1 upstream call")
+        
+        PackingLLM.calls = []
+        PackingLLM.reply = '{"1": "only one answer"}'
+        answers = chat.invoke_batch(prompts, use_cache=False)
+        assert answers == [f"single: {prompt}" for prompt in prompts]
+        assert len(PackingLLM.calls) == 3
+        print("✅ Malformed batch response falls back to individual calls")
+        
+        with isolated_llm_cache():
+            PackingLLM.reply = '{"1": "only one answer"}'
+            chat.invoke_batch(prompts)
+            PackingLLM.calls = []
+            PackingLLM.reply = '{"1": "first", "2": "second"}'
+            assert chat.invoke_batch(prompts) == ["first", "second"], "malformed batch reply was served from cache"
+            assert len(PackingLLM.calls) == 1
+        print("✅ Malformed batch replies are not cached")
+    except Exception as e:
+        print(f"❌ Batched invocation test failed: {e}")
+        return False
+    
+    return True
+
+def test_llm_telemetry():
+    """Test that calls are recorded with model, status, usage and cache hits"""
+    print("\n🧪 Testing LLM Telemetry...")
+    
+    class UsageSession:
+        def post(self, *args, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps({
+                "choices": [{"message": {"content": "measured"}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 5}
+            }).encode()
+            return response
+    
+    try:
+        metrics = get_llm_metrics()
+        metrics.reset()
+        original_hedging = config.LLM_HEDGING_ENABLED
+        config.LLM_HEDGING_ENABLED = False
+        try:
+            with isolated_llm_cache():
+                llm = OpenRouterLLM("telemetry-test-model", session=UsageSession(), caller="test")
+                assert llm.invoke("Count my tokens") == "measured"
+                assert llm.invoke("Count my tokens") == "measured"
+        finally:
+            config.LLM_HEDGING_ENABLED = original_hedging
+        
+        stats = metrics.get_stats()["telemetry-test-model|test"]
+        assert stats["statuses"] == {"ok": 2}, stats["statuses"]
+        assert stats["cache_hits"] == 1
+        assert stats["prompt_tokens"] == 12 and stats["completion_tokens"] == 5
+        assert stats["latency"]["window_count"] == 2
+        print("✅ Model, status, tokens and cache hits recorded")
+        
+        text = export_prometheus()
+        assert 'llm_tokens_total{model="telemetry-test-model",caller="test",type="prompt"} 12' in text
+        assert 'llm_call_duration_seconds_bucket{model="telemetry-test-model",caller="test",le="+Inf"} 2' in text
+        assert "# TYPE llm_call_duration_seconds histogram" in text
+        print("✅ Prometheus export contains counters and histogram")
+    except Exception as e:
+        print(f"❌ LLM telemetry test failed: {e}")
+        return False
+    
+    return True
+
+def test_local_stub_server():
+    """Test the wrapper end to end against the local OpenRouter stub"""
+    print("\n🧪 Testing Local OpenRouter Stub...")
+    
+    original_hedging = config.LLM_HEDGING_ENABLED
+    config.LLM_HEDGING_ENABLED = False
+    try:
+        with start_stub_server(seed=7) as stub:
+            llm = OpenRouterLLM("stub-test-model", caller="stub-test")
+            llm.base_url = stub.base_url
+            prompt = f"Hello stub {time.time()}"
+            
+            assert llm.invoke(prompt, use_cache=False) == f"Echo: {prompt}"
+            assert "".join(llm.stream(prompt, use_cache=False)) == f"Echo: {prompt}"
+            calls = get_llm_metrics().get_recent_calls(limit=2)
+            assert all(call["prompt_tokens"] and call["completion_tokens"] for call in calls)
+            print("✅ JSON and SSE responses with usage served")
+            
+            stub.rate_limit_rate = 1.0
+            response = requests.post(f"{stub.base_url}/chat/completions", json={"messages": []})
+            assert response.status_code == 429 and response.headers["Retry-After"] == "1.0"
+            assert stub.get_stats()["rate_limited"] == 1
+            print("✅ Injected 429 carries Retry-After")
+    except Exception as e:
+        print(f"❌ Local stub test failed: {e}")
+        return False
+    finally:
+        config.LLM_HEDGING_ENABLED = original_hedging
+    
+    return True
+
 if __name__ == "__main__":
     print("🚀 Starting OpenRouter Integration Tests\n")
     
@@ -69,8 +566,39 @@ if __name__ == "__main__":
     # Test fallback mechanism
     fallback_ok = test_fallback_mechanism()
     
+    # Test connection pooling
+    pool_ok = test_shared_connection_pool()
+    
+    # Test concurrent fan-out
+    async_ok = test_async_fan_out()
+    
+    # Test streaming
+    stream_ok = test_stream_parsing()
+    
+    # Test response caching
+    cache_ok = test_response_cache()
+    disk_cache_ok = test_disk_cache()
+    
+    # Test hedging
+    hedge_ok = test_hedged_requests()
+    
+    # Test failure handling
+    breaker_ok = test_circuit_breaker_and_retries()
+    
+    # Test coalescing of identical prompts
+    coalesce_ok = test_request_coalescing()
+    
+    # Test batching of small prompts
+    batch_ok = test_batched_invocation()
+    
+    # Test call telemetry
+    telemetry_ok = test_llm_telemetry()
+    
+    # Test against the local stub server
+    stub_ok = test_local_stub_server()
+    
     print("\n" + "="*50)
-    if connection_ok and fallback_ok:
+    if connection_ok and fallback_ok and pool_ok and async_ok and stream_ok and cache_ok and disk_cache_ok and hedge_ok and breaker_ok and coalesce_ok and batch_ok and telemetry_ok and stub_ok:
         print("🎉 All tests passed! OpenRouter integration is working correctly.")
         print("\n📝 Next steps:")
         print("1. Make sure your .env file contains OPENROUTER_API_KEY")